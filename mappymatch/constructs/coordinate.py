@@ -1,8 +1,12 @@
 from __future__ import annotations
 
 import math
-from typing import Any, NamedTuple
+from collections.abc import Sequence
+from typing import Any, Iterator, List, NamedTuple, Optional, Union, overload
 
+import numpy as np
+import pandas as pd
+import shapely
 from pyproj import CRS, Transformer
 from pyproj.exceptions import ProjError
 from shapely.geometry import Point
@@ -89,3 +93,135 @@ class Coordinate(NamedTuple):
             geom=Point(new_x, new_y),
             crs=new_crs,
         )
+
+
+class CoordinateSequence(Sequence):
+    """
+    A read-only sequence of coordinates backed by arrays of x and y values.
+
+    Coordinate objects are only created when the sequence is indexed or iterated;
+    the x and y values can be accessed as arrays and equality and hashing are computed
+    on the arrays directly.
+
+    Args:
+        x: The x values of the coordinates
+        y: The y values of the coordinates
+        coordinate_ids: The coordinate ids
+        crs: The CRS of the coordinates
+        geometry: Optional shapely points for the coordinates, reused if given
+
+    Attributes:
+        x: The x values of the coordinates
+        y: The y values of the coordinates
+        coordinate_ids: The coordinate ids
+        crs: The CRS of the coordinates
+    """
+
+    def __init__(
+        self,
+        x: np.ndarray,
+        y: np.ndarray,
+        coordinate_ids: pd.Index,
+        crs: CRS,
+        geometry: Optional[np.ndarray] = None,
+    ):
+        self.x = x
+        self.y = y
+        self.coordinate_ids = coordinate_ids
+        self.crs = crs
+        self._geometry = geometry
+
+    def __len__(self) -> int:
+        return len(self.x)
+
+    @overload
+    def __getitem__(self, i: int) -> Coordinate: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> CoordinateSequence: ...
+
+    def __getitem__(
+        self, i: Union[int, slice]
+    ) -> Union[Coordinate, CoordinateSequence]:
+        if isinstance(i, slice):
+            return CoordinateSequence(
+                self.x[i],
+                self.y[i],
+                self.coordinate_ids[i],
+                self.crs,
+                geometry=None if self._geometry is None else self._geometry[i],
+            )
+
+        if self._geometry is not None:
+            geom = self._geometry[i]
+        else:
+            geom = Point(self.x[i], self.y[i])
+
+        coordinate_id = self.coordinate_ids[i]
+        if isinstance(coordinate_id, np.generic):
+            # match the python scalars produced by iterating the index
+            coordinate_id = coordinate_id.item()
+
+        return Coordinate(coordinate_id, geom, self.crs)
+
+    def __iter__(self) -> Iterator[Coordinate]:
+        crs = self.crs
+        for i, g in zip(self.coordinate_ids, self.geometries()):
+            yield Coordinate(i, g, crs)
+
+    def geometries(self) -> np.ndarray:
+        """
+        The shapely points of the coordinates
+
+        Returns:
+            An array of Points
+        """
+        if self._geometry is not None:
+            return self._geometry
+        return shapely.points(self.x, self.y)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, CoordinateSequence):
+            return (
+                len(self) == len(other)
+                and self.crs == other.crs
+                and bool(np.array_equal(self.x, other.x))
+                and bool(np.array_equal(self.y, other.y))
+                and bool(self.coordinate_ids.equals(other.coordinate_ids))
+            )
+        elif isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        # adding 0.0 turns -0.0 into 0.0, which __eq__ treats as equal
+        return hash(
+            (
+                (self.x + 0.0).tobytes(),
+                (self.y + 0.0).tobytes(),
+                tuple(self.coordinate_ids),
+            )
+        )
+
+    def __add__(self, other) -> Union[CoordinateSequence, List[Coordinate]]:
+        if isinstance(other, CoordinateSequence):
+            if self.crs != other.crs:
+                raise TypeError("cannot add coordinates with different crs")
+            if self._geometry is not None and other._geometry is not None:
+                geometry = np.concatenate([self._geometry, other._geometry])
+            else:
+                geometry = None
+            return CoordinateSequence(
+                np.concatenate([self.x, other.x]),
+                np.concatenate([self.y, other.y]),
+                self.coordinate_ids.append(other.coordinate_ids),
+                self.crs,
+                geometry=geometry,
+            )
+        elif isinstance(other, list):
+            return list(self) + other
+        return NotImplemented
+
+    def __repr__(self):
+        crs_a = self.crs.to_authority() if self.crs else "Null"
+        return f"CoordinateSequence(n={len(self)}, crs={crs_a})"
@@ -1,6 +1,17 @@
 from __future__ import annotations
 
-from typing import Any, Dict, NamedTuple, Optional, Union
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    Mapping,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from shapely.geometry import LineString
 
@@ -26,6 +37,72 @@ class RoadId(NamedTuple):
         return cls(**json)
 
 
+class RoadMetadata(MutableMapping[str, Any]):
+    """
+    A road metadata mapping that is only merged into a dictionary when it is first
+    accessed.
+
+    The base metadata is copied and the attribute values are read from the map when
+    the road is built, so the metadata doesn't change when the map changes later on.
+    Maps hand out the same road object for repeated lookups, so changes to its metadata
+    are seen by every holder of the road until the map rebuilds its roads;
+    use copy() to get a dictionary of your own. Pickling a RoadMetadata gives a
+    plain dictionary.
+
+    Args:
+        base: The metadata of the road, or None if it has none; a shallow copy is kept
+        attributes: The (name, value) of each attribute to add to the base metadata
+    """
+
+    __slots__ = ("_base", "_attributes", "_metadata")
+
+    def __init__(
+        self,
+        base: Optional[Mapping[str, Any]],
+        attributes: Sequence[Tuple[str, Any]],
+    ):
+        self._base = None if base is None else dict(base)
+        self._attributes: Optional[Sequence[Tuple[str, Any]]] = attributes
+        self._metadata: Optional[Dict[str, Any]] = None
+
+    def _materialize(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            metadata = {} if self._base is None else self._base
+            metadata.update(self._attributes or ())
+            self._metadata = metadata
+            self._base = None
+            self._attributes = None
+
+        return self._metadata
+
+    def __getitem__(self, key: str) -> Any:
+        return self._materialize()[key]
+
+    def __setitem__(self, key: str, value: Any):
+        self._materialize()[key] = value
+
+    def __delitem__(self, key: str):
+        del self._materialize()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._materialize())
+
+    def __len__(self) -> int:
+        return len(self._materialize())
+
+    def __repr__(self) -> str:
+        return repr(self._materialize())
+
+    def __reduce__(self):
+        return (dict, (self._materialize(),))
+
+    def copy(self) -> Dict[str, Any]:
+        """
+        A copy of the metadata as a dictionary
+        """
+        return self._materialize().copy()
+
+
 class Road(NamedTuple):
     """
     Represents a road that can be matched to;
@@ -35,13 +112,13 @@ class Road(NamedTuple):
         geom: The geometry of this road
         origin_junction_id: The unique identifier of the origin junction of this road
         destination_junction_id: The unique identifier of the destination junction of this road
-        metadata: an optional dictionary for storing additional metadata
+        metadata: an optional mapping for storing additional metadata
     """
 
     road_id: RoadId
 
     geom: LineString
-    metadata: Optional[dict] = None
+    metadata: Optional[MutableMapping[str, Any]] = None
 
     def to_dict(self) -> Dict[str, Any]:
         """
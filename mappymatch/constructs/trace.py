@@ -7,10 +7,11 @@ from typing import List, Optional, Union
 
 import numpy as np
 import pandas as pd
+import shapely
 from geopandas import GeoDataFrame, points_from_xy, read_file, read_parquet
 from pyproj import CRS
 
-from mappymatch.constructs.coordinate import Coordinate
+from mappymatch.constructs.coordinate import CoordinateSequence
 from mappymatch.utils.crs import LATLON_CRS, XY_CRS
 
 
@@ -18,37 +19,115 @@ class Trace:
     """
     A Trace is a collection of coordinates that represents a trajectory to be matched.
 
+    The trace is stored as contiguous arrays of x and y values along with an index;
+    slicing a trace gives views of these arrays and the GeoDataFrame is only built
+    when it is needed.
+
     Attributes:
-        coords: A list of all the coordinates
+        coords: A sequence of all the coordinates
         crs: The CRS of the trace
         index: The index of the trace
+        x: The x values of the coordinates
+        y: The y values of the coordinates
+        geometry: The coordinates as an array of shapely points
     """
 
-    _frame: GeoDataFrame
-
     def __init__(self, frame: GeoDataFrame):
         if frame.index.has_duplicates:
             duplicates = frame.index[frame.index.duplicated()].values
             raise IndexError(
                 f"Trace cannot have duplicates in the index but found {duplicates}"
             )
-        self._frame = frame
+        geometry = np.asarray(frame.geometry.values)
+
+        self._x = shapely.get_x(geometry)
+        self._y = shapely.get_y(geometry)
+        self._index = frame.index
+        self._crs = frame.crs
+        self._geometry: Optional[np.ndarray] = geometry
+        self._frame_cache: Optional[GeoDataFrame] = frame
+
+    @classmethod
+    def _from_arrays(
+        cls,
+        x: np.ndarray,
+        y: np.ndarray,
+        index: pd.Index,
+        crs: Optional[CRS],
+        geometry: Optional[np.ndarray] = None,
+        check_index: bool = True,
+    ) -> Trace:
+        """
+        Build a trace directly from its arrays, without building a GeoDataFrame
+
+        Set check_index to False only if the index is known to have no duplicates
+        """
+        if check_index and index.has_duplicates:
+            duplicates = index[index.duplicated()].values
+            raise IndexError(
+                f"Trace cannot have duplicates in the index but found {duplicates}"
+            )
+        trace = cls.__new__(cls)
+        trace._x = x
+        trace._y = y
+        trace._index = index
+        trace._crs = crs
+        trace._geometry = geometry
+        trace._frame_cache = None
+        return trace
 
     def __getitem__(self, i) -> Trace:
-        if isinstance(i, int):
+        if isinstance(i, (int, np.integer)):
             i = [i]
-        new_frame = self._frame.iloc[i]
-        return Trace(new_frame)
+
+        geometry = self._geometry
+
+        if isinstance(i, slice):
+            # a slice of a trace is a view on the same arrays and can't add duplicates
+            trace = Trace._from_arrays(
+                self._x[i],
+                self._y[i],
+                self._index[i],
+                self._crs,
+                geometry=None if geometry is None else geometry[i],
+                check_index=False,
+            )
+            return trace
+
+        i = np.asarray(i)
+        if i.dtype != bool:
+            i = i.astype(np.intp)
+
+        return Trace._from_arrays(
+            self._x[i],
+            self._y[i],
+            self._index[i],
+            self._crs,
+            geometry=None if geometry is None else geometry[i],
+            check_index=i.dtype != bool,
+        )
 
     def __add__(self, other: Trace) -> Trace:
         if self.crs != other.crs:
             raise TypeError("cannot add two traces together with different crs")
-        new_frame = pd.concat([self._frame, other._frame])
-        return Trace(new_frame)
+
+        if self._geometry is not None and other._geometry is not None:
+            geometry = np.concatenate([self._geometry, other._geometry])
+        else:
+            geometry = None
+
+        return Trace._from_arrays(
+            np.concatenate([self._x, other._x]),
+            np.concatenate([self._y, other._y]),
+            self._index.append(other._index),
+            self._crs,
+            geometry=geometry,
+            check_index=not _ordered_before(self._index, other._index),
+        )
 
     def __len__(self):
         """Number of coordinate pairs."""
-        return len(self._frame)
+        return len(self._x)
 
     def __str__(self):
         output_lines = [
@@ -61,26 +140,53 @@ class Trace:
     def __repr__(self):
         return self.__str__()
 
+    @property
+    def _frame(self) -> GeoDataFrame:
+        """
+        The GeoDataFrame for this trace; built on first access.
+        """
+        if self._frame_cache is None:
+            self._frame_cache = GeoDataFrame(
+                geometry=self.geometry, index=self._index, crs=self._crs
+            )
+        return self._frame_cache
+
     @property
     def index(self) -> pd.Index:
-        """Get index to underlying GeoDataFrame."""
-        return self._frame.index
+        """Get index of the trace."""
+        return self._index
+
+    @property
+    def x(self) -> np.ndarray:
+        """Get the x values of the coordinates."""
+        return self._x
+
+    @property
+    def y(self) -> np.ndarray:
+        """Get the y values of the coordinates."""
+        return self._y
+
+    @property
+    def geometry(self) -> np.ndarray:
+        """Get the coordinates as an array of shapely points."""
+        if self._geometry is None:
+            self._geometry = shapely.points(self._x, self._y)
+        return self._geometry
 
     @cached_property
-    def coords(self) -> List[Coordinate]:
+    def coords(self) -> CoordinateSequence:
         """
-        Get coordinates as Coordinate objects.
+        Get the coordinates as a sequence of Coordinate objects;
+        each Coordinate is only built when it is accessed.
         """
-        coords_list = [
-            Coordinate(i, g, self.crs)
-            for i, g in zip(self._frame.index, self._frame.geometry)
-        ]
-        return coords_list
+        return CoordinateSequence(
+            self._x, self._y, self._index, self._crs, geometry=self._geometry
+        )
 
     @property
     def crs(self) -> CRS:
-        """Get Coordinate Reference System(CRS) to underlying GeoDataFrame."""
-        return self._frame.crs
+        """Get Coordinate Reference System(CRS) of the trace."""
+        return self._crs
 
     @classmethod
     def from_geo_dataframe(
@@ -267,11 +373,9 @@ class Trace:
         Returns:
             The downsampled trace
         """
-        s = list(np.linspace(0, len(self._frame) - 1, npoints).astype(int))
-
-        new_frame = self._frame.iloc[s]
+        s = list(np.linspace(0, len(self) - 1, npoints).astype(int))
 
-        return Trace(new_frame)
+        return self[s]
 
     def drop(self, index=List) -> Trace:
         """
@@ -283,9 +387,18 @@ class Trace:
         Returns:
             The trace with the points removed
         """
-        new_frame = self._frame.drop(index)
+        if not pd.api.types.is_list_like(index):
+            index = [index]
 
-        return Trace(new_frame)
+        positions = self._index.get_indexer(index)
+        if (positions < 0).any():
+            missing = np.asarray(index, dtype=object)[positions < 0]
+            raise KeyError(f"{list(missing)} not found in the trace index")
+
+        keep = np.ones(len(self), dtype=bool)
+        keep[positions] = False
+
+        return self[keep]
 
     def to_crs(self, new_crs: CRS) -> Trace:
         """
@@ -308,3 +421,18 @@ class Trace:
             file: the file to write to
         """
         self._frame.to_file(file, driver="GeoJSON")
+
+
+def _ordered_before(a: pd.Index, b: pd.Index) -> bool:
+    """
+    Cheap check that every label of index a comes before every label of index b,
+    in which case appending b to a can't create duplicates
+    """
+    if len(a) == 0 or len(b) == 0:
+        return True
+    try:
+        return bool(
+            a.is_monotonic_increasing and b.is_monotonic_increasing and a[-1] < b[0]
+        )
+    except TypeError:
+        return False
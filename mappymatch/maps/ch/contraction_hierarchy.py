@@ -0,0 +1,508 @@
+from __future__ import annotations
+
+import heapq
+import math
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from mappymatch.constructs.road import RoadId
+from mappymatch.maps.map_arrays import MapArrays
+from mappymatch.maps.map_interface import MapInterface
+
+# the number of nodes a witness search may settle before it gives up;
+# a witness search that gives up adds a shortcut that may not be needed
+_WITNESS_SETTLE_LIMIT = 200
+
+_ARRAY_NAMES = (
+    "node_ids",
+    "edge_sources",
+    "edge_targets",
+    "edge_keys",
+    "up_indptr",
+    "up_targets",
+    "up_weights",
+    "up_arcs",
+    "down_indptr",
+    "down_sources",
+    "down_weights",
+    "down_arcs",
+    "arc_edges",
+    "arc_children",
+)
+
+# the remaining graph during contraction: node -> neighbor -> (weight, arc)
+_Adjacency = List[Dict[int, Tuple[float, int]]]
+
+
+def contraction_hierarchy_file(map_file: Union[str, Path], weight: str) -> Path:
+    """
+    The file that holds the contraction hierarchy of a map file for a weight,
+    next to the map file
+
+    Args:
+        map_file: The map file
+        weight: The weight of the contraction hierarchy
+
+    Returns:
+        The path of the contraction hierarchy file
+    """
+    return Path(map_file).with_suffix(f".{weight}.ch.npz")
+
+
+def _witness_search(
+    out_adj: _Adjacency,
+    source: int,
+    excluded: int,
+    targets: Dict[int, float],
+) -> Dict[int, float]:
+    """
+    A Dijkstra search from source that avoids the excluded node; the search stops once
+    every target is settled, once it is past the cost of every target, or once it has
+    settled _WITNESS_SETTLE_LIMIT nodes
+    """
+    max_cost = max(targets.values())
+    remaining = len(targets)
+
+    dist = {source: 0.0}
+    settled: Set[int] = set()
+
+    heap = [(0.0, source)]
+    while heap and len(settled) < _WITNESS_SETTLE_LIMIT:
+        d, u = heapq.heappop(heap)
+        if d > max_cost:
+            break
+        if u in settled:
+            continue
+        settled.add(u)
+
+        if u in targets:
+            remaining -= 1
+            if remaining == 0:
+                break
+
+        for v, (w, _) in out_adj[u].items():
+            if v == excluded:
+                continue
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+    return dist
+
+
+def _shortcuts(
+    out_adj: _Adjacency, in_adj: _Adjacency, v: int
+) -> List[Tuple[int, int, float, int, int]]:
+    """
+    The shortcuts needed to contract node v: (start, end, weight, first arc, second arc)
+    for each pair of neighbors whose shortest path runs through v
+    """
+    shortcuts = []
+    for u, (w_uv, arc_uv) in in_adj[v].items():
+        targets = {w: w_uv + w_vw for w, (w_vw, _) in out_adj[v].items() if w != u}
+        if not targets:
+            continue
+
+        dist = _witness_search(out_adj, u, v, targets)
+        for w, cost in targets.items():
+            if dist.get(w, math.inf) > cost:
+                shortcuts.append((u, w, cost, arc_uv, out_adj[v][w][1]))
+
+    return shortcuts
+
+
+def _csr(adjacency: List[List[Tuple[int, float, int]]]) -> Tuple[np.ndarray, ...]:
+    indptr = np.zeros(len(adjacency) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in adjacency], out=indptr[1:])
+
+    flat = [arc for a in adjacency for arc in a]
+    nodes = np.array([a[0] for a in flat], dtype=np.int64)
+    weights = np.array([a[1] for a in flat], dtype=np.float64)
+    arcs = np.array([a[2] for a in flat], dtype=np.int64)
+
+    return indptr, nodes, weights, arcs
+
+
+class ContractionHierarchy:
+    """
+    A contraction hierarchy of a road map for one weight, to answer many shortest path
+    queries on a map that does not change.
+
+    Building the hierarchy contracts the nodes one at a time, adding shortcut arcs
+    that keep the shortest paths between the remaining nodes. A query is then a
+    bidirectional Dijkstra search that only climbs to more important nodes, which
+    settles far fewer nodes than a Dijkstra search of the map. Shortcuts are unpacked
+    into the roads they stand for.
+
+    Args:
+        weight: The weight the hierarchy was built for
+        arrays: The arrays of the hierarchy, as made by build
+
+    Attributes:
+        weight: The weight the hierarchy was built for
+        arrays: The arrays of the hierarchy
+    """
+
+    def __init__(self, weight: str, arrays: Dict[str, np.ndarray]):
+        missing = set(_ARRAY_NAMES) - set(arrays)
+        if missing:
+            raise ValueError(f"contraction hierarchy is missing arrays {missing}")
+
+        self.weight = weight
+        self.arrays = arrays
+
+        self._open()
+
+    def _open(self) -> None:
+        a = self.arrays
+        self._up = (a["up_indptr"].data, a["up_targets"].data, a["up_weights"].data)
+        self._down = (
+            a["down_indptr"].data,
+            a["down_sources"].data,
+            a["down_weights"].data,
+        )
+
+        # built on first use
+        self._node_index: Optional[Dict[Any, int]] = None
+
+    def __getstate__(self):
+        # memoryviews can't be pickled
+        return {"weight": self.weight, "arrays": self.arrays}
+
+    def __setstate__(self, state):
+        self.weight = state["weight"]
+        self.arrays = state["arrays"]
+        self._open()
+
+    @classmethod
+    def build(cls, map_arrays: MapArrays, weight: str) -> ContractionHierarchy:
+        """
+        Build the contraction hierarchy of a map; roads without a weight are left out
+
+        Args:
+            map_arrays: The map arrays
+            weight: The name of the weight
+
+        Returns:
+            The contraction hierarchy
+        """
+        if weight not in map_arrays.weights:
+            raise ValueError(f"weight {weight} is not a valid weight of the map")
+
+        edge_weights = map_arrays.weights[weight]
+        if np.any(edge_weights < 0):
+            raise ValueError("contraction hierarchies need non-negative weights")
+
+        n_nodes = len(map_arrays.node_ids)
+
+        out_adj: _Adjacency = [{} for _ in range(n_nodes)]
+        in_adj: _Adjacency = [{} for _ in range(n_nodes)]
+
+        # each arc is a road or a shortcut over two other arcs
+        arc_edges: List[int] = []
+        arc_children: List[Tuple[int, int]] = []
+
+        for i, (u, v, w) in enumerate(
+            zip(
+                map_arrays.edge_sources.tolist(),
+                map_arrays.edge_targets.tolist(),
+                edge_weights.tolist(),
+            )
+        ):
+            if u == v or math.isnan(w):
+                continue
+            # keep the cheapest of parallel roads
+            if w < out_adj[u].get(v, (math.inf, -1))[0]:
+                out_adj[u][v] = in_adj[v][u] = (w, len(arc_edges))
+                arc_edges.append(i)
+                arc_children.append((-1, -1))
+
+        # the arcs to more important nodes, leaving and entering each node
+        up: List[List[Tuple[int, float, int]]] = [[] for _ in range(n_nodes)]
+        down: List[List[Tuple[int, float, int]]] = [[] for _ in range(n_nodes)]
+
+        contracted_neighbors = [0] * n_nodes
+        level = [0] * n_nodes
+
+        # contract nodes that add few shortcuts first, spreading the contraction over
+        # the map and keeping the hierarchy shallow
+        def priority(v: int, shortcuts: List[Tuple[int, int, float, int, int]]) -> int:
+            edge_difference = 2 * len(shortcuts) - len(in_adj[v]) - len(out_adj[v])
+            return edge_difference + contracted_neighbors[v] + level[v]
+
+        queue = [
+            (priority(v, _shortcuts(out_adj, in_adj, v)), v) for v in range(n_nodes)
+        ]
+        heapq.heapify(queue)
+
+        while queue:
+            _, v = heapq.heappop(queue)
+
+            # priorities go stale as the graph changes; update them as they come up
+            shortcuts = _shortcuts(out_adj, in_adj, v)
+            p = priority(v, shortcuts)
+            if queue and p > queue[0][0]:
+                heapq.heappush(queue, (p, v))
+                continue
+
+            for u, w, cost, first, second in shortcuts:
+                if cost < out_adj[u].get(w, (math.inf, -1))[0]:
+                    out_adj[u][w] = in_adj[w][u] = (cost, len(arc_edges))
+                    arc_edges.append(-1)
+                    arc_children.append((first, second))
+
+            for w, (cost, arc) in out_adj[v].items():
+                up[v].append((w, cost, arc))
+                del in_adj[w][v]
+                contracted_neighbors[w] += 1
+                level[w] = max(level[w], level[v] + 1)
+
+            for u, (cost, arc) in in_adj[v].items():
+                down[v].append((u, cost, arc))
+                del out_adj[u][v]
+                contracted_neighbors[u] += 1
+                level[u] = max(level[u], level[v] + 1)
+
+            out_adj[v] = {}
+            in_adj[v] = {}
+
+        up_indptr, up_targets, up_weights, up_arcs = _csr(up)
+        down_indptr, down_sources, down_weights, down_arcs = _csr(down)
+
+        arrays = {
+            "node_ids": map_arrays.node_ids,
+            "edge_sources": map_arrays.edge_sources,
+            "edge_targets": map_arrays.edge_targets,
+            "edge_keys": map_arrays.edge_keys,
+            "up_indptr": up_indptr,
+            "up_targets": up_targets,
+            "up_weights": up_weights,
+            "up_arcs": up_arcs,
+            "down_indptr": down_indptr,
+            "down_sources": down_sources,
+            "down_weights": down_weights,
+            "down_arcs": down_arcs,
+            "arc_edges": np.array(arc_edges, dtype=np.int64),
+            "arc_children": np.array(arc_children, dtype=np.int64).reshape(-1, 2),
+        }
+
+        return cls(weight, arrays)
+
+    @classmethod
+    def from_map(
+        cls, road_map: MapInterface, weight: Optional[str] = None
+    ) -> ContractionHierarchy:
+        """
+        Build the contraction hierarchy of a map, like an NxMap or an IGraphMap
+
+        Args:
+            road_map: The map
+            weight: The name of the weight; defaults to the time weight of the map
+
+        Returns:
+            The contraction hierarchy
+        """
+        if weight is None:
+            weight = road_map.time_weight
+
+        return cls.build(MapArrays.from_map(road_map), weight)
+
+    @classmethod
+    def for_map_file(
+        cls,
+        road_map: MapInterface,
+        map_file: Union[str, Path],
+        weight: Optional[str] = None,
+    ) -> ContractionHierarchy:
+        """
+        Load the contraction hierarchy saved next to a map file, or build it and save it
+        there if it does not exist or is older than the map file
+
+        Args:
+            road_map: The map, as loaded from the map file
+            map_file: The map file
+            weight: The name of the weight; defaults to the time weight of the map
+
+        Returns:
+            The contraction hierarchy
+        """
+        if weight is None:
+            weight = road_map.time_weight
+
+        map_file = Path(map_file)
+        ch_file = contraction_hierarchy_file(map_file, weight)
+
+        if ch_file.exists() and ch_file.stat().st_mtime >= map_file.stat().st_mtime:
+            return cls.from_file(ch_file)
+
+        ch = cls.from_map(road_map, weight)
+        ch.to_file(ch_file)
+
+        return ch
+
+    @classmethod
+    def from_file(cls, file: Union[str, Path]) -> ContractionHierarchy:
+        """
+        Load a contraction hierarchy from a .npz file
+
+        Args:
+            file: The file to load
+
+        Returns:
+            The contraction hierarchy
+        """
+        with np.load(file, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in _ARRAY_NAMES}
+            weight = str(data["weight"])
+
+        return cls(weight, arrays)
+
+    def to_file(self, outfile: Union[str, Path]):
+        """
+        Save the contraction hierarchy to a .npz file
+
+        Args:
+            outfile: The file to save to
+        """
+        with open(outfile, "wb") as f:
+            np.savez(f, weight=np.array(self.weight), **self.arrays)  # type: ignore[arg-type]
+
+    def _node(self, node_id: Any) -> Optional[int]:
+        if self._node_index is None:
+            self._node_index = {
+                n: i for i, n in enumerate(self.arrays["node_ids"].tolist())
+            }
+        return self._node_index.get(node_id)
+
+    def _search(self, source: int, target: int) -> Optional[List[int]]:
+        """
+        The arcs of the shortest path from source to target, or None if there is no path
+        """
+        inf = math.inf
+
+        dist: Tuple[Dict[int, float], Dict[int, float]] = ({source: 0.0}, {target: 0.0})
+        # the node each reached node was reached from, and the slot that was taken
+        pred: Tuple[Dict[int, Tuple[int, int]], Dict[int, Tuple[int, int]]] = ({}, {})
+        settled: Tuple[Set[int], Set[int]] = (set(), set())
+        heaps = ([(0.0, source)], [(0.0, target)])
+        graphs = (self._up, self._down)
+
+        best = 0.0 if source == target else inf
+        meet = source
+
+        searching = True
+        while searching:
+            searching = False
+            for side in (0, 1):
+                heap = heaps[side]
+                # a search is done once it can't find a shorter path
+                if not heap or heap[0][0] >= best:
+                    continue
+                searching = True
+
+                d, u = heapq.heappop(heap)
+                if u in settled[side]:
+                    continue
+                settled[side].add(u)
+
+                side_dist = dist[side]
+                other_dist = dist[1 - side]
+
+                # a node is stalled if a more important node reaches it for less;
+                # the search can't go through it on a shortest path
+                indptr, nodes, weights = graphs[1 - side]
+                if any(
+                    side_dist.get(nodes[slot], inf) + weights[slot] < d
+                    for slot in range(indptr[u], indptr[u + 1])
+                ):
+                    continue
+
+                indptr, nodes, weights = graphs[side]
+                for slot in range(indptr[u], indptr[u + 1]):
+                    v = nodes[slot]
+                    nd = d + weights[slot]
+                    if nd < side_dist.get(v, inf):
+                        side_dist[v] = nd
+                        pred[side][v] = (u, slot)
+                        heapq.heappush(heap, (nd, v))
+
+                        total = nd + other_dist.get(v, inf)
+                        if total < best:
+                            best = total
+                            meet = v
+
+        if best == inf:
+            return None
+
+        up_arcs = self.arrays["up_arcs"]
+        down_arcs = self.arrays["down_arcs"]
+
+        arcs = []
+        node = meet
+        while node != source:
+            node, slot = pred[0][node]
+            arcs.append(int(up_arcs[slot]))
+        arcs.reverse()
+
+        node = meet
+        while node != target:
+            node, slot = pred[1][node]
+            arcs.append(int(down_arcs[slot]))
+
+        return arcs
+
+    def _unpack(self, arcs: List[int]) -> List[int]:
+        """
+        Replace the shortcuts in a list of arcs with the roads they stand for
+        """
+        arc_edges = self.arrays["arc_edges"]
+        arc_children = self.arrays["arc_children"]
+
+        edges = []
+        stack = arcs[::-1]
+        while stack:
+            arc = stack.pop()
+            edge = arc_edges[arc]
+            if edge >= 0:
+                edges.append(int(edge))
+            else:
+                first, second = arc_children[arc]
+                stack.append(int(second))
+                stack.append(int(first))
+
+        return edges
+
+    def shortest_path(self, origin: Any, destination: Any) -> Optional[List[RoadId]]:
+        """
+        Find the shortest path between two nodes of the map
+
+        Args:
+            origin: The id of the origin node
+            destination: The id of the destination node
+
+        Returns:
+            The ids of the roads on the path, or None if there is no path
+        """
+        source = self._node(origin)
+        target = self._node(destination)
+        if source is None or target is None:
+            return None
+
+        arcs = self._search(source, target)
+        if arcs is None:
+            return None
+
+        a = self.arrays
+        node_ids = a["node_ids"]
+
+        return [
+            RoadId(
+                node_ids[a["edge_sources"][e]].item(),
+                node_ids[a["edge_targets"][e]].item(),
+                a["edge_keys"][e].item(),
+            )
+            for e in self._unpack(arcs)
+        ]
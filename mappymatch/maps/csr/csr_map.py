@@ -0,0 +1,549 @@
+from __future__ import annotations
+
+import heapq
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from shapely.geometry import LineString
+from shapely.strtree import STRtree
+
+from mappymatch.constructs.coordinate import Coordinate
+from mappymatch.constructs.road import Road, RoadId
+from mappymatch.maps.grid_index import GridIndex
+from mappymatch.maps.map_arrays import _WEIGHT_PREFIX, MapArrays
+from mappymatch.maps.map_interface import (
+    MapInterface,
+    RoadCandidates,
+    coordinate_points,
+    query_candidates,
+)
+from mappymatch.maps.path_cache import ShortestPathCache
+
+# the prefixes of the routing and grid index arrays among the packed arrays of a map
+_CSR_PREFIX = "csr/"
+_GRID_PREFIX = "grid/"
+
+
+def dijkstra(
+    indptr: memoryview,
+    targets: memoryview,
+    weights: memoryview,
+    source: int,
+    target: int,
+) -> Optional[List[int]]:
+    """
+    Find the shortest path between two nodes of a graph in compressed sparse row form;
+    the search stops as soon as the target is reached.
+
+    The outgoing edges of node u are the slots indptr[u] to indptr[u + 1] of the
+    targets and weights. Edges with a NaN weight are never taken.
+
+    Args:
+        indptr: The first slot of each node, followed by the total number of slots
+        targets: The node each slot leads to
+        weights: The non-negative weight of each slot
+        source: The node to start from
+        target: The node to reach
+
+    Returns:
+        The slots of the path, in order, or None if the target can't be reached
+    """
+    inf = float("inf")
+
+    # only the nodes that are reached are stored, so a search costs the same
+    # no matter how large the graph is
+    dist: Dict[int, float] = {source: 0.0}
+    # the node each reached node was reached from, and the slot that was taken
+    pred: Dict[int, Tuple[int, int]] = {}
+    settled = set()
+
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u == target:
+            break
+        if u in settled:
+            continue
+        settled.add(u)
+
+        for slot in range(indptr[u], indptr[u + 1]):
+            v = targets[slot]
+            nd = d + weights[slot]
+            if nd < dist.get(v, inf):
+                dist[v] = nd
+                pred[v] = (u, slot)
+                heapq.heappush(heap, (nd, v))
+    else:
+        return None
+
+    path = []
+    node = target
+    while node != source:
+        node, slot = pred[node]
+        path.append(slot)
+
+    path.reverse()
+    return path
+
+
+def csr_arrays(arrays: MapArrays, weights: Sequence[str] = ()) -> Dict[str, np.ndarray]:
+    """
+    The routing arrays of a map: the roads sorted by start node, so that the outgoing
+    roads of node u are edges[indptr[u]:indptr[u + 1]], the node each of them leads to
+    and, for each of the given weights, their weights
+
+    Args:
+        arrays: The map arrays
+        weights: The names of the weights to include
+
+    Returns:
+        The indptr, edges, targets and weights/<name> arrays
+    """
+    n_nodes = len(arrays.node_ids)
+    edges = np.argsort(arrays.edge_sources, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(arrays.edge_sources, minlength=n_nodes), out=indptr[1:])
+
+    csr = {
+        "indptr": indptr,
+        "edges": edges,
+        "targets": arrays.edge_targets[edges],
+    }
+    for name in weights:
+        csr[_WEIGHT_PREFIX + name] = np.ascontiguousarray(
+            arrays.weights[name][edges], dtype=np.float64
+        )
+
+    return csr
+
+
+def packed_arrays(
+    arrays: MapArrays, cell_size: Optional[float] = None
+) -> Dict[str, np.ndarray]:
+    """
+    The named arrays of a map along with its routing arrays, for every weight, and a
+    grid spatial index, so that a map can be set up from them without building anything
+
+    Args:
+        arrays: The map arrays
+        cell_size: The cell size of the grid index, in the units of the map crs;
+            by default there are about as many cells as roads
+
+    Returns:
+        The named arrays
+    """
+    named_arrays = arrays.to_arrays()
+    for name, a in csr_arrays(arrays, list(arrays.weights)).items():
+        named_arrays[_CSR_PREFIX + name] = a
+    for name, a in GridIndex.build(arrays, cell_size).items():
+        named_arrays[_GRID_PREFIX + name] = a
+
+    return named_arrays
+
+
+class CSRMap(MapInterface):
+    """
+    A read-only road map that holds its graph in compressed sparse row arrays
+    and its road geometries in flat coordinate arrays.
+
+    Shortest paths are found with an array based Dijkstra search and Road objects are
+    only built for the roads that are returned; each road is built once and cached.
+
+    A map set up from packed arrays, like a SharedMap or a MappedMap, finds nearby roads
+    with the grid index among them; of roads at the same distance from a point, the one
+    with the lowest edge index is nearest. Otherwise an STRtree is built on first use.
+
+    Args:
+        arrays: The map arrays
+
+    Attributes:
+        arrays: The map arrays
+        crs: The coordinate reference system of the map
+    """
+
+    def __init__(self, arrays: MapArrays):
+        self._setup(arrays, csr_arrays(arrays))
+
+    def _setup(
+        self,
+        arrays: MapArrays,
+        csr: Dict[str, np.ndarray],
+        grid: Optional[Dict[str, np.ndarray]] = None,
+    ):
+        self.arrays = arrays
+        self.crs = arrays.crs
+
+        self._indptr = csr["indptr"]
+        self._csr_edges = csr["edges"]
+        self._csr_targets = csr["targets"]
+        self._csr_weights: Dict[str, np.ndarray] = {
+            name[len(_WEIGHT_PREFIX) :]: a
+            for name, a in csr.items()
+            if name.startswith(_WEIGHT_PREFIX)
+        }
+
+        # without a grid index, an STRtree is built on first use
+        self._grid_index = None if grid is None else GridIndex(arrays, grid)
+        self._rtree: Optional[STRtree] = None
+        self._road_index: Optional[Dict[RoadId, int]] = None
+        self._road_cache: Dict[int, Road] = {}
+
+        self._path_cache: Optional[ShortestPathCache] = None
+
+    def _setup_packed(self, named_arrays: Dict[str, np.ndarray]):
+        """
+        Set up the map from the arrays made by packed_arrays, using them in place
+        """
+        map_arrays: Dict[str, np.ndarray] = {}
+        csr: Dict[str, np.ndarray] = {}
+        grid: Dict[str, np.ndarray] = {}
+        for name, a in named_arrays.items():
+            if name.startswith(_CSR_PREFIX):
+                csr[name[len(_CSR_PREFIX) :]] = a
+            elif name.startswith(_GRID_PREFIX):
+                grid[name[len(_GRID_PREFIX) :]] = a
+            else:
+                map_arrays[name] = a
+
+        self._setup(MapArrays.from_arrays(map_arrays), csr, grid)
+
+    def _drop_arrays(self):
+        """
+        Drop every view of the map arrays, so that the memory they are views of can be
+        released
+        """
+        del self.arrays
+        del self._indptr, self._csr_edges, self._csr_targets
+        self._csr_weights = {}
+        self._grid_index = None
+        self._road_cache = {}
+
+    @classmethod
+    def from_map(cls, road_map: MapInterface) -> CSRMap:
+        """
+        Build a CSRMap from another map, like an NxMap or an IGraphMap
+
+        Args:
+            road_map: The map to convert
+
+        Returns:
+            A CSRMap with the same roads
+        """
+        return cls(MapArrays.from_map(road_map))
+
+    @classmethod
+    def from_file(cls, file: Union[str, Path]) -> CSRMap:
+        """
+        Load a map from a .npz map file, as written by the to_file method of any map
+
+        Args:
+            file: The map file to load
+
+        Returns:
+            A CSRMap with the roads of the file
+        """
+        return cls(MapArrays.from_file(file))
+
+    def to_file(self, outfile: Union[str, Path]):
+        """
+        Save the map to a .npz map file, which NxMap and IGraphMap can also read
+
+        Args:
+            outfile: The file to save the map to
+        """
+        self.arrays.to_file(outfile)
+
+    def __str__(self):
+        output_lines = [
+            f"Mappymatch {type(self).__name__} object:\n",
+            f" - roads: {self.arrays.n_roads} Road objects",
+        ]
+        return "\n".join(output_lines)
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def distance_weight(self) -> str:
+        return self.arrays.distance_weight
+
+    @property
+    def time_weight(self) -> str:
+        return self.arrays.time_weight
+
+    @property
+    def path_cache(self) -> Optional[ShortestPathCache]:
+        """
+        The shortest path cache, or None if paths are not cached
+        """
+        return self._path_cache
+
+    def set_path_cache_size(self, capacity: Optional[int]):
+        """
+        Cache up to `capacity` shortest paths, keyed by (origin node, destination node, weight);
+        any previously cached paths are dropped.
+
+        Args:
+            capacity: The maximum number of paths to cache, or None to disable the cache
+
+        Returns:
+            None
+        """
+        if capacity is None:
+            self._path_cache = None
+        else:
+            self._path_cache = ShortestPathCache(capacity)
+
+    def __getstate__(self):
+        # the cached roads are rebuilt on demand rather than pickled
+        state = self.__dict__.copy()
+        state.pop("_road_cache", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._road_cache = {}
+
+    def _build_road(self, edge_index: int) -> Road:
+        """
+        Build the road at an edge index, decoding its geometry and metadata from the
+        arrays; roads are cached, so each road is only decoded once
+        """
+        road = self._road_cache.get(edge_index)
+        if road is not None:
+            return road
+
+        a = self.arrays
+        start, end = a.geometry_offsets[edge_index], a.geometry_offsets[edge_index + 1]
+        geom = LineString(a.geometry_coords[start:end])
+
+        road = Road(a.road_id(edge_index), geom, metadata=a.road_metadata(edge_index))
+        self._road_cache[edge_index] = road
+
+        return road
+
+    @property
+    def grid_index(self) -> Optional[GridIndex]:
+        """
+        The grid spatial index of the map, or None if the map uses an STRtree
+        """
+        return self._grid_index
+
+    @property
+    def rtree(self) -> STRtree:
+        """
+        The spatial index of the road geometries
+        """
+        if self._rtree is None:
+            self._rtree = STRtree(self.arrays.geometries())
+        return self._rtree
+
+    def road_by_id(self, road_id: RoadId) -> Optional[Road]:
+        """
+        Get a road by its id
+
+        Args:
+            road_id: The id of the road to get
+
+        Returns:
+            The road with the given id, or None if it does not exist
+        """
+        if self._road_index is None:
+            self._road_index = {
+                self.arrays.road_id(i): i for i in range(self.arrays.n_roads)
+            }
+
+        edge_index = self._road_index.get(road_id)
+        if edge_index is None:
+            return None
+
+        return self._build_road(edge_index)
+
+    @property
+    def roads(self) -> List[Road]:
+        return [self._build_road(i) for i in range(self.arrays.n_roads)]
+
+    def _nearest_edge_index(self, coord: Coordinate) -> int:
+        if coord.crs != self.crs:
+            raise ValueError(
+                f"crs of origin {coord.crs} must match crs of map {self.crs}"
+            )
+
+        if self._grid_index is not None:
+            return int(self._grid_index.nearest(np.array([coord.geom]))[0])
+
+        nearest_idx = self.rtree.nearest(coord.geom)
+        if nearest_idx is None:
+            raise ValueError(f"No roads found for {coord}")
+
+        return int(nearest_idx)
+
+    def nearest_road(self, coord: Coordinate) -> Road:
+        """
+        A helper function to get the nearest road.
+
+        Args:
+            coord: The coordinate to find the nearest road to
+
+        Returns:
+            The nearest road to the coordinate
+        """
+        return self._build_road(self._nearest_edge_index(coord))
+
+    def nearest_roads(self, coords: Sequence[Coordinate]) -> List[Road]:
+        """
+        Get the nearest road to each of a sequence of coordinates, looking up all the
+        coordinates in the spatial index at once; each road is built once, however
+        many coordinates it is nearest to
+
+        Args:
+            coords: The coordinates to find the nearest roads to, like the coords of a trace
+
+        Returns:
+            The nearest road to each coordinate, in order
+        """
+        points = coordinate_points(coords, self.crs)
+        if len(points) == 0:
+            return []
+
+        if self._grid_index is not None:
+            nearest = self._grid_index.nearest(points)
+        else:
+            nearest = self.rtree.nearest(points)
+
+        nearest_idx, inverse = np.unique(nearest, return_inverse=True)
+        roads = [self._build_road(i) for i in nearest_idx.tolist()]
+
+        return [roads[i] for i in inverse.tolist()]
+
+    def road_by_index(self, edge_index: int) -> Road:
+        """
+        Get a road by its edge index, as given by candidate_roads
+
+        Args:
+            edge_index: The edge index of the road
+
+        Returns:
+            The road
+        """
+        return self._build_road(edge_index)
+
+    def candidate_roads(
+        self,
+        coords: Sequence[Coordinate],
+        radius: float,
+        k: Optional[int] = None,
+    ) -> RoadCandidates:
+        """
+        Find the roads within a radius of each of a sequence of coordinates with one
+        bulk query of the spatial index, without building Road objects;
+        use road_by_index for the candidates that are needed
+
+        Args:
+            coords: The coordinates, like the coords of a trace
+            radius: The search radius, in the units of the map crs
+            k: The maximum number of candidates per coordinate, nearest first,
+                or None to keep all
+
+        Returns:
+            The candidates
+        """
+        points = coordinate_points(coords, self.crs)
+        if self._grid_index is not None:
+            return self._grid_index.candidates(points, radius, k)
+        return query_candidates(self.rtree, points, radius, k)
+
+    def _nearest_node(self, edge_index: int, coord: Coordinate) -> int:
+        """
+        The node of a road that is closest to a coordinate, preferring the start node
+        """
+        a = self.arrays
+        coords = a.geometry_coords
+        first = coords[a.geometry_offsets[edge_index]]
+        last = coords[a.geometry_offsets[edge_index + 1] - 1]
+
+        u_dist = np.sqrt((first[0] - coord.x) ** 2 + (first[1] - coord.y) ** 2)
+        v_dist = np.sqrt((last[0] - coord.x) ** 2 + (last[1] - coord.y) ** 2)
+
+        if u_dist <= v_dist:
+            return int(a.edge_sources[edge_index])
+        else:
+            return int(a.edge_targets[edge_index])
+
+    def _slot_weights(self, weight: str) -> np.ndarray:
+        """
+        The weights of the roads in CSR order
+        """
+        slot_weights = self._csr_weights.get(weight)
+        if slot_weights is None:
+            slot_weights = np.ascontiguousarray(
+                self.arrays.weights[weight][self._csr_edges], dtype=np.float64
+            )
+            self._csr_weights[weight] = slot_weights
+        return slot_weights
+
+    def shortest_path(
+        self,
+        origin: Coordinate,
+        destination: Coordinate,
+        weight: Optional[Union[str, Callable]] = None,
+    ) -> List[Road]:
+        """
+        Computes the shortest path between an origin and a destination
+
+        Args:
+            origin: The origin coordinate
+            destination: The destination coordinate
+            weight: The weight to use for the path, the name of the distance or time weight
+
+        Returns:
+            A list of roads that form the shortest path, empty if there is no path
+        """
+        if weight is None:
+            weight = self.time_weight
+
+        if callable(weight):
+            raise NotImplementedError(
+                f"{type(self).__name__} does not support custom weights"
+            )
+
+        if weight not in self.arrays.weights:
+            raise ValueError(f"weight {weight} is not a valid weight of the map")
+
+        if origin.crs != self.crs:
+            raise ValueError(
+                f"crs of origin {origin.crs} must match crs of map {self.crs}"
+            )
+        elif destination.crs != self.crs:
+            raise ValueError(
+                f"crs of destination {destination.crs} must match crs of map {self.crs}"
+            )
+
+        origin_node = self._nearest_node(self._nearest_edge_index(origin), origin)
+        dest_node = self._nearest_node(
+            self._nearest_edge_index(destination), destination
+        )
+
+        if self._path_cache is not None:
+            cached_path = self._path_cache.get(origin_node, dest_node, weight)
+            if cached_path is not None:
+                return cached_path
+
+        slots = dijkstra(
+            self._indptr.data,
+            self._csr_targets.data,
+            self._slot_weights(weight).data,
+            origin_node,
+            dest_node,
+        )
+
+        if slots is None:
+            roads = []
+        else:
+            roads = [self._build_road(int(self._csr_edges[s])) for s in slots]
+
+        if self._path_cache is not None:
+            self._path_cache.put(origin_node, dest_node, weight, roads)
+
+        return roads
@@ -0,0 +1,263 @@
+from __future__ import annotations
+
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import shapely
+
+from mappymatch.maps.map_arrays import MapArrays
+from mappymatch.maps.map_interface import RoadCandidates, rank_candidates
+
+
+def _road_bounds(arrays: MapArrays) -> np.ndarray:
+    """
+    The min x, min y, max x, max y of each road geometry, as an (n_roads, 4) array
+    """
+    starts = arrays.geometry_offsets[:-1]
+    x = arrays.geometry_coords[:, 0]
+    y = arrays.geometry_coords[:, 1]
+
+    return np.column_stack(
+        (
+            np.minimum.reduceat(x, starts),
+            np.minimum.reduceat(y, starts),
+            np.maximum.reduceat(x, starts),
+            np.maximum.reduceat(y, starts),
+        )
+    )
+
+
+def _ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    The integers starts[i], ..., starts[i] + counts[i] - 1 of every range, concatenated
+    """
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+
+class GridIndex:
+    """
+    A spatial index of road geometries held in flat arrays, so that it can be saved
+    with a map and used in place from a memory mapped file.
+
+    The extent of the roads is split into square cells and each road is listed in every
+    cell its bounding box overlaps; the roads of cell c are
+    cell_edges[cell_indptr[c]:cell_indptr[c + 1]], with cells numbered row by row.
+    Only the geometries of the roads near a query are built, and each of them is kept
+    for later queries.
+
+    Args:
+        map_arrays: The map arrays of the roads
+        arrays: The index arrays, as made by build
+
+    Attributes:
+        map_arrays: The map arrays of the roads
+        origin: The x, y of the corner of the first cell
+        cell_size: The width and height of a cell
+        shape: The number of cells along x and along y
+        cell_indptr: The first slot of each cell in cell_edges, followed by the total
+        cell_edges: The roads of each cell
+    """
+
+    def __init__(self, map_arrays: MapArrays, arrays: Dict[str, np.ndarray]):
+        self.map_arrays = map_arrays
+        self.origin = arrays["origin"]
+        self.cell_size = float(arrays["cell_size"])
+        self.shape = arrays["shape"]
+        self.cell_indptr = arrays["cell_indptr"]
+        self.cell_edges = arrays["cell_edges"]
+
+        # the road geometries built so far
+        self._geoms = np.empty(map_arrays.n_roads, dtype=object)
+        self._built = np.zeros(map_arrays.n_roads, dtype=bool)
+
+    @staticmethod
+    def build(
+        map_arrays: MapArrays, cell_size: Optional[float] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Build the index arrays of a map
+
+        Args:
+            map_arrays: The map arrays
+            cell_size: The width and height of a cell; by default there are about as
+                many cells as roads
+
+        Returns:
+            The origin, cell_size, shape, cell_indptr and cell_edges arrays
+        """
+        if map_arrays.n_roads == 0:
+            raise ValueError("No roads found in map; cannot build spatial index")
+
+        bounds = _road_bounds(map_arrays)
+        origin = bounds[:, :2].min(axis=0)
+        extent = bounds[:, 2:].max(axis=0) - origin
+
+        if cell_size is None:
+            cell_size = float(np.sqrt(extent[0] * extent[1] / map_arrays.n_roads))
+            if cell_size <= 0:
+                cell_size = float(max(extent.max(), 1.0))
+        elif cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+
+        shape = (extent // cell_size).astype(np.int64) + 1
+
+        # the range of cells each road overlaps, and one row per (road, cell) pair
+        low = ((bounds[:, :2] - origin) // cell_size).astype(np.int64)
+        high = ((bounds[:, 2:] - origin) // cell_size).astype(np.int64)
+        widths = high[:, 0] - low[:, 0] + 1
+        counts = widths * (high[:, 1] - low[:, 1] + 1)
+
+        edges = np.repeat(np.arange(map_arrays.n_roads), counts)
+        within = _ranges(np.zeros_like(counts), counts)
+        cx = low[edges, 0] + within % widths[edges]
+        cy = low[edges, 1] + within // widths[edges]
+        cells = cy * shape[0] + cx
+
+        order = np.argsort(cells, kind="stable")
+        cell_indptr = np.zeros(int(shape[0] * shape[1]) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(cells, minlength=len(cell_indptr) - 1), out=cell_indptr[1:]
+        )
+
+        return {
+            "origin": origin,
+            "cell_size": np.array(cell_size),
+            "shape": shape,
+            "cell_indptr": cell_indptr,
+            "cell_edges": edges[order],
+        }
+
+    def _nearby(
+        self, points: np.ndarray, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The (point, road) pairs whose cells are within the radius box of the point;
+        each pair is listed once
+        """
+        xy = shapely.get_coordinates(points)
+        n_x, n_y = int(self.shape[0]), int(self.shape[1])
+
+        low = np.floor((xy - radius - self.origin) / self.cell_size).astype(np.int64)
+        high = np.floor((xy + radius - self.origin) / self.cell_size).astype(np.int64)
+        low = np.maximum(low, 0)
+        high = np.minimum(high, [n_x - 1, n_y - 1])
+
+        # one row of cells per point and row; the cells of a row are contiguous in
+        # cell_edges, so each gives one range of slots
+        valid = np.flatnonzero((low <= high).all(axis=1))
+        low, high = low[valid], high[valid]
+        n_rows = high[:, 1] - low[:, 1] + 1
+        row_point = np.repeat(np.arange(len(valid)), n_rows)
+        row = _ranges(low[:, 1], n_rows)
+
+        first = self.cell_indptr[row * n_x + low[row_point, 0]]
+        last = self.cell_indptr[row * n_x + high[row_point, 0] + 1]
+        counts = last - first
+
+        point_index = np.repeat(valid[row_point], counts)
+        edge_index = self.cell_edges[_ranges(first, counts)]
+
+        # a road that spans several cells is listed in each of them
+        pairs = np.unique(point_index * self.map_arrays.n_roads + edge_index)
+        return pairs // self.map_arrays.n_roads, pairs % self.map_arrays.n_roads
+
+    def _geometries(self, edge_indices: np.ndarray) -> np.ndarray:
+        """
+        The geometries of some roads, building the ones that haven't been built yet
+        """
+        missing = edge_indices[~self._built[edge_indices]]
+        if len(missing) > 0:
+            self._geoms[missing] = self.map_arrays.geometries(missing)
+            self._built[missing] = True
+
+        return self._geoms[edge_indices]
+
+    def query(
+        self, points: np.ndarray, radius: float
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the roads within a radius of each point
+
+        Args:
+            points: The shapely points
+            radius: The search radius
+
+        Returns:
+            The point index, edge index, road geometry and distance of each
+            (point, road) pair within the radius
+        """
+        point_index, edge_index = self._nearby(points, radius)
+
+        unique_edges, inverse = np.unique(edge_index, return_inverse=True)
+        geoms = self._geometries(unique_edges)[inverse]
+        distance = shapely.distance(geoms, points[point_index])
+
+        within = distance <= radius
+        return (
+            point_index[within],
+            edge_index[within],
+            geoms[within],
+            distance[within],
+        )
+
+    def candidates(
+        self, points: np.ndarray, radius: float, k: Optional[int] = None
+    ) -> RoadCandidates:
+        """
+        Find the roads within a radius of each point, like query_candidates does with
+        an STRtree
+
+        Args:
+            points: The shapely points
+            radius: The search radius
+            k: The maximum number of candidates to keep per point, or None to keep all
+
+        Returns:
+            The candidates
+        """
+        if radius < 0:
+            raise ValueError("radius must be non-negative")
+        if k is not None and k < 1:
+            raise ValueError("k must be at least 1")
+
+        point_index, edge_index, geoms, distance = self.query(points, radius)
+
+        return rank_candidates(
+            point_index, edge_index, geoms, points[point_index], distance, k
+        )
+
+    def nearest(self, points: np.ndarray) -> np.ndarray:
+        """
+        Find the nearest road to each point; of roads at the same distance, the one
+        with the lowest edge index is nearest
+
+        Args:
+            points: The shapely points
+
+        Returns:
+            The edge index of the nearest road to each point
+        """
+        if not np.isfinite(shapely.get_coordinates(points)).all():
+            raise ValueError("points must have finite coordinates")
+
+        nearest = np.full(len(points), -1, dtype=np.int64)
+        remaining = np.arange(len(points))
+        radius = self.cell_size
+
+        # widen the search until every point has a road within the radius;
+        # the nearest road within the radius is then the nearest road of all
+        while len(remaining) > 0:
+            point_index, edge_index, _, distance = self.query(points[remaining], radius)
+
+            order = np.lexsort((edge_index, distance, point_index))
+            point_index = point_index[order]
+            first = np.ones(len(order), dtype=bool)
+            first[1:] = point_index[1:] != point_index[:-1]
+
+            nearest[remaining[point_index[first]]] = edge_index[order][first]
+
+            remaining = remaining[nearest[remaining] < 0]
+            radius *= 2
+
+        return nearest
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from shapely.geometry import LineString
+
+# keeps the scaled straight line distance below the road weight despite rounding
+_SCALE_MARGIN = 1 - 1e-9
+
+
+class EuclideanHeuristic:
+    """
+    An A* heuristic for road networks: the straight line distance between two nodes,
+    scaled by the smallest ratio of road weight to straight line road length.
+
+    Each road costs at least the scaled straight line distance between its nodes, so the
+    heuristic never overestimates the cost of a path, whatever the weight (a distance,
+    or a time, where the scale is one over the highest speed) and whatever the units
+    of the map crs.
+
+    Args:
+        positions: The x, y position of each node
+        scale: The cost per unit of straight line distance
+
+    Attributes:
+        positions: The x, y position of each node
+        scale: The cost per unit of straight line distance
+    """
+
+    def __init__(self, positions: Dict[Any, Tuple[float, float]], scale: float):
+        self.positions = positions
+        self.scale = scale
+
+    def __call__(self, u: Any, v: Any) -> float:
+        ux, uy = self.positions[u]
+        vx, vy = self.positions[v]
+        return self.scale * math.hypot(ux - vx, uy - vy)
+
+    @classmethod
+    def from_edges(
+        cls, edges: Iterable[Tuple[Any, Any, LineString, Optional[float]]]
+    ) -> EuclideanHeuristic:
+        """
+        Build the heuristic from the roads of a graph; the nodes are placed at the
+        ends of the road geometries
+
+        Args:
+            edges: The start node, end node, geometry and weight of each road
+
+        Returns:
+            The heuristic
+        """
+        positions: Dict[Any, Tuple[float, float]] = {}
+        weighted_edges = []
+
+        for u, v, geom, w in edges:
+            coords = geom.coords
+            positions.setdefault(u, coords[0][:2])
+            positions.setdefault(v, coords[-1][:2])
+            weighted_edges.append((u, v, w))
+
+        scale = math.inf
+        for u, v, w in weighted_edges:
+            if w is None or math.isnan(w):
+                continue
+
+            ux, uy = positions[u]
+            vx, vy = positions[v]
+            length = math.hypot(ux - vx, uy - vy)
+            if length > 0:
+                scale = min(scale, w / length)
+
+        if math.isinf(scale) or scale < 0:
+            # no usable weights; fall back to a search without a heuristic
+            scale = 0.0
+
+        return cls(positions, scale * _SCALE_MARGIN)
@@ -1,25 +1,34 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Set, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Union
 
 import igraph as ig
 import networkx as nx
+import numpy as np
 from shapely.geometry import Point
 from shapely.strtree import STRtree
 
 from mappymatch.constructs.coordinate import Coordinate
 from mappymatch.constructs.geofence import Geofence
-from mappymatch.constructs.road import Road, RoadId
+from mappymatch.constructs.road import Road, RoadId, RoadMetadata
+from mappymatch.maps.ch.contraction_hierarchy import ContractionHierarchy
+from mappymatch.maps.heuristics import EuclideanHeuristic
+from mappymatch.maps.landmarks import Landmarks
+from mappymatch.maps.map_arrays import MapArrays
 from mappymatch.maps.map_interface import (
     DEFAULT_DISTANCE_WEIGHT,
     DEFAULT_TIME_WEIGHT,
     MapInterface,
+    RoadCandidates,
+    coordinate_points,
+    query_candidates,
 )
 from mappymatch.maps.nx.readers.osm_readers import (
     NetworkType,
     nx_graph_from_osmnx,
 )
+from mappymatch.maps.path_cache import ShortestPathCache
 from mappymatch.utils.crs import CRS, LATLON_CRS
 
 DEFAULT_GEOMETRY_KEY = "geometry"
@@ -39,6 +48,8 @@ class IGraphMap(MapInterface):
         crs: The coordinate reference system of the map
     """
 
+    path_search_methods = ("dijkstra", "astar")
+
     def __init__(self, graph: ig.Graph):
         self.g = graph
 
@@ -104,17 +115,35 @@ class IGraphMap(MapInterface):
         # store the names of any additional added attributes
         self._additional_attribute_names: Set[str] = set()
 
+        self._path_cache: Optional[ShortestPathCache] = None
+
+        self._path_search = "dijkstra"
+        self._heuristics: Dict[str, EuclideanHeuristic] = {}
+        self._contraction_hierarchy: Optional[ContractionHierarchy] = None
+        self._landmarks: Optional[Landmarks] = None
+
+        self._road_cache: Dict[int, Road] = {}
+
         self._build_rtree()
 
-        # build mapping from mappymatch road id to igraph edge id
+        # build mapping from mappymatch road id to igraph edge id;
+        # the attributes are read a whole column at a time
+        node_ids = self.g.vs[self._node_id_name]
+        road_keys = self.g.es[self._edge_id_name]
         self.road_mapping = {}
-        for e in self.g.es:
-            source_node_id = e.source_vertex[self._node_id_name]
-            target_node_id = e.target_vertex[self._node_id_name]
-            road_key = e[self._edge_id_name]
+        for i, (u, v) in enumerate(self.g.get_edgelist()):
+            road_id = RoadId(node_ids[u], node_ids[v], road_keys[i])
+            self.road_mapping[road_id] = i
+
+    def __getstate__(self):
+        # the cached roads are rebuilt on demand rather than pickled
+        state = self.__dict__.copy()
+        state.pop("_road_cache", None)
+        return state
 
-            road_id = RoadId(source_node_id, target_node_id, road_key)
-            self.road_mapping[road_id] = e.index
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._road_cache = {}
 
     def _build_road(
         self,
@@ -123,47 +152,48 @@ class IGraphMap(MapInterface):
         """
         Build a road from a road id, pulling the edge data from the graph
 
+        Roads are cached until the road attributes change; their metadata holds the
+        attribute values of the road when it was built.
+
         Be sure to check if the road id (_has_road_id) is in the graph before calling this method
         """
+        road = self._road_cache.get(edge_index)
+        if road is not None:
+            return road
+
         edge = self.g.es[edge_index]
         source_node_id = edge.source_vertex[self._node_id_name]
         target_node_id = edge.target_vertex[self._node_id_name]
         road_key = edge[self._edge_id_name]
 
-        edge_data = edge.attributes()
-        metadata = edge_data.get(self._metadata_key)
-
-        if metadata is None:
-            metadata = {}
-        else:
-            metadata = metadata.copy()
-
-        metadata[self._dist_weight] = edge_data.get(self._dist_weight)
-        metadata[self._time_weight] = edge_data.get(self._time_weight)
-
-        for attr in self._additional_attribute_names:
-            metadata[attr] = edge_data.get(attr)
-
         road = Road(
             RoadId(source_node_id, target_node_id, road_key),
-            edge_data[self._geom_key],
-            metadata=metadata,
+            edge[self._geom_key],
+            metadata=self._build_metadata(edge.attributes()),
         )
+        self._road_cache[edge_index] = road
 
         return road
 
-    def _build_rtree(self):
-        geometries = []
-        edge_indices = []
+    def _build_metadata(self, edge_data: Dict[str, Any]) -> RoadMetadata:
+        # the metadata and attribute values are read now; merging them into one
+        # dictionary waits until the metadata is used
+        attributes = [
+            (self._dist_weight, edge_data.get(self._dist_weight)),
+            (self._time_weight, edge_data.get(self._time_weight)),
+        ]
+        for attr in self._additional_attribute_names:
+            attributes.append((attr, edge_data.get(attr)))
 
-        for e in self.g.es:
-            geom = e.attributes()[self._geom_key]
-            geometries.append(geom)
-            edge_indices.append(e.index)
+        return RoadMetadata(edge_data.get(self._metadata_key), attributes)
 
-        if len(geometries) == 0:
+    def _build_rtree(self):
+        if self.g.ecount() == 0:
             raise ValueError("No geometries found in graph; cannot build spatial index")
 
+        geometries = self.g.es[self._geom_key]
+        edge_indices = list(range(self.g.ecount()))
+
         self.strtree = STRtree(geometries)
         self.edge_indices = edge_indices
 
@@ -185,6 +215,140 @@ class IGraphMap(MapInterface):
     def time_weight(self) -> str:
         return self._time_weight
 
+    @property
+    def path_cache(self) -> Optional[ShortestPathCache]:
+        """
+        The shortest path cache, or None if paths are not cached
+        """
+        return self._path_cache
+
+    def set_path_cache_size(self, capacity: Optional[int]):
+        """
+        Cache up to `capacity` shortest paths, keyed by (origin node, destination node, weight);
+        any previously cached paths are dropped.
+
+        The cache is invalidated whenever the road attributes are changed.
+
+        Args:
+            capacity: The maximum number of paths to cache, or None to disable the cache
+
+        Returns:
+            None
+        """
+        if capacity is None:
+            self._path_cache = None
+        else:
+            self._path_cache = ShortestPathCache(capacity)
+
+    @property
+    def path_search(self) -> str:
+        """
+        The search used for shortest paths; one of path_search_methods
+        """
+        return self._path_search
+
+    def set_path_search(self, method: str):
+        """
+        Set the search used for shortest paths:
+
+         - "dijkstra": a Dijkstra search from the origin (the default)
+         - "astar": an A* search, guided by the straight line distance to the destination
+           or by landmark lower bounds, see set_landmarks
+
+        Both methods find a shortest path; "astar" settles fewer nodes on long paths
+        but calls a python heuristic for each node it reaches, so it can be slower than
+        "dijkstra", which runs entirely in igraph.
+
+        Args:
+            method: The search method
+
+        Returns:
+            None
+        """
+        if method not in self.path_search_methods:
+            raise ValueError(
+                f"path search must be one of {self.path_search_methods}, got {method}"
+            )
+
+        self._path_search = method
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
+    @property
+    def contraction_hierarchy(self) -> Optional[ContractionHierarchy]:
+        """
+        The contraction hierarchy used for shortest paths, or None if there is none
+        """
+        return self._contraction_hierarchy
+
+    def set_contraction_hierarchy(self, ch: Optional[ContractionHierarchy]):
+        """
+        Answer shortest path queries for the weight of a contraction hierarchy with the
+        hierarchy, rather than with a search of the graph; paths for other weights are
+        searched as before.
+
+        The hierarchy must be built from this map, with ContractionHierarchy.from_map or
+        ContractionHierarchy.for_map_file; it is dropped whenever the road attributes
+        are changed.
+
+        Args:
+            ch: The contraction hierarchy, or None to stop using it
+
+        Returns:
+            None
+        """
+        self._contraction_hierarchy = ch
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
+    @property
+    def landmarks(self) -> Optional[Landmarks]:
+        """
+        The landmark distances used as the A* heuristic, or None if there are none
+        """
+        return self._landmarks
+
+    def set_landmarks(self, landmarks: Optional[Landmarks]):
+        """
+        Guide A* searches for the weight of the landmarks with landmark lower bounds
+        (the ALT search) rather than with straight line distances; the bounds are
+        usually much tighter, so the searches settle fewer nodes.
+
+        The landmarks must be built from this map, with Landmarks.from_map; they are
+        dropped whenever the road attributes are changed.
+
+        Args:
+            landmarks: The landmark distances, or None to stop using them
+
+        Returns:
+            None
+        """
+        self._landmarks = landmarks
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
+    def _heuristic(self, weight: str) -> Callable[[Any, Any], float]:
+        """
+        The A* heuristic for a weight, between vertex ids: the landmarks if they are
+        for the weight, or else a straight line heuristic built on first use
+        """
+        landmarks = self._landmarks
+        if landmarks is not None and landmarks.weight == weight:
+            node_ids = self.g.vs[self._node_id_name]
+            return lambda u, v: landmarks.lower_bound(node_ids[u], node_ids[v])
+
+        heuristic = self._heuristics.get(weight)
+        if heuristic is None:
+            heuristic = EuclideanHeuristic.from_edges(
+                (e.source, e.target, e[self._geom_key], e[weight]) for e in self.g.es
+            )
+            self._heuristics[weight] = heuristic
+
+        return heuristic
+
     def road_by_id(self, road_id: RoadId) -> Optional[Road]:
         """
         Get a road by its id
@@ -224,6 +388,16 @@ class IGraphMap(MapInterface):
         if geom_updated:
             self._build_rtree()
 
+        # the weights or geometries the heuristics, the contraction hierarchy and the
+        # landmarks were built from may have changed
+        self._heuristics = {}
+        self._contraction_hierarchy = None
+        self._landmarks = None
+        self._road_cache = {}
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
     @property
     def roads(self) -> List[Road]:
         roads = [self._build_road(e.index) for e in self.g.es]
@@ -249,17 +423,48 @@ class IGraphMap(MapInterface):
         Build a IGraphMap instance from a file
 
         Args:
-            file: The graph pickle file to load the graph from
+            file: The graph pickle or .npz map file to load the graph from
 
         Returns:
             A IGraphMap instance
         """
         file = Path(file)
+        if file.suffix == ".npz":
+            return IGraphMap.from_map_arrays(MapArrays.from_file(file))
         if not file.suffix == ".pickle":
-            raise ValueError("file must be a pickle file")
+            raise ValueError("file must be a pickle or npz file")
         g = ig.Graph.Read_Pickle(str(file))
         return IGraphMap(g)
 
+    @classmethod
+    def from_map_arrays(cls, arrays: MapArrays) -> IGraphMap:
+        """
+        Build an IGraphMap from map arrays, like the arrays of a .npz map file
+
+        Args:
+            arrays: The map arrays
+
+        Returns:
+            A IGraphMap instance
+        """
+        g = ig.Graph(
+            n=len(arrays.node_ids),
+            edges=np.column_stack((arrays.edge_sources, arrays.edge_targets)).tolist(),
+            directed=True,
+        )
+        g[DEFAULT_CRS_KEY] = arrays.crs
+        g["distance_weight"] = arrays.distance_weight
+        g["time_weight"] = arrays.time_weight
+
+        g.vs[DEFAULT_NODE_ID_NAME] = arrays.node_ids.tolist()
+        g.es[DEFAULT_EDGE_ID_NAME] = arrays.edge_keys.tolist()
+        g.es[DEFAULT_GEOMETRY_KEY] = arrays.geometries().tolist()
+        g.es[DEFAULT_METADATA_KEY] = arrays.all_road_metadata()
+        for name in arrays.weights:
+            g.es[name] = arrays.weight_values(name)
+
+        return IGraphMap(g)
+
     @classmethod
     def from_geofence(
         cls,
@@ -291,14 +496,17 @@ class IGraphMap(MapInterface):
 
     def to_file(self, outfile: Union[str, Path]):
         """
-        Save the graph to a pickle file
+        Save the graph to a pickle or .npz map file
 
         Args:
             outfile: The file to save the graph to
         """
         outfile = Path(outfile)
+        if outfile.suffix == ".npz":
+            MapArrays.from_map(self).to_file(outfile)
+            return
         if outfile.suffix != ".pickle":
-            raise ValueError("outfile must have a .pickle suffix")
+            raise ValueError("outfile must have a .pickle or .npz suffix")
 
         self.g.write_pickle(str(outfile))
 
@@ -338,6 +546,68 @@ class IGraphMap(MapInterface):
         nearest_edge_index = self._nearest_edge_index(coord)
         return self._build_road(nearest_edge_index)
 
+    def nearest_roads(self, coords: Sequence[Coordinate]) -> List[Road]:
+        """
+        Get the nearest road to each of a sequence of coordinates, looking up all the
+        coordinates in the spatial index at once; each road is built once, however
+        many coordinates it is nearest to
+
+        Args:
+            coords: The coordinates to find the nearest roads to, like the coords of a trace
+
+        Returns:
+            The nearest road to each coordinate, in order
+        """
+        points = coordinate_points(coords, self.crs)
+        if len(points) == 0:
+            return []
+
+        nearest_idx, inverse = np.unique(
+            self.strtree.nearest(points), return_inverse=True
+        )
+        roads = [self._build_road(self.edge_indices[i]) for i in nearest_idx.tolist()]
+
+        return [roads[i] for i in inverse.tolist()]
+
+    def road_by_index(self, edge_index: int) -> Road:
+        """
+        Get a road by its edge index, as given by candidate_roads
+
+        Args:
+            edge_index: The edge index of the road
+
+        Returns:
+            The road
+        """
+        return self._build_road(edge_index)
+
+    def candidate_roads(
+        self,
+        coords: Sequence[Coordinate],
+        radius: float,
+        k: Optional[int] = None,
+    ) -> RoadCandidates:
+        """
+        Find the roads within a radius of each of a sequence of coordinates with one
+        bulk query of the spatial index, without building Road objects;
+        use road_by_index for the candidates that are needed
+
+        Args:
+            coords: The coordinates, like the coords of a trace
+            radius: The search radius, in the units of the map crs
+            k: The maximum number of candidates per coordinate, nearest first,
+                or None to keep all
+
+        Returns:
+            The candidates
+        """
+        points = coordinate_points(coords, self.crs)
+        candidates = query_candidates(self.strtree, points, radius, k)
+
+        # positions in the spatial index to igraph edge ids
+        edge_ids = np.asarray(self.edge_indices, dtype=np.int64)
+        return candidates._replace(edge_index=edge_ids[candidates.edge_index])
+
     def shortest_path(
         self,
         origin: Coordinate,
@@ -373,42 +643,130 @@ class IGraphMap(MapInterface):
                 f"crs of destination {destination.crs} must match crs of map {self.crs}"
             )
 
-        origin_edge_index = self._nearest_edge_index(origin)
-        dest_edge_index = self._nearest_edge_index(destination)
+        origin_vertex_id = self._nearest_vertex(origin)
+        dest_vertex_id = self._nearest_vertex(destination)
 
-        # find which road is closest to the origin and destination
-        origin_road = self._build_road(origin_edge_index)
-        dest_road = self._build_road(dest_edge_index)
+        if self._path_cache is not None:
+            cached_path = self._path_cache.get(origin_vertex_id, dest_vertex_id, weight)
+            if cached_path is not None:
+                return cached_path
 
-        ostart = Point(origin_road.geom.coords[0])
-        oend = Point(origin_road.geom.coords[-1])
+        ch = self._contraction_hierarchy
+        if ch is not None and weight == ch.weight:
+            road_ids = ch.shortest_path(
+                self.g.vs[origin_vertex_id][self._node_id_name],
+                self.g.vs[dest_vertex_id][self._node_id_name],
+            )
+            if road_ids is None:
+                edge_path = []
+            else:
+                edge_path = [self.road_mapping[road_id] for road_id in road_ids]
+        elif self._path_search == "astar":
+            heuristic = self._heuristic(weight)
+            edge_path = self.g.get_shortest_path_astar(
+                origin_vertex_id,
+                dest_vertex_id,
+                heuristics=lambda g, u, v: heuristic(u, v),
+                weights=weight,
+                output="epath",
+            )
+        else:
+            edge_path = self.g.get_shortest_paths(
+                origin_vertex_id,
+                dest_vertex_id,
+                weights=self.g.es[weight],
+                output="epath",
+            )[0]
 
-        dstart = Point(dest_road.geom.coords[0])
-        dend = Point(dest_road.geom.coords[-1])
+        roads = [self._build_road(i) for i in edge_path]
 
-        u_dist = ostart.distance(origin.geom)
-        v_dist = oend.distance(origin.geom)
+        if self._path_cache is not None:
+            self._path_cache.put(origin_vertex_id, dest_vertex_id, weight, roads)
 
-        if u_dist <= v_dist:
-            origin_vertex_id = self.g.es[origin_edge_index].source
-        else:
-            origin_vertex_id = self.g.es[origin_edge_index].target
+        return roads
 
-        u_dist = dstart.distance(destination.geom)
-        v_dist = dend.distance(destination.geom)
+    def shortest_paths(
+        self,
+        origin: Coordinate,
+        destinations: List[Coordinate],
+        weight: Optional[Union[str, Callable]] = None,
+    ) -> List[List[Road]]:
+        """
+        Computes the shortest paths from an origin to several destinations
+        with a single igraph search; with a contraction hierarchy for the weight,
+        or another path search, each path is found with shortest_path instead
 
-        if u_dist <= v_dist:
-            dest_vertex_id = self.g.es[dest_edge_index].source
-        else:
-            dest_vertex_id = self.g.es[dest_edge_index].target
+        Args:
+            origin: The origin coordinate
+            destinations: The destination coordinates
+            weight: The weight to use for the paths, the name of an edge attribute
 
-        edge_path = self.g.get_shortest_paths(
-            origin_vertex_id,
-            dest_vertex_id,
-            weights=self.g.es[weight],
-            output="epath",
-        )
+        Returns:
+            The shortest path to each destination, in order;
+            an empty list for a destination that can't be reached
+        """
+        if weight is None:
+            weight = self._time_weight
+
+        if callable(weight):
+            raise NotImplementedError("IGraphMap does not support custom weights")
 
-        roads = [self._build_road(i) for i in edge_path[0]]
+        if weight not in self.g.es.attributes():
+            raise ValueError(f"weight {weight} is not a valid attribute of the graph")
 
-        return roads
+        for coord in [origin, *destinations]:
+            if coord.crs != self.crs:
+                raise ValueError(
+                    f"crs of {coord} {coord.crs} must match crs of map {self.crs}"
+                )
+
+        ch = self._contraction_hierarchy
+        if (ch is not None and weight == ch.weight) or self._path_search != "dijkstra":
+            return [self.shortest_path(origin, d, weight) for d in destinations]
+
+        origin_vertex_id = self._nearest_vertex(origin)
+        dest_vertex_ids = [self._nearest_vertex(d) for d in destinations]
+
+        paths: Dict[int, List[Road]] = {}
+        if self._path_cache is not None:
+            for dest_vertex_id in dest_vertex_ids:
+                cached_path = self._path_cache.get(
+                    origin_vertex_id, dest_vertex_id, weight
+                )
+                if cached_path is not None:
+                    paths[dest_vertex_id] = cached_path
+
+        targets = sorted(set(dest_vertex_ids) - set(paths))
+        if targets:
+            edge_paths = self.g.get_shortest_paths(
+                origin_vertex_id,
+                targets,
+                weights=self.g.es[weight],
+                output="epath",
+            )
+            for dest_vertex_id, edge_path in zip(targets, edge_paths):
+                roads = [self._build_road(i) for i in edge_path]
+                paths[dest_vertex_id] = roads
+
+                if self._path_cache is not None:
+                    self._path_cache.put(
+                        origin_vertex_id, dest_vertex_id, weight, roads
+                    )
+
+        return [paths[dest_vertex_id] for dest_vertex_id in dest_vertex_ids]
+
+    def _nearest_vertex(self, coord: Coordinate) -> int:
+        """
+        The end of the nearest road that is closest to a coordinate,
+        preferring the start of the road
+        """
+        edge = self.g.es[self._nearest_edge_index(coord)]
+        geom = edge[self._geom_key]
+
+        u_dist = Point(geom.coords[0]).distance(coord.geom)
+        v_dist = Point(geom.coords[-1]).distance(coord.geom)
+
+        if u_dist <= v_dist:
+            return edge.source
+        else:
+            return edge.target
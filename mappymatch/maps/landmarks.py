@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import heapq
+import math
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+from mappymatch.maps.map_arrays import MapArrays
+from mappymatch.maps.map_interface import MapInterface
+
+
+def _distances(
+    indptr: memoryview, targets: memoryview, weights: memoryview, source: int
+) -> np.ndarray:
+    """
+    The distance from a source node to every node of a graph in compressed sparse row
+    form; nodes that can't be reached are at an infinite distance
+    """
+    dist = np.full(len(indptr) - 1, np.inf)
+    settled = set()
+
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled.add(u)
+        dist[u] = d
+
+        for slot in range(indptr[u], indptr[u + 1]):
+            v = targets[slot]
+            if v not in settled:
+                w = weights[slot]
+                if not math.isnan(w):
+                    heapq.heappush(heap, (d + w, v))
+
+    return dist
+
+
+def _csr(
+    sources: np.ndarray, targets: np.ndarray, weights: np.ndarray, n_nodes: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The indptr, targets and weights of a graph in compressed sparse row form
+    """
+    order = np.argsort(sources, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_nodes), out=indptr[1:])
+
+    return (
+        indptr,
+        np.ascontiguousarray(targets[order], dtype=np.int64),
+        np.ascontiguousarray(weights[order], dtype=np.float64),
+    )
+
+
+def _all_distances(
+    graph: Tuple[np.ndarray, np.ndarray, np.ndarray], landmarks: np.ndarray
+) -> np.ndarray:
+    """
+    The distance from each landmark to every node, as an (n_nodes, n_landmarks) array
+    """
+    indptr, targets, weights = graph
+
+    distances = np.empty((len(indptr) - 1, len(landmarks)))
+    for i, landmark in enumerate(landmarks):
+        distances[:, i] = _distances(
+            indptr.data, targets.data, weights.data, int(landmark)
+        )
+
+    return distances
+
+
+class Landmarks:
+    """
+    Landmark distances of a road map for one weight, giving lower bounds on the cost of
+    the shortest path between any two nodes.
+
+    By the triangle inequality, the cost from u to v is at least
+    d(L, v) - d(L, u) and d(u, L) - d(v, L) for every landmark L. The bound is cheap to
+    compute and serves as an A* heuristic (the ALT search); the landmarks are placed
+    far apart so that the bounds are tight.
+
+    Args:
+        weight: The weight the distances are measured in
+        node_ids: The node ids, as integers or strings
+        landmarks: The position in node_ids of each landmark
+        from_landmarks: The distance from each landmark to each node, one row per node
+        to_landmarks: The distance from each node to each landmark, one row per node
+
+    Attributes:
+        weight: The weight the distances are measured in
+        node_ids: The node ids, as integers or strings
+        landmarks: The position in node_ids of each landmark
+        from_landmarks: The distance from each landmark to each node, one row per node
+        to_landmarks: The distance from each node to each landmark, one row per node
+    """
+
+    def __init__(
+        self,
+        weight: str,
+        node_ids: np.ndarray,
+        landmarks: np.ndarray,
+        from_landmarks: np.ndarray,
+        to_landmarks: np.ndarray,
+    ):
+        self.weight = weight
+        self.node_ids = node_ids
+        self.landmarks = landmarks
+        self.from_landmarks = from_landmarks
+        self.to_landmarks = to_landmarks
+
+        # built on first use
+        self._node_index: Optional[Dict[Any, int]] = None
+
+    @classmethod
+    def build(cls, map_arrays: MapArrays, weight: str, k: int = 16) -> Landmarks:
+        """
+        Pick k landmarks and measure the distances to and from them; each landmark is
+        the node furthest from the landmarks picked before it
+
+        Args:
+            map_arrays: The map arrays
+            weight: The name of the weight
+            k: The number of landmarks
+
+        Returns:
+            The landmark distances
+        """
+        if weight not in map_arrays.weights:
+            raise ValueError(f"weight {weight} is not a valid weight of the map")
+        if k < 1:
+            raise ValueError("k must be at least 1")
+
+        weights = map_arrays.weights[weight]
+        if np.any(weights < 0):
+            raise ValueError("landmarks need non-negative weights")
+
+        n_nodes = len(map_arrays.node_ids)
+        sources = map_arrays.edge_sources
+        targets = map_arrays.edge_targets
+
+        forward = _csr(sources, targets, weights, n_nodes)
+        # the distances to a node are the distances from it on the reversed map
+        backward = _csr(targets, sources, weights, n_nodes)
+
+        k = min(k, n_nodes)
+        landmarks = np.empty(k, dtype=np.int64)
+        from_landmarks = np.empty((n_nodes, k))
+
+        # the distance from the nearest landmark to each node, treating unreachable
+        # nodes as near so that landmarks are picked where they are useful;
+        # the first landmark is the node furthest from node 0
+        nearest = _all_distances(forward, np.array([0]))[:, 0]
+
+        for i in range(k):
+            nearest[np.isinf(nearest)] = -1.0
+            nearest[landmarks[:i]] = -1.0
+
+            landmark = int(np.argmax(nearest))
+            landmarks[i] = landmark
+            from_landmarks[:, i] = _all_distances(forward, landmarks[i : i + 1])[:, 0]
+
+            if i == 0:
+                nearest = from_landmarks[:, 0].copy()
+            else:
+                nearest = np.minimum(nearest, from_landmarks[:, i])
+
+        to_landmarks = _all_distances(backward, landmarks)
+
+        return cls(weight, map_arrays.node_ids, landmarks, from_landmarks, to_landmarks)
+
+    @classmethod
+    def from_map(
+        cls, road_map: MapInterface, weight: Optional[str] = None, k: int = 16
+    ) -> Landmarks:
+        """
+        Build the landmark distances of a map, like an NxMap or an IGraphMap
+
+        Args:
+            road_map: The map
+            weight: The name of the weight; defaults to the time weight of the map
+            k: The number of landmarks
+
+        Returns:
+            The landmark distances
+        """
+        if weight is None:
+            weight = road_map.time_weight
+
+        return cls.build(MapArrays.from_map(road_map), weight, k)
+
+    @classmethod
+    def from_file(cls, file: Union[str, Path]) -> Landmarks:
+        """
+        Load landmark distances from a .npz file
+
+        Args:
+            file: The file to load
+
+        Returns:
+            The landmark distances
+        """
+        with np.load(file, allow_pickle=False) as data:
+            return cls(
+                str(data["weight"]),
+                data["node_ids"],
+                data["landmarks"],
+                data["from_landmarks"],
+                data["to_landmarks"],
+            )
+
+    def to_file(self, outfile: Union[str, Path]):
+        """
+        Save the landmark distances to a .npz file
+
+        Args:
+            outfile: The file to save to
+        """
+        with open(outfile, "wb") as f:
+            np.savez(
+                f,
+                weight=np.array(self.weight),
+                node_ids=self.node_ids,
+                landmarks=self.landmarks,
+                from_landmarks=self.from_landmarks,
+                to_landmarks=self.to_landmarks,
+            )
+
+    def lower_bound(self, u: Any, v: Any) -> float:
+        """
+        A lower bound on the cost of the shortest path from node u to node v;
+        infinite if the landmarks show that there is no path
+
+        Args:
+            u: The id of the start node
+            v: The id of the end node
+
+        Returns:
+            The lower bound
+        """
+        if self._node_index is None:
+            self._node_index = {n: i for i, n in enumerate(self.node_ids.tolist())}
+
+        i = self._node_index.get(u)
+        j = self._node_index.get(v)
+        if i is None or j is None or i == j:
+            return 0.0
+
+        from_landmarks = self.from_landmarks
+        to_landmarks = self.to_landmarks
+
+        # inf - inf is NaN where a landmark reaches neither node; fmax skips it
+        with np.errstate(invalid="ignore"):
+            bounds = np.fmax(
+                from_landmarks[j] - from_landmarks[i], to_landmarks[i] - to_landmarks[j]
+            )
+        bound = float(np.fmax.reduce(bounds))
+
+        return bound if bound > 0 else 0.0
+
+    def __call__(self, u: Any, v: Any) -> float:
+        return self.lower_bound(u, v)
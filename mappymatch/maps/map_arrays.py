@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Union
+
+import numpy as np
+import shapely
+from pyproj import CRS
+
+from mappymatch.constructs.road import Road, RoadId
+from mappymatch.maps.map_interface import MapInterface
+
+_WEIGHT_PREFIX = "weights/"
+
+# the version of the map file format written by MapArrays.to_file
+MAP_FILE_VERSION = 1
+
+
+def _id_array(ids: Sequence[Any]) -> np.ndarray:
+    """
+    Convert node ids or road keys to an array of integers or fixed width strings
+    """
+    if all(isinstance(i, (int, np.integer)) and not isinstance(i, bool) for i in ids):
+        return np.array(ids, dtype=np.int64)
+    elif all(isinstance(i, str) for i in ids):
+        return np.array(ids, dtype=np.str_)
+    else:
+        raise TypeError("node ids and road keys must be all integers or all strings")
+
+
+def _json_default(value: Any) -> Any:
+    """
+    Convert the numpy values in road metadata, which json can't encode, to python values
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, np.ndarray):
+        return value.tolist()
+    else:
+        raise TypeError(
+            f"road metadata value {value!r} of type {type(value).__name__} "
+            "can't be encoded as json"
+        )
+
+
+class MapArrays(NamedTuple):
+    """
+    A columnar representation of a road map, with the roads held in flat numpy arrays.
+
+    Road i runs from node_ids[edge_sources[i]] to node_ids[edge_targets[i]] with key
+    edge_keys[i]; its geometry is the points geometry_coords[geometry_offsets[i]:geometry_offsets[i + 1]]
+    and its metadata is the json encoded bytes metadata[metadata_offsets[i]:metadata_offsets[i + 1]].
+    The distance and time weights are held in the weights arrays rather than the metadata.
+
+    Attributes:
+        crs: The coordinate reference system of the map
+        distance_weight: The name of the distance weight
+        time_weight: The name of the time weight
+        node_ids: The node ids, as integers or strings
+        edge_sources: The position in node_ids of the start node of each road
+        edge_targets: The position in node_ids of the end node of each road
+        edge_keys: The key of each road, as integers or strings
+        weights: The weight of each road by weight name; missing weights are NaN
+        geometry_coords: The x, y points of all road geometries
+        geometry_offsets: The start of each road geometry in geometry_coords
+        metadata: The json encoded metadata of all roads
+        metadata_offsets: The start of each road metadata in metadata
+    """
+
+    crs: CRS
+    distance_weight: str
+    time_weight: str
+    node_ids: np.ndarray
+    edge_sources: np.ndarray
+    edge_targets: np.ndarray
+    edge_keys: np.ndarray
+    weights: Dict[str, np.ndarray]
+    geometry_coords: np.ndarray
+    geometry_offsets: np.ndarray
+    metadata: np.ndarray
+    metadata_offsets: np.ndarray
+
+    @classmethod
+    def from_roads(
+        cls,
+        roads: List[Road],
+        crs: CRS,
+        distance_weight: str,
+        time_weight: str,
+    ) -> MapArrays:
+        """
+        Build the arrays from a list of roads
+
+        Args:
+            roads: The roads of the map
+            crs: The coordinate reference system of the roads
+            distance_weight: The name of the distance weight in the road metadata
+            time_weight: The name of the time weight in the road metadata
+
+        Returns:
+            The map arrays
+        """
+        if len(roads) == 0:
+            raise ValueError("No roads found in map; cannot build map arrays")
+
+        node_index: Dict[Any, int] = {}
+        sources = np.empty(len(roads), dtype=np.int64)
+        targets = np.empty(len(roads), dtype=np.int64)
+        keys = []
+
+        weight_names = [distance_weight, time_weight]
+        weights = {w: np.full(len(roads), np.nan) for w in weight_names}
+
+        encoded_metadata = []
+
+        for i, road in enumerate(roads):
+            start, end, key = road.road_id
+            sources[i] = node_index.setdefault(start, len(node_index))
+            targets[i] = node_index.setdefault(end, len(node_index))
+            keys.append(key)
+
+            metadata = dict(road.metadata) if road.metadata is not None else {}
+            for w in weight_names:
+                value = metadata.pop(w, None)
+                if value is not None:
+                    weights[w][i] = value
+
+            encoded_metadata.append(
+                json.dumps(metadata, default=_json_default).encode("utf-8")
+            )
+
+        coords, geometry_index = shapely.get_coordinates(
+            [r.geom for r in roads], return_index=True
+        )
+        geometry_offsets = np.zeros(len(roads) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(geometry_index, minlength=len(roads)),
+            out=geometry_offsets[1:],
+        )
+
+        metadata_offsets = np.zeros(len(roads) + 1, dtype=np.int64)
+        np.cumsum([len(m) for m in encoded_metadata], out=metadata_offsets[1:])
+
+        return cls(
+            crs=crs,
+            distance_weight=distance_weight,
+            time_weight=time_weight,
+            node_ids=_id_array(list(node_index)),
+            edge_sources=sources,
+            edge_targets=targets,
+            edge_keys=_id_array(keys),
+            weights=weights,
+            geometry_coords=coords,
+            geometry_offsets=geometry_offsets,
+            metadata=np.frombuffer(b"".join(encoded_metadata), dtype=np.uint8),
+            metadata_offsets=metadata_offsets,
+        )
+
+    @classmethod
+    def from_map(cls, road_map: MapInterface) -> MapArrays:
+        """
+        Build the arrays from the roads of a map, like an NxMap or an IGraphMap
+
+        Args:
+            road_map: The map to build the arrays from; it must have a crs attribute
+
+        Returns:
+            The map arrays
+        """
+        crs = getattr(road_map, "crs", None)
+        if not isinstance(crs, CRS):
+            raise TypeError("road map must have a pyproj crs")
+
+        return cls.from_roads(
+            road_map.roads, crs, road_map.distance_weight, road_map.time_weight
+        )
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Flatten to a dictionary of named numpy arrays, with the crs and weight names
+        held as string arrays
+
+        Returns:
+            A dictionary of the arrays
+        """
+        arrays = {
+            "crs": np.array(self.crs.to_wkt()),
+            "distance_weight": np.array(self.distance_weight),
+            "time_weight": np.array(self.time_weight),
+            "node_ids": self.node_ids,
+            "edge_sources": self.edge_sources,
+            "edge_targets": self.edge_targets,
+            "edge_keys": self.edge_keys,
+            "geometry_coords": self.geometry_coords,
+            "geometry_offsets": self.geometry_offsets,
+            "metadata": self.metadata,
+            "metadata_offsets": self.metadata_offsets,
+        }
+        for name, weight in self.weights.items():
+            arrays[_WEIGHT_PREFIX + name] = weight
+
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> MapArrays:
+        """
+        Build from a dictionary of named arrays, as made by to_arrays;
+        the arrays are used as they are, without copying
+
+        Args:
+            arrays: The dictionary of arrays
+
+        Returns:
+            The map arrays
+        """
+        weights = {
+            name[len(_WEIGHT_PREFIX) :]: a
+            for name, a in arrays.items()
+            if name.startswith(_WEIGHT_PREFIX)
+        }
+
+        return cls(
+            crs=CRS.from_wkt(str(arrays["crs"])),
+            distance_weight=str(arrays["distance_weight"]),
+            time_weight=str(arrays["time_weight"]),
+            node_ids=arrays["node_ids"],
+            edge_sources=arrays["edge_sources"],
+            edge_targets=arrays["edge_targets"],
+            edge_keys=arrays["edge_keys"],
+            weights=weights,
+            geometry_coords=arrays["geometry_coords"],
+            geometry_offsets=arrays["geometry_offsets"],
+            metadata=arrays["metadata"],
+            metadata_offsets=arrays["metadata_offsets"],
+        )
+
+    @classmethod
+    def from_file(cls, file: Union[str, Path]) -> MapArrays:
+        """
+        Load the arrays from a map file written by to_file
+
+        Args:
+            file: The .npz map file to load
+
+        Returns:
+            The map arrays
+        """
+        with np.load(file, allow_pickle=False) as data:
+            arrays = {name: data[name] for name in data.files}
+
+        version = arrays.pop("format_version", None)
+        if version is None:
+            raise ValueError(f"{file} is not a map file")
+        if int(version) != MAP_FILE_VERSION:
+            raise ValueError(
+                f"map file version {int(version)} is not supported; "
+                f"expected version {MAP_FILE_VERSION}"
+            )
+
+        return cls.from_arrays(arrays)
+
+    def to_file(self, outfile: Union[str, Path]):
+        """
+        Save the arrays to an uncompressed .npz map file, so that loading the map
+        only costs reading the arrays
+
+        Args:
+            outfile: The file to save to
+        """
+        with open(outfile, "wb") as f:
+            np.savez(
+                f,
+                format_version=np.array(MAP_FILE_VERSION),
+                **self.to_arrays(),  # type: ignore[arg-type]
+            )
+
+    @property
+    def n_roads(self) -> int:
+        """
+        The number of roads
+        """
+        return len(self.edge_sources)
+
+    def road_id(self, i: int) -> RoadId:
+        """
+        Get the id of road i
+        """
+        return RoadId(
+            self.node_ids[self.edge_sources[i]].item(),
+            self.node_ids[self.edge_targets[i]].item(),
+            self.edge_keys[i].item(),
+        )
+
+    def road_metadata(self, i: int) -> Dict[str, Any]:
+        """
+        Get the metadata of road i, including its weights
+        """
+        start, end = self.metadata_offsets[i], self.metadata_offsets[i + 1]
+        metadata = json.loads(self.metadata[start:end].tobytes())
+
+        for name, weight in self.weights.items():
+            value = weight[i].item()
+            metadata[name] = None if math.isnan(value) else value
+
+        return metadata
+
+    def all_road_metadata(self) -> List[Dict[str, Any]]:
+        """
+        Decode the metadata of all roads at once, without their weights
+
+        Returns:
+            The metadata of each road
+        """
+        if self.n_roads == 0:
+            return []
+
+        # each road metadata is a json object; separating them with commas turns the
+        # buffer into one json list, decoded in a single call
+        separated = np.insert(self.metadata, self.metadata_offsets[1:-1], ord(","))
+        return json.loads(b"[" + separated.tobytes() + b"]")
+
+    def weight_values(self, name: str) -> List[Optional[float]]:
+        """
+        The values of a weight for all roads, with None for missing weights
+
+        Args:
+            name: The name of the weight
+
+        Returns:
+            The weight of each road
+        """
+        return [None if math.isnan(w) else w for w in self.weights[name].tolist()]
+
+    def geometries(self, edge_indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Build the shapely geometries of all roads, or of some of them
+
+        Args:
+            edge_indices: The roads to build, or None to build all roads
+
+        Returns:
+            An array of LineStrings
+        """
+        if edge_indices is None:
+            indices = np.repeat(np.arange(self.n_roads), np.diff(self.geometry_offsets))
+            return shapely.linestrings(self.geometry_coords, indices=indices)
+
+        starts = self.geometry_offsets[edge_indices]
+        lengths = self.geometry_offsets[edge_indices + 1] - starts
+        indices = np.repeat(np.arange(len(edge_indices)), lengths)
+
+        # the position of each point within its geometry, added to the geometry start
+        ends = np.cumsum(lengths)
+        points = np.arange(len(indices)) - np.repeat(ends - lengths, lengths)
+        coords = self.geometry_coords[np.repeat(starts, lengths) + points]
+
+        return shapely.linestrings(coords, indices=indices)
@@ -1,15 +1,137 @@
 from __future__ import annotations
 
 from abc import ABCMeta, abstractmethod
-from typing import Callable, List, Optional, Union
+from typing import Callable, List, NamedTuple, Optional, Sequence, Union
 
-from mappymatch.constructs.coordinate import Coordinate
+import numpy as np
+import shapely
+from pyproj import CRS
+from shapely.strtree import STRtree
+
+from mappymatch.constructs.coordinate import Coordinate, CoordinateSequence
 from mappymatch.constructs.road import Road, RoadId
 
 DEFAULT_DISTANCE_WEIGHT = "kilometers"
 DEFAULT_TIME_WEIGHT = "minutes"
 
 
+def coordinate_points(coords: Sequence[Coordinate], crs: CRS) -> np.ndarray:
+    """
+    The shapely points of a sequence of coordinates, checking that they are in the
+    crs of a map
+
+    Args:
+        coords: The coordinates, like the coords of a trace
+        crs: The crs of the map
+
+    Returns:
+        An array of Points
+    """
+    if isinstance(coords, CoordinateSequence):
+        if len(coords) > 0 and coords.crs != crs:
+            raise ValueError(
+                f"crs of coordinates {coords.crs} must match crs of map {crs}"
+            )
+        return coords.geometries()
+
+    for coord in coords:
+        if coord.crs != crs:
+            raise ValueError(
+                f"crs of coordinate {coord.crs} must match crs of map {crs}"
+            )
+
+    points = np.empty(len(coords), dtype=object)
+    points[:] = [coord.geom for coord in coords]
+    return points
+
+
+class RoadCandidates(NamedTuple):
+    """
+    The candidate roads near a sequence of points, one row per (point, road) pair.
+
+    The rows are sorted by point and then by distance, nearest first;
+    road_by_index builds the Road of an edge index.
+
+    Attributes:
+        point_index: The position of the point in the sequence
+        edge_index: The edge index of the road in the map
+        distance: The distance from the point to the road
+        offset: The distance along the road to the point on it that is nearest to the point
+    """
+
+    point_index: np.ndarray
+    edge_index: np.ndarray
+    distance: np.ndarray
+    offset: np.ndarray
+
+
+def query_candidates(
+    tree: STRtree, points: np.ndarray, radius: float, k: Optional[int] = None
+) -> RoadCandidates:
+    """
+    Find the road geometries of a spatial index that are within a radius of each point
+
+    Args:
+        tree: The spatial index of the road geometries
+        points: The points
+        radius: The search radius, in the units of the map crs
+        k: The maximum number of candidates to keep per point, or None to keep all
+
+    Returns:
+        The candidates, with edge indices given as positions in the spatial index
+    """
+    if radius < 0:
+        raise ValueError("radius must be non-negative")
+    if k is not None and k < 1:
+        raise ValueError("k must be at least 1")
+
+    point_index, edge_index = tree.query(points, predicate="dwithin", distance=radius)
+
+    geoms = tree.geometries[edge_index]
+    point_geoms = points[point_index]
+    distance = shapely.distance(geoms, point_geoms)
+
+    return rank_candidates(point_index, edge_index, geoms, point_geoms, distance, k)
+
+
+def rank_candidates(
+    point_index: np.ndarray,
+    edge_index: np.ndarray,
+    geoms: np.ndarray,
+    point_geoms: np.ndarray,
+    distance: np.ndarray,
+    k: Optional[int] = None,
+) -> RoadCandidates:
+    """
+    Sort (point, road) pairs by point and then by distance, keeping the k nearest roads
+    of each point
+
+    Args:
+        point_index: The position of the point of each pair
+        edge_index: The edge index of the road of each pair
+        geoms: The road geometry of each pair
+        point_geoms: The point geometry of each pair
+        distance: The distance from the point to the road of each pair
+        k: The maximum number of candidates to keep per point, or None to keep all
+
+    Returns:
+        The candidates
+    """
+    order = np.lexsort((edge_index, distance, point_index))
+    if k is not None:
+        # the rank of each candidate among the candidates of its point
+        sorted_points = point_index[order]
+        rank = np.arange(len(order)) - np.searchsorted(sorted_points, sorted_points)
+        order = order[rank < k]
+
+    return RoadCandidates(
+        point_index=point_index[order],
+        edge_index=edge_index[order],
+        distance=distance[order],
+        offset=shapely.line_locate_point(geoms[order], point_geoms[order]),
+    )
+
+
 class MapInterface(metaclass=ABCMeta):
     """
     Abstract base class for a Matcher
@@ -74,6 +196,60 @@ class MapInterface(metaclass=ABCMeta):
             The nearest road to the coordinate
         """
 
+    def nearest_roads(self, coords: Sequence[Coordinate]) -> List[Road]:
+        """
+        Return the nearest road to each of a sequence of coordinates;
+        maps with a spatial index override this to look up all coordinates at once
+
+        Args:
+            coords: The coordinates to find the nearest roads to
+
+        Returns:
+            The nearest road to each coordinate, in order
+        """
+        return [self.nearest_road(coord) for coord in coords]
+
+    def road_by_index(self, edge_index: int) -> Road:
+        """
+        Get a road by its edge index, as given by candidate_roads; by default the edge
+        index is the position of the road in roads
+
+        Args:
+            edge_index: The edge index of the road
+
+        Returns:
+            The road
+        """
+        return self.roads[edge_index]
+
+    def candidate_roads(
+        self,
+        coords: Sequence[Coordinate],
+        radius: float,
+        k: Optional[int] = None,
+    ) -> RoadCandidates:
+        """
+        Find the roads within a radius of each of a sequence of coordinates, without
+        building Road objects; use road_by_index for the candidates that are needed.
+
+        By default a spatial index of the roads is built for each call;
+        maps that keep a spatial index override this
+
+        Args:
+            coords: The coordinates, like the coords of a trace
+            radius: The search radius, in the units of the map crs
+            k: The maximum number of candidates per coordinate, nearest first,
+                or None to keep all
+
+        Returns:
+            The candidates
+        """
+        points = np.empty(len(coords), dtype=object)
+        points[:] = [coord.geom for coord in coords]
+
+        tree = STRtree([road.geom for road in self.roads])
+        return query_candidates(tree, points, radius, k)
+
     @abstractmethod
     def shortest_path(
         self,
@@ -92,3 +268,43 @@ class MapInterface(metaclass=ABCMeta):
         Returns:
             A list of roads that form the shortest path
         """
+
+    def shortest_paths(
+        self,
+        origin: Coordinate,
+        destinations: List[Coordinate],
+        weight: Optional[Union[str, Callable]] = None,
+    ) -> List[List[Road]]:
+        """
+        Computes the shortest paths from an origin to several destinations;
+        maps that can reach several destinations with one search override this
+
+        Args:
+            origin: The origin coordinate
+            destinations: The destination coordinates
+            weight: The weight to use for the paths
+
+        Returns:
+            The shortest path to each destination, in order
+        """
+        return [self.shortest_path(origin, d, weight) for d in destinations]
+
+    def shortest_path_matrix(
+        self,
+        origins: List[Coordinate],
+        destinations: List[Coordinate],
+        weight: Optional[Union[str, Callable]] = None,
+    ) -> List[List[List[Road]]]:
+        """
+        Computes the shortest paths from each of several origins to each of several
+        destinations, with one search per origin where the map supports it
+
+        Args:
+            origins: The origin coordinates
+            destinations: The destination coordinates
+            weight: The weight to use for the paths
+
+        Returns:
+            The shortest paths, one list per origin with one path per destination
+        """
+        return [self.shortest_paths(o, destinations, weight) for o in origins]
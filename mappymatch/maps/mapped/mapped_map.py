@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from mappymatch.maps.csr.csr_map import CSRMap, packed_arrays
+from mappymatch.maps.map_arrays import MapArrays
+from mappymatch.maps.map_interface import MapInterface
+
+# the first bytes of a mapped map file, followed by the version of the format
+_MAGIC = b"MAPPYMAP"
+MAPPED_FILE_VERSION = 1
+
+# the header length is stored in this many bytes after the magic and version
+_LENGTH_BYTES = 8
+
+# arrays are placed in the file at multiples of this many bytes
+_ALIGNMENT = 64
+
+# (name, dtype, shape, byte offset) of each array in the file
+ArrayLayout = List[Tuple[str, str, Tuple[int, ...], int]]
+
+
+def _read_layout(f) -> Tuple[ArrayLayout, int]:
+    """
+    Read the layout of a mapped map file and the offset of its first array
+    """
+    magic = f.read(len(_MAGIC))
+    if magic != _MAGIC:
+        raise ValueError(f"{f.name} is not a mapped map file")
+
+    version = int.from_bytes(f.read(_LENGTH_BYTES), "little")
+    if version != MAPPED_FILE_VERSION:
+        raise ValueError(
+            f"mapped map file version {version} is not supported; "
+            f"expected version {MAPPED_FILE_VERSION}"
+        )
+
+    header_length = int.from_bytes(f.read(_LENGTH_BYTES), "little")
+    header = json.loads(f.read(header_length))
+
+    layout = [
+        (name, dtype, tuple(shape), offset) for name, dtype, shape, offset in header
+    ]
+    start = len(_MAGIC) + 2 * _LENGTH_BYTES + header_length
+    start = -(-start // _ALIGNMENT) * _ALIGNMENT
+
+    return layout, start
+
+
+class MappedMap(CSRMap):
+    """
+    A read-only road map that is opened straight from a memory mapped file.
+
+    The file holds the map arrays along with the routing arrays and a grid spatial index,
+    so opening a map only reads a short header: the arrays are used in place, their
+    pages are read from disk when they are first touched and processes that open the
+    same file share them through the page cache.
+
+    Nearest road and candidate road queries use the grid index; of roads at the same
+    distance from a point, the one with the lowest edge index is nearest.
+
+    Pickling a MappedMap only sends the path of its file. A map built with from_map
+    owns a temporary file, which must outlive any process using the map and is
+    deleted when the map is closed.
+
+    Args:
+        file: The mapped map file, as written by write
+
+    Attributes:
+        file: The mapped map file
+        arrays: The map arrays, as read-only views of the file
+        crs: The coordinate reference system of the map
+    """
+
+    def __init__(self, file: Union[str, Path]):
+        self._owner = False
+        self._open(Path(file))
+
+    @classmethod
+    def from_file(cls, file: Union[str, Path]) -> MappedMap:
+        """
+        Open a mapped map file
+
+        Args:
+            file: The file written by write
+
+        Returns:
+            The mapped map
+        """
+        return cls(file)
+
+    @classmethod
+    def from_map(
+        cls, road_map: MapInterface, cell_size: Optional[float] = None
+    ) -> MappedMap:
+        """
+        Write a map to a temporary mapped map file and open it
+
+        Args:
+            road_map: The map to write, like an NxMap or an IGraphMap
+            cell_size: The cell size of the grid index, in the units of the map crs;
+                by default there are about as many cells as roads
+
+        Returns:
+            A MappedMap that owns the temporary file
+        """
+        fd, name = tempfile.mkstemp(suffix=".mmap")
+        os.close(fd)
+
+        try:
+            cls.write(road_map, name, cell_size)
+            mapped_map = cls(name)
+        except BaseException:
+            os.unlink(name)
+            raise
+
+        mapped_map._owner = True
+        return mapped_map
+
+    @staticmethod
+    def write(
+        road_map: Union[MapInterface, MapArrays],
+        outfile: Union[str, Path],
+        cell_size: Optional[float] = None,
+    ):
+        """
+        Write a map to a mapped map file
+
+        Args:
+            road_map: The map, like an NxMap or an IGraphMap, or its map arrays
+            outfile: The file to write
+            cell_size: The cell size of the grid index, in the units of the map crs;
+                by default there are about as many cells as roads
+        """
+        if isinstance(road_map, MapArrays):
+            arrays = road_map
+        else:
+            arrays = MapArrays.from_map(road_map)
+
+        named_arrays = packed_arrays(arrays, cell_size)
+
+        header = []
+        size = 0
+        for name, a in named_arrays.items():
+            header.append((name, a.dtype.str, a.shape, size))
+            size += -(-a.nbytes // _ALIGNMENT) * _ALIGNMENT
+        encoded_header = json.dumps(header).encode("utf-8")
+
+        with open(outfile, "wb") as f:
+            f.write(_MAGIC)
+            f.write(MAPPED_FILE_VERSION.to_bytes(_LENGTH_BYTES, "little"))
+            f.write(len(encoded_header).to_bytes(_LENGTH_BYTES, "little"))
+            f.write(encoded_header)
+
+            start = -(-f.tell() // _ALIGNMENT) * _ALIGNMENT
+            for (name, dtype, shape, offset), a in zip(header, named_arrays.values()):
+                f.seek(start + offset)
+                f.write(np.ascontiguousarray(a).tobytes())
+
+            # pad the last array so every array lies within the file
+            f.truncate(start + size)
+
+    def _open(self, file: Path):
+        self.file = file
+
+        with open(file, "rb") as f:
+            layout, start = _read_layout(f)
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mmap: Optional[mmap.mmap] = mapped
+
+        named_arrays: Dict[str, np.ndarray] = {}
+        for name, dtype, shape, offset in layout:
+            named_arrays[name] = np.ndarray(
+                shape, dtype, buffer=mapped, offset=start + offset
+            )
+
+        self._setup_packed(named_arrays)
+
+    def __getstate__(self):
+        if self._mmap is None:
+            raise ValueError("cannot pickle a closed MappedMap")
+        return {"file": self.file}
+
+    def __setstate__(self, state):
+        self._owner = False
+        self._open(state["file"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Unmap the file; if this map was built with from_map, the file is deleted.
+
+        The map can't be used after it is closed.
+        """
+        if self._mmap is None:
+            return
+
+        mapped = self._mmap
+        self._mmap = None
+
+        self._drop_arrays()
+
+        mapped.close()
+        if self._owner:
+            os.unlink(self.file)
@@ -1,28 +1,39 @@
 from __future__ import annotations
 
+import heapq
+import itertools
 import json
 from pathlib import Path
 import pickle
-from typing import Any, Callable, Dict, List, Optional, Set, Union
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Union
 
 import networkx as nx
+import numpy as np
 import shapely.wkt as wkt
 from shapely.geometry import Point
 from shapely.strtree import STRtree
 
 from mappymatch.constructs.coordinate import Coordinate
 from mappymatch.constructs.geofence import Geofence
-from mappymatch.constructs.road import Road, RoadId
+from mappymatch.constructs.road import Road, RoadId, RoadMetadata
+from mappymatch.maps.ch.contraction_hierarchy import ContractionHierarchy
+from mappymatch.maps.heuristics import EuclideanHeuristic
 from mappymatch.maps.igraph.igraph_map import DEFAULT_METADATA_KEY
+from mappymatch.maps.landmarks import Landmarks
+from mappymatch.maps.map_arrays import MapArrays
 from mappymatch.maps.map_interface import (
     DEFAULT_DISTANCE_WEIGHT,
     DEFAULT_TIME_WEIGHT,
     MapInterface,
+    RoadCandidates,
+    coordinate_points,
+    query_candidates,
 )
 from mappymatch.maps.nx.readers.osm_readers import (
     NetworkType,
     nx_graph_from_osmnx,
 )
+from mappymatch.maps.path_cache import ShortestPathCache
 from mappymatch.utils.crs import CRS, LATLON_CRS
 from mappymatch.utils.keys import DEFAULT_CRS_KEY, DEFAULT_GEOMETRY_KEY
 
@@ -36,6 +47,15 @@ class NxMap(MapInterface):
         crs: The coordinate reference system of the map
     """
 
+    # defaults for maps that were pickled before these attributes existed
+    _path_cache: Optional[ShortestPathCache] = None
+    _path_search: str = "dijkstra"
+    _heuristics: Optional[Dict[str, EuclideanHeuristic]] = None
+    _contraction_hierarchy: Optional[ContractionHierarchy] = None
+    _landmarks: Optional[Landmarks] = None
+
+    path_search_methods = ("dijkstra", "astar", "bidirectional")
+
     def __init__(self, graph: nx.MultiDiGraph):
         self.g = graph
 
@@ -70,8 +90,27 @@ class NxMap(MapInterface):
 
         self._addtional_attribute_names: Set[str] = set()
 
+        self._path_cache: Optional[ShortestPathCache] = None
+
+        self._path_search = "dijkstra"
+        self._heuristics = None
+        self._contraction_hierarchy = None
+        self._landmarks = None
+
+        self._road_cache: Dict[RoadId, Road] = {}
+
         self._build_rtree()
 
+    def __getstate__(self):
+        # the cached roads are rebuilt on demand rather than pickled
+        state = self.__dict__.copy()
+        state.pop("_road_cache", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._road_cache = {}
+
     def _has_road_id(self, road_id: RoadId) -> bool:
         return self.g.has_edge(*road_id)
 
@@ -82,31 +121,38 @@ class NxMap(MapInterface):
         """
         Build a road from a road id, pulling the edge data from the graph
 
+        Roads are cached until the road attributes change; their metadata holds the
+        attribute values of the road when it was built.
+
         Be sure to check if the road id (_has_road_id) is in the graph before calling this method
         """
-        edge_data = self.g.get_edge_data(*road_id)
+        road = self._road_cache.get(road_id)
+        if road is not None:
+            return road
 
-        metadata = edge_data.get(self._metadata_key)
-
-        if metadata is None:
-            metadata = {}
-        else:
-            metadata = metadata.copy()
-
-        metadata[self._dist_weight] = edge_data.get(self._dist_weight)
-        metadata[self._time_weight] = edge_data.get(self._time_weight)
-
-        for attr_name in self._addtional_attribute_names:
-            metadata[attr_name] = edge_data.get(attr_name)
+        edge_data = self.g.get_edge_data(*road_id)
 
         road = Road(
             road_id,
             edge_data[self._geom_key],
-            metadata=metadata,
+            metadata=self._build_metadata(edge_data),
         )
+        self._road_cache[road_id] = road
 
         return road
 
+    def _build_metadata(self, edge_data: Dict[str, Any]) -> RoadMetadata:
+        # the metadata and attribute values are read now; merging them into one
+        # dictionary waits until the metadata is used
+        attributes = [
+            (self._dist_weight, edge_data.get(self._dist_weight)),
+            (self._time_weight, edge_data.get(self._time_weight)),
+        ]
+        for attr_name in self._addtional_attribute_names:
+            attributes.append((attr_name, edge_data.get(attr_name)))
+
+        return RoadMetadata(edge_data.get(self._metadata_key), attributes)
+
     def _build_rtree(self):
         geoms = []
         road_ids = []
@@ -141,6 +187,142 @@ class NxMap(MapInterface):
     def time_weight(self) -> str:
         return self._time_weight
 
+    @property
+    def path_cache(self) -> Optional[ShortestPathCache]:
+        """
+        The shortest path cache, or None if paths are not cached
+        """
+        return self._path_cache
+
+    def set_path_cache_size(self, capacity: Optional[int]):
+        """
+        Cache up to `capacity` shortest paths, keyed by (origin node, destination node, weight);
+        any previously cached paths are dropped.
+
+        The cache is invalidated whenever the road attributes are changed.
+
+        Args:
+            capacity: The maximum number of paths to cache, or None to disable the cache
+
+        Returns:
+            None
+        """
+        if capacity is None:
+            self._path_cache = None
+        else:
+            self._path_cache = ShortestPathCache(capacity)
+
+    @property
+    def path_search(self) -> str:
+        """
+        The search used for shortest paths; one of path_search_methods
+        """
+        return self._path_search
+
+    def set_path_search(self, method: str):
+        """
+        Set the search used for shortest paths:
+
+         - "dijkstra": a Dijkstra search from the origin (the default)
+         - "astar": an A* search, guided by the straight line distance to the destination
+           or by landmark lower bounds, see set_landmarks
+         - "bidirectional": a Dijkstra search from both the origin and the destination
+
+        All methods find a shortest path; "astar" and "bidirectional" settle fewer nodes on
+        long paths. Paths with a custom weight function always use "dijkstra".
+
+        Args:
+            method: The search method
+
+        Returns:
+            None
+        """
+        if method not in self.path_search_methods:
+            raise ValueError(
+                f"path search must be one of {self.path_search_methods}, got {method}"
+            )
+
+        self._path_search = method
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
+    @property
+    def contraction_hierarchy(self) -> Optional[ContractionHierarchy]:
+        """
+        The contraction hierarchy used for shortest paths, or None if there is none
+        """
+        return self._contraction_hierarchy
+
+    def set_contraction_hierarchy(self, ch: Optional[ContractionHierarchy]):
+        """
+        Answer shortest path queries for the weight of a contraction hierarchy with the
+        hierarchy, rather than with a search of the graph; paths for other weights are
+        searched as before.
+
+        The hierarchy must be built from this map, with ContractionHierarchy.from_map or
+        ContractionHierarchy.for_map_file; it is dropped whenever the road attributes
+        are changed.
+
+        Args:
+            ch: The contraction hierarchy, or None to stop using it
+
+        Returns:
+            None
+        """
+        self._contraction_hierarchy = ch
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
+    @property
+    def landmarks(self) -> Optional[Landmarks]:
+        """
+        The landmark distances used as the A* heuristic, or None if there are none
+        """
+        return self._landmarks
+
+    def set_landmarks(self, landmarks: Optional[Landmarks]):
+        """
+        Guide A* searches for the weight of the landmarks with landmark lower bounds
+        (the ALT search) rather than with straight line distances; the bounds are
+        usually much tighter, so the searches settle fewer nodes.
+
+        The landmarks must be built from this map, with Landmarks.from_map; they are
+        dropped whenever the road attributes are changed.
+
+        Args:
+            landmarks: The landmark distances, or None to stop using them
+
+        Returns:
+            None
+        """
+        self._landmarks = landmarks
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
+    def _heuristic(self, weight: str) -> Callable[[Any, Any], float]:
+        """
+        The A* heuristic for a weight: the landmarks if they are for the weight,
+        or else a straight line heuristic built on first use
+        """
+        if self._landmarks is not None and self._landmarks.weight == weight:
+            return self._landmarks
+
+        if self._heuristics is None:
+            self._heuristics = {}
+
+        heuristic = self._heuristics.get(weight)
+        if heuristic is None:
+            heuristic = EuclideanHeuristic.from_edges(
+                (u, v, d[self._geom_key], d.get(weight))
+                for u, v, d in self.g.edges(data=True)
+            )
+            self._heuristics[weight] = heuristic
+
+        return heuristic
+
     def road_by_id(self, road_id: RoadId) -> Optional[Road]:
         """
         Get a road by its id
@@ -173,6 +355,16 @@ class NxMap(MapInterface):
         nx.set_edge_attributes(self.g, attributes)
         self._build_rtree()
 
+        # the weights or geometries the heuristics, the contraction hierarchy and the
+        # landmarks were built from may have changed
+        self._heuristics = None
+        self._contraction_hierarchy = None
+        self._landmarks = None
+        self._road_cache = {}
+
+        if self._path_cache is not None:
+            self._path_cache.invalidate()
+
     @property
     def roads(self) -> List[Road]:
         roads = [
@@ -186,7 +378,7 @@ class NxMap(MapInterface):
         Build a NxMap instance from a file
 
         Args:
-            file: The graph pickle file to load the graph from
+            file: The graph pickle, json or .npz map file to load the graph from
 
         Returns:
             A NxMap instance
@@ -198,8 +390,51 @@ class NxMap(MapInterface):
         elif p.suffix == ".json":
             with p.open("r") as f:
                 return NxMap.from_dict(json.load(f))
+        elif p.suffix == ".npz":
+            return NxMap.from_map_arrays(MapArrays.from_file(p))
         else:
-            raise TypeError("NxMap only supports reading from json and pickle files")
+            raise TypeError(
+                "NxMap only supports reading from json, pickle and npz files"
+            )
+
+    @classmethod
+    def from_map_arrays(cls, arrays: MapArrays) -> NxMap:
+        """
+        Build a NxMap from map arrays, like the arrays of a .npz map file
+
+        Args:
+            arrays: The map arrays
+
+        Returns:
+            A NxMap instance
+        """
+        g = nx.MultiDiGraph(
+            crs=arrays.crs,
+            distance_weight=arrays.distance_weight,
+            time_weight=arrays.time_weight,
+        )
+
+        node_ids = arrays.node_ids.tolist()
+        g.add_nodes_from(node_ids)
+
+        weight_names = list(arrays.weights)
+        edges = zip(
+            arrays.edge_sources.tolist(),
+            arrays.edge_targets.tolist(),
+            arrays.edge_keys.tolist(),
+            arrays.geometries().tolist(),
+            arrays.all_road_metadata(),
+            *(arrays.weight_values(name) for name in weight_names),
+        )
+
+        add_edge = g.add_edge
+        for u, v, k, geom, metadata, *weights in edges:
+            attrs = dict(zip(weight_names, weights))
+            attrs[DEFAULT_GEOMETRY_KEY] = geom
+            attrs[DEFAULT_METADATA_KEY] = metadata
+            add_edge(node_ids[u], node_ids[v], k, **attrs)
+
+        return NxMap(g)
 
     @classmethod
     def from_geofence(
@@ -243,14 +478,16 @@ class NxMap(MapInterface):
 
     def to_file(self, outfile: Union[str, Path]):
         """
-        Save the graph to a pickle file
+        Save the graph to a pickle, json or .npz map file
 
         Args:
             outfile: The file to save the graph to
         """
         outfile = Path(outfile)
 
-        if outfile.suffix == ".pickle":
+        if outfile.suffix == ".npz":
+            MapArrays.from_map(self).to_file(outfile)
+        elif outfile.suffix == ".pickle":
             with open(outfile, "wb") as f:
                 pickle.dump(self, f)
         elif outfile.suffix == ".json":
@@ -258,7 +495,7 @@ class NxMap(MapInterface):
             with open(outfile, "w") as f:
                 json.dump(graph_dict, f)
         else:
-            raise TypeError("NxMap only supports writing to json and pickle files")
+            raise TypeError("NxMap only supports writing to json, pickle and npz files")
 
     @classmethod
     def from_dict(cls, d: Dict[str, Any]) -> NxMap:
@@ -320,6 +557,66 @@ class NxMap(MapInterface):
 
         return road
 
+    def nearest_roads(self, coords: Sequence[Coordinate]) -> List[Road]:
+        """
+        Get the nearest road to each of a sequence of coordinates, looking up all the
+        coordinates in the spatial index at once; each road is built once, however
+        many coordinates it is nearest to
+
+        Args:
+            coords: The coordinates to find the nearest roads to, like the coords of a trace
+
+        Returns:
+            The nearest road to each coordinate, in order
+        """
+        points = coordinate_points(coords, self.crs)
+        if len(points) == 0:
+            return []
+
+        nearest_idx, inverse = np.unique(
+            self.rtree.nearest(points), return_inverse=True
+        )
+        roads = [
+            self._build_road(self._road_id_mapping[i]) for i in nearest_idx.tolist()
+        ]
+
+        return [roads[i] for i in inverse.tolist()]
+
+    def road_by_index(self, edge_index: int) -> Road:
+        """
+        Get a road by its edge index, as given by candidate_roads
+
+        Args:
+            edge_index: The edge index of the road
+
+        Returns:
+            The road
+        """
+        return self._build_road(self._road_id_mapping[edge_index])
+
+    def candidate_roads(
+        self,
+        coords: Sequence[Coordinate],
+        radius: float,
+        k: Optional[int] = None,
+    ) -> RoadCandidates:
+        """
+        Find the roads within a radius of each of a sequence of coordinates with one
+        bulk query of the spatial index, without building Road objects;
+        use road_by_index for the candidates that are needed
+
+        Args:
+            coords: The coordinates, like the coords of a trace
+            radius: The search radius, in the units of the map crs
+            k: The maximum number of candidates per coordinate, nearest first,
+                or None to keep all
+
+        Returns:
+            The candidates
+        """
+        points = coordinate_points(coords, self.crs)
+        return query_candidates(self.rtree, points, radius, k)
+
     def shortest_path(
         self,
         origin: Coordinate,
@@ -349,38 +646,140 @@ class NxMap(MapInterface):
         if weight is None:
             weight = self._time_weight
 
-        origin_road = self.nearest_road(origin)
-        dest_road = self.nearest_road(destination)
+        origin_id = self._nearest_node(origin)
+        dest_id = self._nearest_node(destination)
+
+        if self._path_cache is not None:
+            cached_path = self._path_cache.get(origin_id, dest_id, weight)
+            if cached_path is not None:
+                return cached_path
+
+        ch = self._contraction_hierarchy
+        if ch is not None and weight == ch.weight:
+            road_ids = ch.shortest_path(origin_id, dest_id)
+            if road_ids is None:
+                raise nx.NetworkXNoPath(f"No path between {origin_id} and {dest_id}.")
+            nx_route = [origin_id] + [road_id.end for road_id in road_ids]
+        elif self._path_search == "astar" and not callable(weight):
+            nx_route = nx.astar_path(
+                self.g,
+                origin_id,
+                dest_id,
+                heuristic=self._heuristic(weight),
+                weight=weight,
+            )
+        elif self._path_search == "bidirectional" and not callable(weight):
+            _, nx_route = nx.bidirectional_dijkstra(
+                self.g,
+                origin_id,
+                dest_id,
+                weight=weight,
+            )
+        else:
+            nx_route = nx.shortest_path(
+                self.g,
+                origin_id,
+                dest_id,
+                weight=weight,
+            )
 
-        ostart = Point(origin_road.geom.coords[0])
-        oend = Point(origin_road.geom.coords[-1])
+        path = self._route_roads(nx_route)
 
-        dstart = Point(dest_road.geom.coords[0])
-        dend = Point(dest_road.geom.coords[-1])
+        if self._path_cache is not None:
+            self._path_cache.put(origin_id, dest_id, weight, path)
 
-        u_dist = ostart.distance(origin.geom)
-        v_dist = oend.distance(origin.geom)
+        return path
 
-        if u_dist <= v_dist:
-            origin_id = origin_road.road_id.start
-        else:
-            origin_id = origin_road.road_id.end
+    def shortest_paths(
+        self,
+        origin: Coordinate,
+        destinations: List[Coordinate],
+        weight: Optional[Union[str, Callable]] = None,
+    ) -> List[List[Road]]:
+        """
+        Computes the shortest paths from an origin to several destinations
+        with a single Dijkstra search; with a contraction hierarchy for the weight,
+        or another path search, each path is found with shortest_path instead
 
-        u_dist = dstart.distance(destination.geom)
-        v_dist = dend.distance(destination.geom)
+        Unlike shortest_path, which raises NetworkXNoPath, this gives an empty path
+        for a destination that can't be reached.
+
+        Args:
+            origin: The origin coordinate
+            destinations: The destination coordinates
+            weight: The weight to use for the paths, either a string or a function
+
+        Returns:
+            The shortest path to each destination, in order;
+            an empty list for a destination that can't be reached
+        """
+        for coord in [origin, *destinations]:
+            if coord.crs != self.crs:
+                raise ValueError(
+                    f"crs of {coord} {coord.crs} must match crs of map {self.crs}"
+                )
+
+        if weight is None:
+            weight = self._time_weight
+
+        ch = self._contraction_hierarchy
+        if (ch is not None and weight == ch.weight) or (
+            self._path_search != "dijkstra" and not callable(weight)
+        ):
+            single_paths = []
+            for destination in destinations:
+                try:
+                    single_paths.append(self.shortest_path(origin, destination, weight))
+                except nx.NetworkXNoPath:
+                    single_paths.append([])
+            return single_paths
+
+        origin_id = self._nearest_node(origin)
+        dest_ids = [self._nearest_node(d) for d in destinations]
+
+        paths: Dict[Any, List[Road]] = {}
+        if self._path_cache is not None:
+            for dest_id in dest_ids:
+                cached_path = self._path_cache.get(origin_id, dest_id, weight)
+                if cached_path is not None:
+                    paths[dest_id] = cached_path
+
+        targets = set(dest_ids) - set(paths)
+        if targets:
+            routes = self._dijkstra_routes(origin_id, targets, weight)
+            for dest_id in targets:
+                nx_route = routes.get(dest_id)
+                if nx_route is None:
+                    paths[dest_id] = []
+                    continue
+
+                path = self._route_roads(nx_route)
+                paths[dest_id] = path
+
+                if self._path_cache is not None:
+                    self._path_cache.put(origin_id, dest_id, weight, path)
+
+        return [paths[dest_id] for dest_id in dest_ids]
+
+    def _nearest_node(self, coord: Coordinate) -> Any:
+        """
+        The end of the nearest road that is closest to a coordinate,
+        preferring the start of the road
+        """
+        road = self.nearest_road(coord)
+
+        u_dist = Point(road.geom.coords[0]).distance(coord.geom)
+        v_dist = Point(road.geom.coords[-1]).distance(coord.geom)
 
         if u_dist <= v_dist:
-            dest_id = dest_road.road_id.start
+            return road.road_id.start
         else:
-            dest_id = dest_road.road_id.end
-
-        nx_route = nx.shortest_path(
-            self.g,
-            origin_id,
-            dest_id,
-            weight=weight,
-        )
+            return road.road_id.end
 
+    def _route_roads(self, nx_route: List[Any]) -> List[Road]:
+        """
+        The roads along a route of nodes
+        """
         path = []
         for i in range(1, len(nx_route)):
             road_start_node = nx_route[i - 1]
@@ -396,3 +795,57 @@ class NxMap(MapInterface):
             path.append(road)
 
         return path
+
+    def _dijkstra_routes(
+        self, source: Any, targets: Set[Any], weight: Union[str, Callable]
+    ) -> Dict[Any, List[Any]]:
+        """
+        The shortest routes from a source node to a set of target nodes; the search is
+        the same as the networkx Dijkstra search, but stops once every target is settled
+        """
+        if callable(weight):
+            weight_function = weight
+        else:
+            weight_name = weight
+
+            def weight_function(u, v, d):
+                return min(attr.get(weight_name, 1) for attr in d.values())
+
+        succ = self.g._succ
+        dist: Dict[Any, float] = {}
+        seen = {source: 0}
+        pred: Dict[Any, Any] = {}
+        remaining = len(targets)
+
+        counter = itertools.count()
+        fringe = [(0, next(counter), source)]
+        while fringe and remaining:
+            d, _, v = heapq.heappop(fringe)
+            if v in dist:
+                continue
+            dist[v] = d
+            if v in targets:
+                remaining -= 1
+
+            for u, e in succ[v].items():
+                cost = weight_function(v, u, e)
+                if cost is None:
+                    continue
+                vu_dist = d + cost
+                if u not in dist and (u not in seen or vu_dist < seen[u]):
+                    seen[u] = vu_dist
+                    pred[u] = v
+                    heapq.heappush(fringe, (vu_dist, next(counter), u))
+
+        routes = {}
+        for target in targets:
+            if target not in dist:
+                continue
+
+            route = [target]
+            while route[-1] != source:
+                route.append(pred[route[-1]])
+            route.reverse()
+            routes[target] = route
+
+        return routes
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, List, Optional, Tuple, Union
+
+from mappymatch.constructs.road import Road
+
+PathKey = Tuple[Hashable, Hashable, Union[str, Callable]]
+
+
+class ShortestPathCache:
+    """
+    A least recently used cache of shortest paths, keyed by
+    (origin node, destination node, weight).
+
+    Args:
+        capacity: The maximum number of paths to hold
+
+    Attributes:
+        hits: The number of paths that were found in the cache
+        misses: The number of paths that were not found in the cache
+        evictions: The number of paths that were evicted to make room for new ones
+        invalidations: The number of times the cache was cleared because the map changed
+    """
+
+    def __init__(self, capacity: int = 10_000):
+        if capacity < 1:
+            raise ValueError("capacity must be greater than 0")
+
+        self.capacity = capacity
+        self._paths: OrderedDict[PathKey, Tuple[Road, ...]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks can't be pickled; the cache is pickled along with its map
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of paths held in the cache."""
+        return len(self._paths)
+
+    def __str__(self):
+        return (
+            f"ShortestPathCache(paths={len(self)}, capacity={self.capacity}, "
+            f"hits={self.hits}, misses={self.misses}, evictions={self.evictions}, "
+            f"invalidations={self.invalidations})"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    def get(self, origin: Any, destination: Any, weight: Any) -> Optional[List[Road]]:
+        """
+        Get a cached path
+
+        Args:
+            origin: The origin node
+            destination: The destination node
+            weight: The weight the path was computed with
+
+        Returns:
+            A new list of the roads in the path, or None if the path is not cached
+        """
+        key = (origin, destination, weight)
+        with self._lock:
+            path = self._paths.get(key)
+            if path is None:
+                self.misses += 1
+                return None
+
+            self._paths.move_to_end(key)
+            self.hits += 1
+        return list(path)
+
+    def put(self, origin: Any, destination: Any, weight: Any, path: List[Road]):
+        """
+        Add a path to the cache, evicting the least recently used path if full
+
+        Args:
+            origin: The origin node
+            destination: The destination node
+            weight: The weight the path was computed with
+            path: The roads in the path
+        """
+        key = (origin, destination, weight)
+        with self._lock:
+            if key not in self._paths and len(self._paths) >= self.capacity:
+                self._paths.popitem(last=False)
+                self.evictions += 1
+
+            self._paths[key] = tuple(path)
+            self._paths.move_to_end(key)
+
+    def invalidate(self):
+        """
+        Drop all cached paths; called when the weights or geometry of the map change
+        """
+        with self._lock:
+            self._paths.clear()
+            self.invalidations += 1
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import sys
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from mappymatch.maps.csr.csr_map import CSRMap, packed_arrays
+from mappymatch.maps.map_arrays import MapArrays
+from mappymatch.maps.map_interface import MapInterface
+
+# arrays are placed in the shared block at multiples of this many bytes
+_ALIGNMENT = 64
+
+# (name, dtype, shape, byte offset) of each array in the shared block
+ArrayLayout = List[Tuple[str, str, Tuple[int, ...], int]]
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # only the process that created the block should unlink it
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+
+    # older versions register every attached block with the resource tracker, which
+    # would unlink it, or warn about it, when the attaching process exits
+    shm = shared_memory.SharedMemory(name=name)
+    resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore[attr-defined]
+    return shm
+
+
+class SharedMap(CSRMap):
+    """
+    A read-only road map whose arrays live in one block of shared memory, so that
+    worker processes share a single copy of the map.
+
+    The block holds the routing arrays and a grid spatial index along with the map
+    arrays. Pickling a SharedMap only sends the name and layout of the block;
+    the receiving process attaches to the block and uses all of the arrays in place,
+    so the memory of a worker doesn't grow with the size of the map.
+
+    The map that created the block owns it: it must outlive any process using the map
+    and the block is freed when it is closed.
+
+    Args:
+        arrays: The map arrays to copy into shared memory
+
+    Attributes:
+        arrays: The map arrays, as read-only views of the shared memory
+        crs: The coordinate reference system of the map
+    """
+
+    def __init__(self, arrays: MapArrays):
+        named_arrays = packed_arrays(arrays)
+
+        layout: ArrayLayout = []
+        size = 0
+        for name, a in named_arrays.items():
+            layout.append((name, a.dtype.str, a.shape, size))
+            size += -(-a.nbytes // _ALIGNMENT) * _ALIGNMENT
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for (name, dtype, shape, offset), a in zip(layout, named_arrays.values()):
+            view: np.ndarray = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+            view[...] = a
+
+        self._owner = True
+        self._open(shm, layout)
+
+    @classmethod
+    def from_map(cls, road_map: MapInterface) -> SharedMap:
+        """
+        Build a SharedMap from another map, like an NxMap or an IGraphMap
+
+        Args:
+            road_map: The map to share
+
+        Returns:
+            A SharedMap that owns a new block of shared memory
+        """
+        return cls(MapArrays.from_map(road_map))
+
+    def _open(self, shm: shared_memory.SharedMemory, layout: ArrayLayout):
+        self._shm: Optional[shared_memory.SharedMemory] = shm
+        self._layout = layout
+
+        named_arrays = {}
+        for name, dtype, shape, offset in layout:
+            a: np.ndarray = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+            a.flags.writeable = False
+            named_arrays[name] = a
+
+        self._setup_packed(named_arrays)
+
+    def __getstate__(self):
+        if self._shm is None:
+            raise ValueError("cannot pickle a closed SharedMap")
+        return {"name": self._shm.name, "layout": self._layout}
+
+    def __setstate__(self, state):
+        self._owner = False
+        self._open(_attach(state["name"]), state["layout"])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Detach from the shared memory; if this map created the block, the block is freed.
+
+        The map can't be used after it is closed.
+        """
+        if self._shm is None:
+            return
+
+        shm = self._shm
+        self._shm = None
+
+        self._drop_arrays()
+
+        shm.close()
+        if self._owner:
+            shm.unlink()
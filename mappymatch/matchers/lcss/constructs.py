@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 import random
-from typing import List, NamedTuple, Union
+from typing import List, NamedTuple, Optional, Union
 
 import numpy as np
 from numpy import ndarray, signedinteger
@@ -10,12 +10,22 @@ from numpy import ndarray, signedinteger
 from mappymatch.constructs.match import Match
 from mappymatch.constructs.road import Road
 from mappymatch.constructs.trace import Trace
-from mappymatch.matchers.lcss.utils import compress
-from mappymatch.utils.geo import coord_to_coord_dist
+from mappymatch.matchers.lcss import scoring
+from mappymatch.matchers.lcss.utils import compress_indices
 
 log = logging.getLogger(__name__)
 
 
+def _distance(x: float, y: float, xs: ndarray, ys: ndarray) -> ndarray:
+    """
+    Distance from the point (x, y) to each of the points (xs, ys),
+    computed the same way as shapely computes point distances
+    """
+    dx = xs - x
+    dy = ys - y
+    return np.sqrt(dx * dx + dy * dy)
+
+
 class CuttingPoint(NamedTuple):
     """
     A cutting point represents where the LCSS algorithm cuts the trace into a sub-segment.
@@ -37,6 +47,8 @@ class TrajectorySegment(NamedTuple):
         matches: The matches between the trace and the path
         score: The similarity score between the trace and the path
         cutting_points: The points where the trace and path are to be cut
+        match_distances: The distance from each trace point to its matched road,
+            infinite where there is no match; None if not known
     """
 
     trace: Trace
@@ -48,6 +60,8 @@ class TrajectorySegment(NamedTuple):
 
     cutting_points: List[CuttingPoint] = []
 
+    match_distances: Optional[ndarray] = None
+
     def __add__(self, other):
         new_traces = self.trace + other.trace
         new_paths = self.path + other.path
@@ -77,22 +91,37 @@ class TrajectorySegment(NamedTuple):
         """
         return self._replace(cutting_points=cutting_points)
 
-    def set_matches(self, matches) -> TrajectorySegment:
+    def set_matches(
+        self, matches, match_distances: Optional[ndarray] = None
+    ) -> TrajectorySegment:
         """
         Sets the matches of the trajectory segment
 
         Args:
             matches: The matches of the trajectory segment
+            match_distances: The distance from each trace point to its matched road,
+                infinite where there is no match; if not given, it's taken from the matches
 
         Returns:
             The updated trajectory segment
         """
-        return self._replace(matches=matches)
+        return self._replace(matches=matches, match_distances=match_distances)
+
+    def _match_distances(self) -> ndarray:
+        if self.match_distances is not None:
+            return self.match_distances
+
+        return np.array(
+            [m.distance if m.road else np.inf for m in self.matches], dtype=np.float64
+        )
 
     def score_and_match(
         self,
         distance_epsilon: float,
         max_distance: float,
+        chunk_size: Optional[int] = None,
+        sparse: bool = False,
+        distance_cache: Optional[scoring.DistanceCache] = None,
     ) -> TrajectorySegment:
         """
         Computes the score of a trace, pair matching and also matches the coordinates to the nearest road.
@@ -100,6 +129,12 @@ class TrajectorySegment(NamedTuple):
         Args:
             distance_epsilon: The distance threshold for matching
             max_distance: The maximum distance between the trace and the path
+            chunk_size: If set, the number of trace points to score at a time;
+                this bounds the memory used for long traces
+            sparse: If True, only the point / road pairs closer than the distance
+                epsilon are scored
+            distance_cache: An optional cache of point to road distances, shared
+                between segments of the same trace
 
         Returns:
             The updated trajectory segment with a score and matches
@@ -110,8 +145,6 @@ class TrajectorySegment(NamedTuple):
         m = len(trace.coords)
         n = len(path)
 
-        matched_roads = []
-
         if m < 1:
             # todo: find a better way to handle this edge case
             raise Exception("traces of 0 points can't be matched")
@@ -122,58 +155,41 @@ class TrajectorySegment(NamedTuple):
                 Match(road=None, distance=np.inf, coordinate=c)
                 for c in self.trace.coords
             ]
-            return self.set_score(0).set_matches(matches)
-
-        C = [[0 for i in range(n + 1)] for j in range(m + 1)]
-
-        f = trace._frame
-        distances = np.array([f.distance(r.geom).values for r in path])
-
-        for i in range(1, m + 1):
-            nearest_road = None
-            min_dist = np.inf
-            coord = trace.coords[i - 1]
-            for j in range(1, n + 1):
-                road = path[j - 1]
-
-                # dt = road_to_coord_dist(road, coord)
-                dt = distances[j - 1][i - 1]
-
-                if dt < min_dist:
-                    min_dist = dt
-                    nearest_road = road
-
-                if dt < distance_epsilon:
-                    point_similarity = 1 - (dt / distance_epsilon)
-                else:
-                    point_similarity = 0
-
-                C[i][j] = max(
-                    (C[i - 1][j - 1] + point_similarity),
-                    C[i][j - 1],
-                    C[i - 1][j],
-                )
-
-            if min_dist > max_distance:
-                nearest_road = None
-                min_dist = np.inf
+            return self.set_score(0).set_matches(matches, np.full(m, np.inf))
+
+        result = scoring.score(
+            trace,
+            path,
+            distance_epsilon,
+            max_distance,
+            chunk_size=chunk_size,
+            sparse=sparse,
+            distance_cache=distance_cache,
+        )
 
-            match = Match(
-                road=nearest_road,
-                distance=min_dist,
+        matched_roads = [
+            Match(
+                road=path[ri] if ri >= 0 else None,
+                distance=d,
                 coordinate=coord,
             )
-            matched_roads.append(match)
+            for coord, ri, d in zip(
+                trace.coords, result.nearest_road, result.nearest_distance
+            )
+        ]
 
-        sim_score = C[m][n] / float(min(m, n))
+        sim_score = result.score / float(min(m, n))
 
-        return self.set_score(sim_score).set_matches(matched_roads)
+        return self.set_score(sim_score).set_matches(
+            matched_roads, result.nearest_distance
+        )
 
     def compute_cutting_points(
         self,
         distance_epsilon: float,
         cutting_thresh: float,
         random_cuts: int,
+        rng: Optional[random.Random] = None,
     ) -> TrajectorySegment:
         """
         Computes the cutting points for a trajectory segment by:
@@ -184,71 +200,55 @@ class TrajectorySegment(NamedTuple):
             distance_epsilon: The distance threshold for matching
             cutting_thresh: The threshold for cutting the trace
             random_cuts: The number of random cuts to add
+            rng: The random number generator for the random cuts; defaults to the
+                global generator of the random module
 
         Returns:
             The updated trajectory segment with cutting points
         """
-        cutting_points = []
+        trace = self.trace
+        n = len(trace)
 
-        no_match = all([not m.road for m in self.matches])
+        distances = self._match_distances()
+        matched = distances < np.inf
 
-        if not self.path or no_match:
+        cut_indices: List[Union[ndarray, List[int]]] = []
+
+        if not self.path or not matched.any():
             # no path computed or no matches found, possible edge cases:
             # 1. trace starts and ends in the same location: pick points far from the start and end
-            start = self.trace.coords[0]
-            end = self.trace.coords[-1]
+            x = trace.x
+            y = trace.y
 
-            start_end_dist = start.geom.distance(end.geom)
+            start_end_dist = _distance(x[0], y[0], x[-1:], y[-1:])[0]
 
             if start_end_dist < distance_epsilon:
-                p1 = np.argmax(
-                    [coord_to_coord_dist(start, c) for c in self.trace.coords]
-                )
-                p2 = np.argmax([coord_to_coord_dist(end, c) for c in self.trace.coords])
-                assert not isinstance(p1, ndarray)
-                assert not isinstance(p2, ndarray)
-                # To do - np.argmax returns array of indices where the highest value is found.
-                # if there is only one highest value an int is returned. CuttingPoint takes an int.
-                # if an array is returned by argmax, this throws an error
-                cp1 = CuttingPoint(p1)
-                cp2 = CuttingPoint(p2)
-
-                cutting_points.extend([cp1, cp2])
+                p1 = np.argmax(_distance(x[0], y[0], x, y))
+                p2 = np.argmax(_distance(x[-1], y[-1], x, y))
+                cut_indices.append([int(p1), int(p2)])
             else:
                 # pick the middle point on the trace:
-                mid = int(len(self.trace) / 2)
-                cp = CuttingPoint(mid)
-                cutting_points.append(cp)
+                cut_indices.append([int(n / 2)])
         else:
-            # find furthest point
-            pre_i = np.argmax([m.distance for m in self.matches if m.road])
-            cutting_points.append(CuttingPoint(pre_i))
+            # find furthest point; this is the position among the matched points
+            cut_indices.append([int(np.argmax(distances[matched]))])
 
             # collect points that are close to the distance threshold
-            for i, m in enumerate(self.matches):
-                if m.road:
-                    if abs(m.distance - distance_epsilon) < cutting_thresh:
-                        cutting_points.append(CuttingPoint(i))
+            near = matched & (np.abs(distances - distance_epsilon) < cutting_thresh)
+            cut_indices.append(np.flatnonzero(near))
 
         # add random points
-        for _ in range(random_cuts):
-            cpi = random.randint(0, len(self.trace) - 1)
-            cutting_points.append(CuttingPoint(cpi))
+        randint = (rng or random).randint
+        cut_indices.append([randint(0, n - 1) for _ in range(random_cuts)])
 
         # merge cutting points that are adjacent to one another
-        compressed_cuts = list(compress(cutting_points))
+        compressed_cuts = compress_indices(np.concatenate(cut_indices).astype(np.intp))
 
         # it doesn't make sense to cut the trace at the start or end so discard any
         # points that apear in the [0, 1, -1, -2] position with respect to a trace
-        n = len(self.trace)
-        final_cuts = list(
-            filter(
-                lambda cp: cp.trace_index not in [0, 1, n - 2, n - 1],
-                compressed_cuts,
-            )
-        )
+        final_cuts = compressed_cuts[~np.isin(compressed_cuts, [0, 1, n - 2, n - 1])]
 
-        return self.set_cutting_points(final_cuts)
+        return self.set_cutting_points([CuttingPoint(i) for i in final_cuts.tolist()])
 
 
 TrajectoryScheme = List[TrajectorySegment]
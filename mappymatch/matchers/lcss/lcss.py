@@ -1,11 +1,15 @@
 import functools as ft
+import itertools as it
 import logging
+import random
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
 
 from shapely.geometry import Point
 
 from mappymatch.constructs.coordinate import Coordinate
 from mappymatch.maps.map_interface import MapInterface
-from mappymatch.matchers.lcss.constructs import TrajectorySegment
+from mappymatch.matchers.lcss.constructs import TrajectoryScheme, TrajectorySegment
 from mappymatch.matchers.lcss.ops import (
     add_matches_for_stationary_points,
     drop_stationary_points,
@@ -14,6 +18,8 @@ from mappymatch.matchers.lcss.ops import (
     same_trajectory_scheme,
     split_trajectory_segment,
 )
+from mappymatch.matchers.lcss import scoring
+from mappymatch.matchers.lcss.scoring import DistanceCache
 from mappymatch.matchers.matcher_interface import (
     MatcherInterface,
     MatchResult,
@@ -22,6 +28,26 @@ from mappymatch.matchers.matcher_interface import (
 
 log = logging.getLogger(__name__)
 
+# slack for the rounding error between a sum of sub-segment scores and a full score
+_BOUND_TOLERANCE = 1e-9
+
+
+def _same_segment(
+    segment: TrajectorySegment, new_segments: List[TrajectorySegment]
+) -> bool:
+    """
+    Checks if a refinement step left a segment unchanged
+    """
+    if len(new_segments) != 1:
+        return False
+
+    new_segment = new_segments[0]
+    if new_segment.trace is segment.trace and new_segment.path is segment.path:
+        # the segment was re-scored but kept
+        return True
+
+    return same_trajectory_scheme([segment], new_segments)
+
 
 class LCSSMatcher(MatcherInterface):
     """
@@ -40,6 +66,21 @@ class LCSSMatcher(MatcherInterface):
         cutting_threshold: The distance threshold to use for computing cutting points (default: 10 meters)
         random_cuts: The number of random cuts to add at each iteration (default: 0)
         distance_threshold: The distance threshold above which no match is made (default: 10000 meters)
+        score_chunk_size: If set, segments are scored this many trace points at a time,
+            which bounds the scoring memory on long traces (default: None, score all points at once)
+        sparse_scoring: If True, only point / road pairs within the distance epsilon are scored,
+            which avoids computing every distance on long paths (default: False)
+        distance_cache_size: If set, point to road distances are cached across the refinement
+            iterations of a trace, holding at most this many distances (default: None, no cache)
+        executor: If set, the segments of each refinement iteration are processed concurrently
+            on this executor; the output does not depend on the executor, as the random cuts
+            of each segment come from a generator seeded before the segments are dispatched
+            (default: None, serial).
+            A ThreadPoolExecutor shares the road map and the distance cache between workers;
+            with a ProcessPoolExecutor the matcher, including its road map, is sent to the
+            workers with every segment, so it only pays off for very long traces.
+        stationary_threshold: Points closer than this to the previous point are treated as
+            stationary and matched along with it (default: 0.001 meters)
     """
 
     def __init__(
@@ -50,6 +91,11 @@ class LCSSMatcher(MatcherInterface):
         cutting_threshold: float = 10.0,
         random_cuts: int = 0,
         distance_threshold: float = 10000,
+        score_chunk_size: Optional[int] = None,
+        sparse_scoring: bool = False,
+        distance_cache_size: Optional[int] = None,
+        executor: Optional[Executor] = None,
+        stationary_threshold: float = 0.001,
     ):
         self.road_map = road_map
         self.distance_epsilon = distance_epsilon
@@ -57,34 +103,208 @@ class LCSSMatcher(MatcherInterface):
         self.cutting_threshold = cutting_threshold
         self.random_cuts = random_cuts
         self.distance_threshold = distance_threshold
+        self.score_chunk_size = score_chunk_size
+        self.sparse_scoring = sparse_scoring
+        self.distance_cache_size = distance_cache_size
+        self.executor = executor
+        self.stationary_threshold = stationary_threshold
+
+    def __getstate__(self):
+        # executors can't be pickled; worker processes always run serially
+        state = self.__dict__.copy()
+        state["executor"] = None
+        return state
+
+    def _score(
+        self,
+        segment: TrajectorySegment,
+        distance_cache: Optional[DistanceCache] = None,
+    ) -> TrajectorySegment:
+        return segment.score_and_match(
+            self.distance_epsilon,
+            self.distance_threshold,
+            chunk_size=self.score_chunk_size,
+            sparse=self.sparse_scoring,
+            distance_cache=distance_cache,
+        )
+
+    def _join_segment(
+        self, a: TrajectorySegment, b: TrajectorySegment
+    ) -> TrajectorySegment:
+        new_traces = a.trace + b.trace
+        new_path = a.path + b.path
+
+        # test to see if there is a gap between the paths and if so,
+        # try to connect it
+        if len(a.path) > 1 and len(b.path) > 1:
+            end_road = a.path[-1]
+            start_road = b.path[0]
+            if end_road.road_id.end != start_road.road_id.start:
+                o = Coordinate(
+                    coordinate_id=None,
+                    geom=Point(end_road.geom.coords[-1]),
+                    crs=new_traces.crs,
+                )
+                d = Coordinate(
+                    coordinate_id=None,
+                    geom=Point(start_road.geom.coords[0]),
+                    crs=new_traces.crs,
+                )
+                path = self.road_map.shortest_path(o, d)
+                new_path = a.path + path + b.path
+
+        return TrajectorySegment(new_traces, new_path)
+
+    def _refine_segment(
+        self,
+        segment: TrajectorySegment,
+        distance_cache: Optional[DistanceCache] = None,
+        rng: Optional[random.Random] = None,
+    ) -> List[TrajectorySegment]:
+        """
+        Run one refinement step on a segment: score it and, if the score is below the
+        similarity cutoff, try to split it into better fitting segments; the random cuts
+        are drawn from rng.
+
+        Returns:
+            The segments that replace this segment in the next scheme
+        """
+        de = self.distance_epsilon
+        ct = self.cutting_threshold
+        rc = self.random_cuts
+
+        if not segment.matches:
+            segment = self._score(segment, distance_cache)
+
+        scored_segment = segment.compute_cutting_points(de, ct, rc, rng)
+        if scored_segment.score >= self.similarity_cutoff:
+            return [scored_segment]
+
+        # split and check the score
+        new_split = split_trajectory_segment(self.road_map, scored_segment)
+        if len(new_split) == 1 and new_split[0] is scored_segment:
+            # the segment can't be split
+            return [scored_segment]
+
+        # the sub-segment scores bound the joined score and are kept for the next round
+        new_split = [
+            self._score(s, distance_cache) if len(s.trace) > 0 else s for s in new_split
+        ]
+        joined_segment = ft.reduce(self._join_segment, new_split)
+        if self._joined_score_is_better(
+            joined_segment, new_split, scored_segment.score, distance_cache
+        ):
+            # we found a better fit
+            return new_split
+        else:
+            return [scored_segment]
+
+    def _joined_score_is_better(
+        self,
+        joined_segment: TrajectorySegment,
+        sub_segments: List[TrajectorySegment],
+        score: float,
+        distance_cache: Optional[DistanceCache] = None,
+    ) -> bool:
+        """
+        Decides if the joined segment scores better than the given score.
+
+        The LCSS of the joined segment is at least the sum of the LCSS of the scored
+        sub-segments it was joined from, and at most scoring.lcss_upper_bound;
+        the joined segment is only fully scored when neither bound decides.
+        """
+        m = len(joined_segment.trace)
+        n = len(joined_segment.path)
+
+        if m > 0 and n > 1:
+            norm = float(min(m, n))
+
+            lower = sum(
+                s.score * min(len(s.trace), len(s.path))
+                for s in sub_segments
+                if s.matches
+            )
+            if lower / norm > score + _BOUND_TOLERANCE:
+                return True
+
+            upper = scoring.lcss_upper_bound(
+                joined_segment.trace, joined_segment.path, self.distance_epsilon
+            )
+            if upper / norm + _BOUND_TOLERANCE <= score:
+                return False
+
+        return self._score(joined_segment, distance_cache).score > score
+
+    def _refine_scheme(
+        self,
+        scheme: TrajectoryScheme,
+        frozen: List[bool],
+        distance_cache: Optional[DistanceCache] = None,
+    ) -> Tuple[TrajectoryScheme, List[bool], bool]:
+        """
+        Run one refinement step on every segment of a scheme that is not frozen,
+        concurrently if the matcher has an executor.
+
+        A segment is frozen once a refinement step leaves it unchanged and running the
+        step again is known to give the same result: either it scored above the
+        similarity cutoff or there are no random cuts to make its split come out
+        differently. Frozen segments are carried over with their stored score and matches.
+
+        Returns:
+            The next scheme, which of its segments are frozen and whether any segment changed
+        """
+        dirty = [s for s, f in zip(scheme, frozen) if not f]
+
+        # each segment draws its random cuts from its own generator, seeded here in
+        # segment order, so the cuts don't depend on which worker runs the segment
+        rngs: List[Optional[random.Random]]
+        if self.random_cuts > 0:
+            rngs = [random.Random(random.getrandbits(64)) for _ in dirty]
+        else:
+            rngs = [None] * len(dirty)
+
+        if self.executor is None or len(dirty) < 2:
+            refined = [
+                self._refine_segment(s, distance_cache, rng)
+                for s, rng in zip(dirty, rngs)
+            ]
+        else:
+            if not isinstance(self.executor, ThreadPoolExecutor):
+                # the cache can only be shared between threads
+                distance_cache = None
+            refined = list(
+                self.executor.map(
+                    self._refine_segment, dirty, it.repeat(distance_cache), rngs
+                )
+            )
+
+        next_scheme: TrajectoryScheme = []
+        next_frozen: List[bool] = []
+        changed = False
+
+        refined_segments = iter(refined)
+        for segment, is_frozen in zip(scheme, frozen):
+            if is_frozen:
+                next_scheme.append(segment)
+                next_frozen.append(True)
+                continue
+
+            new_segments = next(refined_segments)
+            if _same_segment(segment, new_segments):
+                new_segment = new_segments[0]
+                next_scheme.append(new_segment)
+                next_frozen.append(
+                    self.random_cuts == 0 or new_segment.score >= self.similarity_cutoff
+                )
+            else:
+                changed = True
+                next_scheme.extend(new_segments)
+                next_frozen.extend(False for _ in new_segments)
+
+        return next_scheme, next_frozen, changed
 
     def match_trace(self, trace: Trace) -> MatchResult:
-        def _join_segment(a: TrajectorySegment, b: TrajectorySegment):
-            new_traces = a.trace + b.trace
-            new_path = a.path + b.path
-
-            # test to see if there is a gap between the paths and if so,
-            # try to connect it
-            if len(a.path) > 1 and len(b.path) > 1:
-                end_road = a.path[-1]
-                start_road = b.path[0]
-                if end_road.road_id.end != start_road.road_id.start:
-                    o = Coordinate(
-                        coordinate_id=None,
-                        geom=Point(end_road.geom.coords[-1]),
-                        crs=new_traces.crs,
-                    )
-                    d = Coordinate(
-                        coordinate_id=None,
-                        geom=Point(start_road.geom.coords[0]),
-                        crs=new_traces.crs,
-                    )
-                    path = self.road_map.shortest_path(o, d)
-                    new_path = a.path + path + b.path
-
-            return TrajectorySegment(new_traces, new_path)
-
-        stationary_index = find_stationary_points(trace)
+        stationary_index = find_stationary_points(trace, self.stationary_threshold)
 
         sub_trace = drop_stationary_points(trace, stationary_index)
 
@@ -92,43 +312,39 @@ class LCSSMatcher(MatcherInterface):
         de = self.distance_epsilon
         ct = self.cutting_threshold
         rc = self.random_cuts
-        dt = self.distance_threshold
-        initial_segment = (
-            TrajectorySegment(trace=sub_trace, path=new_path(road_map, sub_trace))
-            .score_and_match(de, dt)
-            .compute_cutting_points(de, ct, rc)
-        )
+
+        if self.distance_cache_size is not None:
+            distance_cache = DistanceCache(sub_trace, self.distance_cache_size)
+        else:
+            distance_cache = None
+
+        initial_segment = self._score(
+            TrajectorySegment(trace=sub_trace, path=new_path(road_map, sub_trace)),
+            distance_cache,
+        ).compute_cutting_points(de, ct, rc)
 
         initial_scheme = split_trajectory_segment(road_map, initial_segment)
         scheme = initial_scheme
 
+        frozen = [False] * len(scheme)
+
         n = 0
         while n < 10:
-            next_scheme = []
-            for segment in scheme:
-                scored_segment = segment.score_and_match(de, dt).compute_cutting_points(
-                    de, ct, rc
-                )
-                if scored_segment.score >= self.similarity_cutoff:
-                    next_scheme.append(scored_segment)
-                else:
-                    # split and check the score
-                    new_split = split_trajectory_segment(road_map, scored_segment)
-                    joined_segment = ft.reduce(
-                        _join_segment, new_split
-                    ).score_and_match(de, dt)
-                    if joined_segment.score > scored_segment.score:
-                        # we found a better fit
-                        next_scheme.extend(new_split)
-                    else:
-                        next_scheme.append(scored_segment)
+            next_scheme, next_frozen, changed = self._refine_scheme(
+                scheme, frozen, distance_cache
+            )
             n += 1
-            if same_trajectory_scheme(scheme, next_scheme):
+            if not changed:
                 break
 
-            scheme = next_scheme
+            scheme, frozen = next_scheme, next_frozen
+
+        joined_segment = self._score(
+            ft.reduce(self._join_segment, scheme), distance_cache
+        )
 
-        joined_segment = ft.reduce(_join_segment, scheme).score_and_match(de, dt)
+        if distance_cache is not None:
+            log.debug(f"LCSS point to road {distance_cache}")
 
         matches = joined_segment.matches
 
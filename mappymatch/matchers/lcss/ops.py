@@ -1,7 +1,8 @@
 import logging
-from copy import deepcopy
 from typing import Any, List, NamedTuple
 
+import numpy as np
+
 from mappymatch.constructs.coordinate import Coordinate
 from mappymatch.constructs.match import Match
 from mappymatch.constructs.road import Road
@@ -146,41 +147,39 @@ class StationaryIndex(NamedTuple):
     c_index: List[Any]  # coordinate ids
 
 
-def find_stationary_points(trace: Trace) -> List[StationaryIndex]:
+def find_stationary_points(
+    trace: Trace, distance_threshold: float = 0.001
+) -> List[StationaryIndex]:
     """
     Find the positional index of all stationary points in a trace
 
     Args:
         trace: the trace to find the stationary points in
+        distance_threshold: points closer than this to the previous point are stationary
 
     Returns:
         a list of stationary indices
     """
-    f = trace._frame
-    coords = trace.coords
-    dist = f.distance(f.shift())
+    x = trace.x
+    y = trace.y
+    dx = x[1:] - x[:-1]
+    dy = y[1:] - y[:-1]
+
+    # stationary[i] is True if point i + 1 is within the threshold of point i
+    stationary = np.sqrt(dx * dx + dy * dy) < distance_threshold
+
+    # run length encode the stationary steps; a run of steps from point a to point b
+    # makes points a through b a stationary group
+    edges = np.diff(stationary.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) + 1
+
+    index = trace.index
     index_collections = []
-    index = set()
-    for i in range(1, len(dist)):
-        d = dist.iloc[i]  # distance to previous point
-        if d < 0.001:
-            index.add(i - 1)
-            index.add(i)
-        else:
-            # there is distance between this point and the previous
-            if index:
-                l_index = sorted(list(index))
-                cids = [coords[li].coordinate_id for li in l_index]
-                si = StationaryIndex(l_index, cids)
-                index_collections.append(si)
-                index = set()
-
-    # catch any group of points at the end
-    if index:
-        l_index = sorted(list(index))
-        cids = [coords[li].coordinate_id for li in l_index]
-        si = StationaryIndex(l_index, cids)
-        index_collections.append(si)
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        l_index = list(range(start, end))
+        cids = list(index[start:end])
+        index_collections.append(StationaryIndex(l_index, cids))
 
     return index_collections
 
@@ -198,10 +197,12 @@ def drop_stationary_points(
     Returns:
         the trace with the stationary points dropped
     """
-    for si in stationary_index:
-        trace = trace.drop(si.c_index[1:])
+    if not stationary_index:
+        return trace
 
-    return trace
+    drop_ids = [ci for si in stationary_index for ci in si.c_index[1:]]
+
+    return trace.drop(drop_ids)
 
 
 def add_matches_for_stationary_points(
@@ -211,6 +212,8 @@ def add_matches_for_stationary_points(
     """
     Takes a set of matches and adds duplicate match entries for stationary
 
+    The roads and geometries of the input matches are shared with the output matches.
+
     Args:
         matches: the matches to add the stationary points to
         stationary_index: the stationary indices to add
@@ -218,17 +221,55 @@ def add_matches_for_stationary_points(
     Returns:
         the matches with the stationary points added
     """
-    matches = deepcopy(matches)
-
+    n_matches = len(matches)
+    n_out = n_matches + sum(len(si.c_index) - 1 for si in stationary_index)
+
+    # the position in matches that each output match is taken from
+    source = np.empty(n_out, dtype=np.intp)
+    is_stationary = np.zeros(n_out, dtype=bool)
+    stationary_ids = []
+
+    # each group is inserted into the list built so far, so its indices are relative
+    # to the input matches plus the points inserted by the groups before it
+    end = 0
+    inserted = 0
     for si in stationary_index:
+        length = n_matches + inserted
+
         mi = si.i_index[0]
+        if mi < 0:
+            mi += length
+        if not 0 <= mi < length:
+            raise IndexError("stationary index out of range")
+
+        pi = si.i_index[1]
+        if pi < 0:
+            pi = max(pi + length, 0)
+        pi = min(pi, length)
+        if pi < end:
+            raise ValueError("stationary indices must be in trace order")
+
+        source[end:pi] = np.arange(end - inserted, pi - inserted)
+        mi_source = source[mi] if mi < pi else mi - inserted
+
+        k = len(si.c_index) - 1
+        source[pi : pi + k] = mi_source
+        is_stationary[pi : pi + k] = True
+        stationary_ids.extend(si.c_index[1:])
+
+        end = pi + k
+        inserted += k
+
+    source[end:] = np.arange(end - inserted, n_matches)
+
+    new_ids = iter(stationary_ids)
+    new_matches = []
+    for mi, stationary in zip(source.tolist(), is_stationary.tolist()):
         m = matches[mi]
-        new_matches = [
-            m.set_coordinate(
-                Coordinate(ci, geom=m.coordinate.geom, crs=m.coordinate.crs)
+        if stationary:
+            m = m.set_coordinate(
+                Coordinate(next(new_ids), geom=m.coordinate.geom, crs=m.coordinate.crs)
             )
-            for ci in si.c_index[1:]
-        ]
-        matches[si.i_index[1] : si.i_index[1]] = new_matches
+        new_matches.append(m)
 
-    return matches
+    return new_matches
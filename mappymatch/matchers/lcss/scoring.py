@@ -0,0 +1,508 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Iterator, List, NamedTuple, Optional
+
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+
+from mappymatch.constructs.road import Road, RoadId
+from mappymatch.constructs.trace import Trace
+
+
+class ScoreResult(NamedTuple):
+    """
+    The raw output of the LCSS scoring kernel.
+
+    Attributes:
+        score: The (un-normalized) LCSS similarity between the trace and the path
+        nearest_road: For each trace point, the position of the nearest road in the path
+            or -1 if no road is within the max distance
+        nearest_distance: For each trace point, the distance to the nearest road
+            or infinity if no road is within the max distance
+    """
+
+    score: float
+    nearest_road: np.ndarray
+    nearest_distance: np.ndarray
+
+
+class DistanceCache:
+    """
+    A bounded cache of point to road distances for a single trace,
+    keyed by (coordinate id, road id).
+
+    Distances are stored as one column per road over all the points of the trace;
+    once more than max_size distances would be held, whole road columns are evicted,
+    least recently used first.
+
+    Args:
+        trace: The trace whose coordinates will be cached; any trace scored with this
+            cache must be made of coordinates from this trace
+        max_size: The maximum number of point to road distances to hold
+
+    Attributes:
+        hits: The number of distances that were found in the cache
+        misses: The number of distances that had to be computed
+        evictions: The number of road columns that were evicted
+    """
+
+    def __init__(self, trace: Trace, max_size: int = 10_000_000):
+        if max_size < 1:
+            raise ValueError("max_size must be greater than 0")
+
+        self._index = trace.index
+        self._max_roads = max(1, max_size // max(len(trace), 1))
+        self._columns: OrderedDict[RoadId, np.ndarray] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        # the cache can be shared by threads scoring segments of the same trace
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Number of road columns held in the cache."""
+        return len(self._columns)
+
+    def __str__(self):
+        return (
+            f"DistanceCache(roads={len(self)}, hits={self.hits}, "
+            f"misses={self.misses}, evictions={self.evictions})"
+        )
+
+    def __repr__(self):
+        return self.__str__()
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of distance lookups that were served from the cache."""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def positions(self, trace: Trace) -> np.ndarray:
+        """
+        Get the positions of the coordinates of a trace within the cached trace
+
+        Args:
+            trace: A trace made of coordinates from the cached trace
+
+        Returns:
+            An array of integer positions
+        """
+        positions = self._index.get_indexer(trace.index)
+        if (positions < 0).any():
+            raise ValueError("trace has coordinates that are not part of the cache")
+        return positions
+
+    def _column(self, road_id: RoadId) -> np.ndarray:
+        column = self._columns.get(road_id)
+        if column is None:
+            if len(self._columns) >= self._max_roads:
+                self._columns.popitem(last=False)
+                self.evictions += 1
+            # distances are never negative, so -1 marks a distance not yet computed
+            column = np.full(len(self._index), -1.0)
+            self._columns[road_id] = column
+        else:
+            self._columns.move_to_end(road_id)
+        return column
+
+    def distances(
+        self, points: np.ndarray, positions: np.ndarray, path: List[Road]
+    ) -> np.ndarray:
+        """
+        Looks up the distances between points and roads, computing and storing
+        any that are missing
+
+        Args:
+            points: An array of point geometries
+            positions: The positions of the points in the cached trace
+            path: The roads
+
+        Returns:
+            An (n_points, n_roads) array of distances
+        """
+        distances = np.empty((len(points), len(path)))
+        for j, road in enumerate(path):
+            with self._lock:
+                column = self._column(road.road_id)
+            d = column[positions]
+
+            missing = d < 0
+            n_missing = int(missing.sum())
+            if n_missing:
+                d[missing] = shapely.distance(points[missing], road.geom)
+                column[positions[missing]] = d[missing]
+
+            with self._lock:
+                self.hits += len(d) - n_missing
+                self.misses += n_missing
+            distances[:, j] = d
+
+        return distances
+
+
+def point_road_distances(
+    trace: Trace, path: List[Road], cache: Optional[DistanceCache] = None
+) -> np.ndarray:
+    """
+    Computes the distance between every point in the trace and every road in the path
+
+    Args:
+        trace: The trace
+        path: The path
+        cache: An optional cache to look up and store the distances in
+
+    Returns:
+        An (n_points, n_roads) array of distances
+    """
+    points = trace.geometry
+
+    if cache is not None:
+        return cache.distances(points, cache.positions(trace), path)
+
+    geoms = np.array([r.geom for r in path], dtype=object)
+
+    return shapely.distance(points[:, np.newaxis], geoms[np.newaxis, :])
+
+
+def iter_point_road_distances(
+    trace: Trace,
+    path: List[Road],
+    chunk_size: int,
+    cache: Optional[DistanceCache] = None,
+) -> Iterator[np.ndarray]:
+    """
+    Streams the point to road distances in blocks of trace points so that only
+    a (chunk_size, n_roads) array is held in memory at any time
+
+    Args:
+        trace: The trace
+        path: The path
+        chunk_size: The number of trace points in each block
+        cache: An optional cache to look up and store the distances in
+
+    Yields:
+        (chunk_size, n_roads) arrays of distances, in trace order
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be greater than 0")
+
+    points = trace.geometry
+
+    if cache is not None:
+        positions = cache.positions(trace)
+        for start in range(0, len(points), chunk_size):
+            stop = start + chunk_size
+            yield cache.distances(points[start:stop], positions[start:stop], path)
+        return
+
+    geoms = np.array([r.geom for r in path], dtype=object)[np.newaxis, :]
+
+    for start in range(0, len(points), chunk_size):
+        block = points[start : start + chunk_size, np.newaxis]
+        yield shapely.distance(block, geoms)
+
+
+def point_similarity(distances: np.ndarray, distance_epsilon: float) -> np.ndarray:
+    """
+    Converts point to road distances into a similarity in [0, 1];
+    any distance at or beyond the distance epsilon has no similarity
+
+    Args:
+        distances: An array of point to road distances
+        distance_epsilon: The distance threshold for matching
+
+    Returns:
+        An array of similarities with the same shape as the distances
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        similarity = 1 - (distances / distance_epsilon)
+    return np.where(distances < distance_epsilon, similarity, 0.0)
+
+
+def lcss_rows(similarity: np.ndarray, row: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Advances the LCSS dynamic programming table over a block of trace points.
+
+    Only a single row of the table is kept in memory; each row is computed from
+    the previous one with a vectorized maximum followed by a running maximum
+    along the path.
+
+    Args:
+        similarity: The (n_points, n_roads) point to road similarities
+        row: The last row of the table computed so far; None to start a new table
+
+    Returns:
+        The last row of the table after consuming the block
+    """
+    n = similarity.shape[1]
+    if row is None:
+        row = np.zeros(n + 1)
+    for point_similarity in similarity:
+        next_row = np.zeros(n + 1)
+        np.maximum(row[:-1] + point_similarity, row[1:], out=next_row[1:])
+        np.maximum.accumulate(next_row, out=next_row)
+        row = next_row
+
+    return row
+
+
+def lcss_score(similarity: np.ndarray) -> float:
+    """
+    Computes the LCSS similarity from a (n_points, n_roads) similarity array.
+
+    Args:
+        similarity: The point to road similarities
+
+    Returns:
+        The LCSS similarity (the last cell of the dynamic programming table)
+    """
+    return float(lcss_rows(similarity)[-1])
+
+
+def nearest_roads(distances: np.ndarray, max_distance: float) -> tuple:
+    """
+    Finds the nearest road for each point from a (n_points, n_roads) distance array
+
+    Args:
+        distances: The point to road distances
+        max_distance: The maximum distance between a point and its matched road
+
+    Returns:
+        A tuple of the nearest road positions (-1 if no match) and their distances
+        (infinity if no match)
+    """
+    distances = np.where(np.isnan(distances), np.inf, distances)
+    nearest = np.argmin(distances, axis=1)
+    nearest_distance = distances[np.arange(len(distances)), nearest]
+
+    no_match = ~(nearest_distance < np.inf) | (nearest_distance > max_distance)
+    nearest = np.where(no_match, -1, nearest)
+    nearest_distance = np.where(no_match, np.inf, nearest_distance)
+
+    return nearest, nearest_distance
+
+
+def lcss_upper_bound(trace: Trace, path: List[Road], distance_epsilon: float) -> float:
+    """
+    An upper bound on the (un-normalized) LCSS similarity between a trace and a path.
+
+    Every point and every road is used at most once by the LCSS and contributes at most
+    its best similarity, so the LCSS is at most the smaller of the sums of the best
+    similarity per point and per road. Only the pairs closer than the distance epsilon
+    are looked at.
+
+    Args:
+        trace: The trace
+        path: The path
+        distance_epsilon: The distance threshold for matching
+
+    Returns:
+        The upper bound
+    """
+    points = trace.geometry
+    geoms = np.array([r.geom for r in path], dtype=object)
+
+    pi, ri = STRtree(geoms).query(
+        points, predicate="dwithin", distance=distance_epsilon
+    )
+    similarity = point_similarity(
+        shapely.distance(points[pi], geoms[ri]), distance_epsilon
+    )
+
+    best_per_point = np.zeros(len(points))
+    np.maximum.at(best_per_point, pi, similarity)
+    best_per_road = np.zeros(len(geoms))
+    np.maximum.at(best_per_road, ri, similarity)
+
+    return float(min(best_per_point.sum(), best_per_road.sum()))
+
+
+class _PrefixMaxTree:
+    """
+    A Fenwick tree over the positions of a path that answers running maximum queries;
+    used as the sparse equivalent of a row of the LCSS dynamic programming table.
+    """
+
+    def __init__(self, n: int):
+        self._tree = [0.0] * (n + 1)
+
+    def query(self, j: int) -> float:
+        """
+        The maximum value at any position in [1, j]
+        """
+        tree = self._tree
+        best = 0.0
+        while j > 0:
+            if tree[j] > best:
+                best = tree[j]
+            j -= j & -j
+        return best
+
+    def update(self, j: int, value: float):
+        """
+        Raise the value at position j (1 based) to at least the given value
+        """
+        tree = self._tree
+        n = len(tree)
+        while j < n:
+            if value > tree[j]:
+                tree[j] = value
+            j += j & -j
+
+
+def sparse_score(
+    trace: Trace,
+    path: List[Road],
+    distance_epsilon: float,
+    max_distance: float,
+    chunk_size: Optional[int] = None,
+) -> ScoreResult:
+    """
+    Scores a trace against a path using only the point / road pairs that are
+    closer than the distance epsilon.
+
+    Candidate pairs are found with a spatial index over the path (a dwithin query,
+    equivalent to intersecting the points with the roads buffered by epsilon) and
+    the LCSS is computed as the heaviest chain of candidate pairs that increases in
+    both trace and path order. Pairs at or beyond epsilon have no similarity
+    and so the result is the same as the dense computation but the work is
+    proportional to the number of candidate pairs rather than n_points * n_roads.
+
+    Args:
+        trace: The trace to score
+        path: The path to score against
+        distance_epsilon: The distance threshold for matching
+        max_distance: The maximum distance between a point and its matched road
+        chunk_size: The number of trace points to query at a time; None for all at once
+
+    Returns:
+        The score result
+    """
+    points = trace.geometry
+    geoms = np.array([r.geom for r in path], dtype=object)
+    tree = STRtree(geoms)
+
+    if chunk_size is None:
+        chunk_size = max(len(points), 1)
+    elif chunk_size < 1:
+        raise ValueError("chunk_size must be greater than 0")
+
+    max_query_distance = max_distance if np.isfinite(max_distance) else None
+
+    dp = _PrefixMaxTree(len(path))
+    nearest = np.full(len(points), -1, dtype=np.intp)
+    nearest_distance = np.full(len(points), np.inf)
+
+    for start in range(0, len(points), chunk_size):
+        block = points[start : start + chunk_size]
+
+        # similarity: visit the candidate pairs in trace order, then path order
+        pi, ri = tree.query(block, predicate="dwithin", distance=distance_epsilon)
+        distances = shapely.distance(block[pi], geoms[ri])
+        close = distances < distance_epsilon
+        pi, ri = pi[close], ri[close]
+        similarity = point_similarity(distances[close], distance_epsilon)
+
+        order = np.lexsort((ri, pi))
+        pi, ri, similarity = pi[order], ri[order], similarity[order]
+
+        row_breaks = np.flatnonzero(np.diff(pi)) + 1
+        for row_ri, row_sim in zip(
+            np.split(ri, row_breaks), np.split(similarity, row_breaks)
+        ):
+            # all the reads for a trace point must come from the previous points
+            cols = row_ri.tolist()
+            values = [dp.query(j) + s for j, s in zip(cols, row_sim.tolist())]
+            for j, v in zip(cols, values):
+                dp.update(j + 1, v)
+
+        # nearest road: ties go to the first road in the path
+        (pi, ri), distances = tree.query_nearest(
+            block,
+            max_distance=max_query_distance,
+            return_distance=True,
+            all_matches=True,
+        )
+        order = np.lexsort((ri, pi))
+        pi, ri, distances = pi[order], ri[order], distances[order]
+        pi, first = np.unique(pi, return_index=True)
+
+        nearest[start + pi] = ri[first]
+        nearest_distance[start + pi] = distances[first]
+
+    no_match = nearest_distance > max_distance
+    nearest[no_match] = -1
+    nearest_distance[no_match] = np.inf
+
+    return ScoreResult(dp.query(len(path)), nearest, nearest_distance)
+
+
+def score(
+    trace: Trace,
+    path: List[Road],
+    distance_epsilon: float,
+    max_distance: float,
+    chunk_size: Optional[int] = None,
+    sparse: bool = False,
+    distance_cache: Optional[DistanceCache] = None,
+) -> ScoreResult:
+    """
+    Scores a trace against a path and finds the nearest road for each point
+
+    By default, the full point to road distance matrix is computed at once.
+    If a chunk size is given, the distances are streamed in blocks of trace points
+    and the memory used is proportional to chunk_size * n_roads, regardless of the
+    length of the trace.
+
+    Args:
+        trace: The trace to score
+        path: The path to score against
+        distance_epsilon: The distance threshold for matching
+        max_distance: The maximum distance between a point and its matched road
+        chunk_size: The number of trace points to score at a time; None for all at once
+        sparse: If True, only score the point / road pairs within the distance epsilon
+            (see sparse_score)
+        distance_cache: An optional cache to look up and store the point to road
+            distances in; not used by the sparse scoring
+
+    Returns:
+        The score result
+    """
+    if sparse:
+        return sparse_score(
+            trace, path, distance_epsilon, max_distance, chunk_size=chunk_size
+        )
+
+    if chunk_size is None:
+        distances = point_road_distances(trace, path, distance_cache)
+        similarity = point_similarity(distances, distance_epsilon)
+
+        nearest, nearest_distance = nearest_roads(distances, max_distance)
+
+        return ScoreResult(lcss_score(similarity), nearest, nearest_distance)
+
+    row = None
+    nearest = np.empty(len(trace), dtype=np.intp)
+    nearest_distance = np.empty(len(trace))
+
+    start = 0
+    for distances in iter_point_road_distances(trace, path, chunk_size, distance_cache):
+        stop = start + len(distances)
+
+        similarity = point_similarity(distances, distance_epsilon)
+        row = lcss_rows(similarity, row)
+
+        nearest[start:stop], nearest_distance[start:stop] = nearest_roads(
+            distances, max_distance
+        )
+        start = stop
+
+    sim = 0.0 if row is None else float(row[-1])
+
+    return ScoreResult(sim, nearest, nearest_distance)
@@ -3,6 +3,8 @@ from itertools import groupby
 from operator import itemgetter
 from typing import Any, Callable, Generator, List
 
+import numpy as np
+
 
 def forward_merge(merge_list: List, condition: Callable[[Any], bool]) -> List:
     """
@@ -128,3 +130,26 @@ def compress(cutting_points: List) -> Generator:
     for k, g in groupby(enumerate(sorted_cuts), lambda x: x[0] - x[1].trace_index):
         all_cps = list(map(itemgetter(1), g))
         yield all_cps[int(len(all_cps) / 2)]
+
+
+def compress_indices(indices: np.ndarray) -> np.ndarray:
+    """
+    Compress an array of trace indices if they happen to be directly adjacent to another;
+    the array version of compress
+
+    Args:
+        indices: the trace indices of the cutting points
+
+    Returns:
+        the sorted, compressed trace indices
+    """
+    sorted_indices = np.sort(indices, kind="stable")
+    if len(sorted_indices) < 1:
+        return sorted_indices
+
+    # adjacent indices share the same offset from their position in the sorted array
+    offset = np.arange(len(sorted_indices)) - sorted_indices
+    starts = np.concatenate([[0], np.flatnonzero(offset[1:] != offset[:-1]) + 1])
+    ends = np.append(starts[1:], len(sorted_indices))
+
+    return sorted_indices[starts + (ends - starts) // 2]
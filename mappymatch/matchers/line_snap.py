@@ -1,6 +1,9 @@
 import logging
 from typing import List
 
+import numpy as np
+import shapely
+
 from mappymatch.constructs.match import Match
 from mappymatch.constructs.trace import Trace
 from mappymatch.maps.map_interface import MapInterface
@@ -21,18 +24,26 @@ class LineSnapMatcher(MatcherInterface):
         self.map = road_map
 
     def match_trace(self, trace: Trace) -> MatchResult:
-        matches = []
+        coords = trace.coords
+        if len(coords) == 0:
+            return MatchResult([])
+
+        nearest_roads = self.map.nearest_roads(coords)
+
+        road_geoms = np.empty(len(nearest_roads), dtype=object)
+        road_geoms[:] = [road.geom for road in nearest_roads]
+
+        nearest_points = shapely.line_interpolate_point(
+            road_geoms, shapely.line_locate_point(road_geoms, coords.geometries())
+        )
+        distances = shapely.distance(road_geoms, nearest_points).tolist()
 
-        for coord in trace.coords:
-            nearest_road = self.map.nearest_road(coord)
-            nearest_point = nearest_road.geom.interpolate(
-                nearest_road.geom.project(coord.geom)
-            )
-            dist = nearest_road.geom.distance(nearest_point)
-            match = Match(nearest_road, coord, dist)
-            matches.append(match)
+        matches = [
+            Match(road, coord, dist)
+            for road, coord, dist in zip(nearest_roads, coords, distances)
+        ]
 
         return MatchResult(matches)
 
     def match_trace_batch(self, trace_batch: List[Trace]) -> List[MatchResult]:
-        return [self.match_trace(t) for t in trace_batch]
+        return list(self.match_traces(trace_batch))
@@ -1,8 +1,28 @@
+from __future__ import annotations
+
+import itertools as it
 from abc import ABCMeta, abstractmethod
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterable, Iterator, List, Optional
 
 from mappymatch.constructs.trace import Trace
 from mappymatch.matchers.match_result import MatchResult
 
+# the matcher of a worker process, set once by the pool initializer
+_worker_matcher: Optional[MatcherInterface] = None
+
+
+def _init_worker(matcher: MatcherInterface):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _match_in_worker(traces: List[Trace]) -> List[MatchResult]:
+    if _worker_matcher is None:
+        raise RuntimeError("worker process was not initialized with a matcher")
+    return [_worker_matcher.match_trace(t) for t in traces]
+
 
 class MatcherInterface(metaclass=ABCMeta):
     """
@@ -20,3 +40,63 @@ class MatcherInterface(metaclass=ABCMeta):
         Returns:
             A list of Match objects
         """
+
+    def match_traces(
+        self,
+        traces: Iterable[Trace],
+        workers: int = 1,
+        chunksize: int = 1,
+    ) -> Iterator[MatchResult]:
+        """
+        Match many traces, optionally over a pool of worker processes.
+
+        The matcher, including its road map, is sent to each worker once when the
+        worker starts; after that only the traces and results are sent between processes.
+        Traces are read from the iterable as workers free up and the results are
+        yielded in the same order as the traces.
+
+        Args:
+            traces: The traces to match
+            workers: The number of worker processes; 1 matches the traces in this process
+            chunksize: The number of traces to send to a worker at a time
+
+        Returns:
+            An iterator of the match results, in the order of the traces
+        """
+        if workers < 1:
+            raise ValueError("workers must be greater than 0")
+        if chunksize < 1:
+            raise ValueError("chunksize must be greater than 0")
+
+        if workers == 1:
+            return (self.match_trace(t) for t in traces)
+
+        return self._match_traces_in_pool(traces, workers, chunksize)
+
+    def _match_traces_in_pool(
+        self, traces: Iterable[Trace], workers: int, chunksize: int
+    ) -> Iterator[MatchResult]:
+        trace_iter = iter(traces)
+        # keep every worker busy without reading the whole iterable up front
+        max_pending = 2 * workers
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(self,)
+        ) as executor:
+            pending: Deque[Future] = deque()
+            try:
+                while True:
+                    while len(pending) < max_pending:
+                        chunk = list(it.islice(trace_iter, chunksize))
+                        if not chunk:
+                            break
+                        pending.append(executor.submit(_match_in_worker, chunk))
+
+                    if not pending:
+                        break
+
+                    yield from pending.popleft().result()
+            finally:
+                # the caller stopped early or a trace failed to match
+                for future in pending:
+                    future.cancel()
@@ -0,0 +1,123 @@
+from typing import List
+from unittest import TestCase
+
+import numpy as np
+import osmnx as ox
+
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.csr.csr_map import CSRMap
+from mappymatch.constructs.road import Road
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.map_interface import MapInterface
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+class RoadListMap(MapInterface):
+    """
+    A map that only implements the abstract methods, so it uses the default
+    candidate_roads and road_by_index
+    """
+
+    def __init__(self, road_map: MapInterface):
+        self.road_map = road_map
+
+    @property
+    def distance_weight(self) -> str:
+        return self.road_map.distance_weight
+
+    @property
+    def time_weight(self) -> str:
+        return self.road_map.time_weight
+
+    @property
+    def roads(self) -> List[Road]:
+        return self.road_map.roads
+
+    def road_by_id(self, road_id):
+        return self.road_map.road_by_id(road_id)
+
+    def nearest_road(self, coord):
+        return self.road_map.nearest_road(coord)
+
+    def shortest_path(self, origin, destination, weight=None):
+        return self.road_map.shortest_path(origin, destination, weight)
+
+
+class TestCandidateRoads(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+
+        nx_map = NxMap(graph)
+        cls.maps = [
+            nx_map,
+            IGraphMap.from_nx_graph(graph),
+            CSRMap.from_map(nx_map),
+            RoadListMap(nx_map),
+        ]
+
+        trace_file = get_test_dir() / "test_assets" / "test_trace.geojson"
+        cls.coords = Trace.from_geojson(trace_file, xy=True).coords
+
+    def test_candidate_roads(self):
+        """
+        This will test that the candidates are every road within the radius
+        """
+        radius = 50
+
+        for road_map in self.maps:
+            candidates = road_map.candidate_roads(self.coords, radius)
+
+            for i, coord in enumerate(self.coords):
+                expected = sorted(
+                    (road.geom.distance(coord.geom), road.road_id)
+                    for road in road_map.roads
+                    if road.geom.distance(coord.geom) <= radius
+                )
+
+                rows = np.flatnonzero(candidates.point_index == i)
+                roads = [road_map.road_by_index(e) for e in candidates.edge_index[rows]]
+
+                self.assertEqual(len(rows), len(expected))
+                self.assertListEqual(
+                    sorted(r.road_id for r in roads), sorted(e[1] for e in expected)
+                )
+                np.testing.assert_allclose(
+                    candidates.distance[rows], [e[0] for e in expected]
+                )
+
+                for road, row in zip(roads, rows):
+                    self.assertAlmostEqual(
+                        candidates.offset[row], road.geom.project(coord.geom)
+                    )
+
+    def test_k_nearest_candidates(self):
+        road_map = self.maps[0]
+        candidates = road_map.candidate_roads(self.coords, 200, k=2)
+
+        counts = np.bincount(candidates.point_index, minlength=len(self.coords))
+        self.assertTrue((counts == 2).all())
+
+        # the first candidate of each point is its nearest road
+        points, first = np.unique(candidates.point_index, return_index=True)
+        for i, row in zip(points, first):
+            coord = self.coords[int(i)]
+            nearest = road_map.nearest_road(coord)
+            self.assertAlmostEqual(
+                candidates.distance[row], nearest.geom.distance(coord.geom)
+            )
+
+    def test_candidate_roads_bad_arguments(self):
+        road_map = self.maps[0]
+
+        candidates = road_map.candidate_roads(self.coords[:0], 50)
+        self.assertEqual(len(candidates.point_index), 0)
+
+        with self.assertRaises(ValueError):
+            road_map.candidate_roads(self.coords, -1)
+
+        with self.assertRaises(ValueError):
+            road_map.candidate_roads(self.coords, 50, k=0)
@@ -0,0 +1,146 @@
+import os
+import pickle
+import random
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import networkx as nx
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.ch.contraction_hierarchy import (
+    ContractionHierarchy,
+    contraction_hierarchy_file,
+)
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+def path_cost(path, weight):
+    return sum(r.metadata[weight] for r in path)
+
+
+class TestContractionHierarchy(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        cls.graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+        cls.nx_map = NxMap(cls.graph.copy())
+        cls.ch = ContractionHierarchy.from_map(cls.nx_map)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(trace_file)
+        cls.origin = trace.coords[0]
+        cls.destination = trace.coords[-1]
+
+    def test_ch_matches_dijkstra(self):
+        """
+        This will test that the hierarchy finds paths as short as a dijkstra search
+        """
+        g = self.nx_map.g
+        weight = self.ch.weight
+        self.assertEqual(weight, self.nx_map.time_weight)
+
+        nodes = list(g.nodes)
+        rng = random.Random(42)
+
+        for _ in range(100):
+            origin, destination = rng.sample(nodes, 2)
+            road_ids = self.ch.shortest_path(origin, destination)
+
+            try:
+                expected = nx.dijkstra_path_length(g, origin, destination, weight)
+            except nx.NetworkXNoPath:
+                self.assertIsNone(road_ids)
+                continue
+
+            self.assertIsNotNone(road_ids)
+            self.assertEqual(road_ids[0].start, origin)
+            self.assertEqual(road_ids[-1].end, destination)
+            for a, b in zip(road_ids, road_ids[1:]):
+                self.assertEqual(a.end, b.start)
+
+            cost = sum(g.edges[road_id][weight] for road_id in road_ids)
+            self.assertAlmostEqual(cost, expected)
+
+        node = nodes[0]
+        self.assertListEqual(self.ch.shortest_path(node, node), [])
+        self.assertIsNone(self.ch.shortest_path(node, "not a node"))
+
+    def test_maps_use_ch(self):
+        for road_map in (
+            NxMap(self.graph.copy()),
+            IGraphMap.from_nx_graph(self.graph.copy()),
+        ):
+            expected = road_map.shortest_path(self.origin, self.destination)
+
+            road_map.set_contraction_hierarchy(self.ch)
+            self.assertIs(road_map.contraction_hierarchy, self.ch)
+
+            path = road_map.shortest_path(self.origin, self.destination)
+            self.assertAlmostEqual(
+                path_cost(path, self.ch.weight), path_cost(expected, self.ch.weight)
+            )
+
+            # changing the roads drops the hierarchy
+            road = path[0]
+            road_map.set_road_attributes({road.road_id: {"speed": 1}})
+            self.assertIsNone(road_map.contraction_hierarchy)
+
+    def test_shortest_paths_use_ch(self):
+        """
+        This will test that the paths to several destinations are the paths of the
+        hierarchy, so they agree with the cached single paths
+        """
+        destinations = [self.destination, self.origin]
+
+        for road_map in (
+            NxMap(self.graph.copy()),
+            IGraphMap.from_nx_graph(self.graph.copy()),
+        ):
+            road_map.set_contraction_hierarchy(self.ch)
+            road_map.set_path_cache_size(10)
+
+            paths = road_map.shortest_paths(self.origin, destinations)
+
+            road_map.set_path_cache_size(None)
+            for destination, path in zip(destinations, paths):
+                self.assertListEqual(
+                    road_map.shortest_path(self.origin, destination), path
+                )
+
+    def test_ch_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            map_file = Path(tmpdir) / "map.pickle"
+            self.nx_map.to_file(map_file)
+
+            ch_file = contraction_hierarchy_file(map_file, self.nx_map.time_weight)
+            self.assertFalse(ch_file.exists())
+
+            ch = ContractionHierarchy.for_map_file(self.nx_map, map_file)
+            self.assertTrue(ch_file.exists())
+
+            loaded = ContractionHierarchy.for_map_file(self.nx_map, map_file)
+            self.assertEqual(loaded.weight, ch.weight)
+            for name, a in ch.arrays.items():
+                self.assertTrue((loaded.arrays[name] == a).all(), name)
+
+            # a hierarchy that is older than the map file is built again
+            os.utime(ch_file, (0, 0))
+            ContractionHierarchy.for_map_file(self.nx_map, map_file)
+            self.assertGreater(ch_file.stat().st_mtime, 0)
+
+    def test_pickle_map_with_ch(self):
+        road_map = NxMap(self.graph.copy())
+        road_map.set_contraction_hierarchy(self.ch)
+
+        loaded = pickle.loads(pickle.dumps(road_map))
+
+        self.assertListEqual(
+            road_map.shortest_path(self.origin, self.destination),
+            loaded.shortest_path(self.origin, self.destination),
+        )
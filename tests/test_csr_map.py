@@ -0,0 +1,95 @@
+from unittest import TestCase
+
+import numpy as np
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.csr.csr_map import CSRMap, dijkstra
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+def path_cost(path, weight):
+    return sum(r.metadata[weight] for r in path)
+
+
+class TestCSRMap(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+        cls.nx_map = NxMap(graph)
+        cls.csr_map = CSRMap.from_map(cls.nx_map)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_2.csv"
+        cls.trace = Trace.from_csv(trace_file)
+
+    def test_dijkstra(self):
+        """
+        This will test the array based dijkstra search on a small graph
+        """
+        # 0 -> 1 -> 3 costs 2, 0 -> 2 -> 3 costs 3 and node 4 can't be reached
+        indptr = np.array([0, 2, 3, 4, 4, 4])
+        targets = np.array([1, 2, 3, 3])
+        weights = np.array([1.0, 1.0, 1.0, 2.0])
+
+        path = dijkstra(indptr.data, targets.data, weights.data, 0, 3)
+        self.assertListEqual(path, [0, 2])
+
+        path = dijkstra(indptr.data, targets.data, weights.data, 0, 0)
+        self.assertListEqual(path, [])
+
+        path = dijkstra(indptr.data, targets.data, weights.data, 0, 4)
+        self.assertIsNone(path)
+
+        # a NaN weight closes the road
+        weights[0] = np.nan
+        path = dijkstra(indptr.data, targets.data, weights.data, 0, 3)
+        self.assertListEqual(path, [1, 3])
+
+    def test_csr_map_roads(self):
+        """
+        This will test that the CSR map holds the same roads as the map it was built from
+        """
+        self.assertListEqual(self.nx_map.roads, self.csr_map.roads)
+
+        road = self.nx_map.roads[20]
+        self.assertEqual(road, self.csr_map.road_by_id(road.road_id))
+
+    def test_csr_map_shortest_path(self):
+        """
+        This will test that the CSR map finds paths as short as the networkx map
+        """
+        coords = list(self.trace.coords)
+        for origin, destination in zip(coords[::50], coords[::-35]):
+            for weight in [self.nx_map.time_weight, self.nx_map.distance_weight]:
+                expected = self.nx_map.shortest_path(origin, destination, weight)
+                path = self.csr_map.shortest_path(origin, destination, weight)
+
+                self.assertAlmostEqual(
+                    path_cost(expected, weight), path_cost(path, weight)
+                )
+                for a, b in zip(path, path[1:]):
+                    self.assertEqual(a.road_id.end, b.road_id.start)
+
+        with self.assertRaises(ValueError):
+            self.csr_map.shortest_path(coords[0], coords[-1], weight="unknown")
+
+        with self.assertRaises(NotImplementedError):
+            self.csr_map.shortest_path(coords[0], coords[-1], weight=lambda u, v, d: 1)
+
+    def test_csr_map_path_cache(self):
+        """
+        This will test that the CSR map can cache its shortest paths
+        """
+        csr_map = CSRMap(self.csr_map.arrays)
+        csr_map.set_path_cache_size(10)
+
+        origin, destination = self.trace.coords[0], self.trace.coords[-1]
+        first = csr_map.shortest_path(origin, destination)
+        second = csr_map.shortest_path(origin, destination)
+
+        self.assertListEqual(first, second)
+        self.assertEqual(csr_map.path_cache.hits, 1)
@@ -0,0 +1,144 @@
+import math
+import random
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import networkx as nx
+import numpy as np
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.landmarks import Landmarks
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+def path_cost(path, weight):
+    return sum(r.metadata[weight] for r in path)
+
+
+class TestLandmarks(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        cls.graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+        cls.nx_map = NxMap(cls.graph.copy())
+        cls.landmarks = Landmarks.from_map(cls.nx_map, k=8)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(trace_file)
+        cls.origin = trace.coords[0]
+        cls.destination = trace.coords[-1]
+
+    def test_lower_bound(self):
+        """
+        This will test that the landmark bounds never exceed the shortest path cost
+        """
+        g = self.nx_map.g
+        weight = self.landmarks.weight
+        self.assertEqual(len(self.landmarks.landmarks), 8)
+        self.assertEqual(self.landmarks.from_landmarks.shape, (len(g.nodes), 8))
+
+        nodes = list(g.nodes)
+        rng = random.Random(42)
+
+        for _ in range(100):
+            u, v = rng.sample(nodes, 2)
+            bound = self.landmarks.lower_bound(u, v)
+
+            try:
+                cost = nx.dijkstra_path_length(g, u, v, weight)
+            except nx.NetworkXNoPath:
+                continue
+
+            self.assertGreaterEqual(bound, 0)
+            self.assertLessEqual(bound, cost + 1e-9)
+
+        # the bound to a landmark is exact
+        landmark = self.landmarks.node_ids[self.landmarks.landmarks[0]].item()
+        u = nodes[0]
+        self.assertAlmostEqual(
+            self.landmarks.lower_bound(u, landmark),
+            nx.dijkstra_path_length(g, u, landmark, weight),
+        )
+
+        self.assertEqual(self.landmarks.lower_bound(u, u), 0)
+        self.assertEqual(self.landmarks.lower_bound(u, "not a node"), 0)
+
+    def test_unreachable_lower_bound(self):
+        """
+        This will test the bounds of nodes that some landmarks can't reach
+        """
+        # one landmark, node 11; node 10 reaches it at a cost of 1 and node 12 at a cost
+        # of 2, but it reaches neither of them
+        landmarks = Landmarks(
+            "w",
+            node_ids=np.array([10, 11, 12]),
+            landmarks=np.array([1]),
+            from_landmarks=np.array([[np.inf], [0.0], [np.inf]]),
+            to_landmarks=np.array([[1.0], [0.0], [2.0]]),
+        )
+
+        self.assertEqual(landmarks.lower_bound(10, 11), 1.0)
+        self.assertEqual(landmarks.lower_bound(11, 10), math.inf)
+        self.assertEqual(landmarks.lower_bound(10, 12), 0.0)
+
+    def test_maps_use_landmarks(self):
+        for road_map in (
+            NxMap(self.graph.copy()),
+            IGraphMap.from_nx_graph(self.graph.copy()),
+        ):
+            expected = road_map.shortest_path(self.origin, self.destination)
+
+            road_map.set_path_search("astar")
+            road_map.set_landmarks(self.landmarks)
+            self.assertIs(road_map.landmarks, self.landmarks)
+
+            path = road_map.shortest_path(self.origin, self.destination)
+            self.assertAlmostEqual(
+                path_cost(path, self.landmarks.weight),
+                path_cost(expected, self.landmarks.weight),
+            )
+
+            # changing the roads drops the landmarks
+            road = path[0]
+            road_map.set_road_attributes({road.road_id: {"speed": 1}})
+            self.assertIsNone(road_map.landmarks)
+
+    def test_landmarks_reach_fewer_nodes(self):
+        g = self.nx_map.g
+        weight = self.landmarks.weight
+        path = self.nx_map.shortest_path(self.origin, self.destination)
+        origin_id = path[0].road_id.start
+        dest_id = path[-1].road_id.end
+
+        def reached_nodes(heuristic):
+            reached = set()
+
+            def counting_heuristic(u, v):
+                reached.add(u)
+                return heuristic(u, v)
+
+            nx.astar_path(g, origin_id, dest_id, counting_heuristic, weight)
+            return len(reached)
+
+        self.assertLess(
+            reached_nodes(self.landmarks),
+            reached_nodes(self.nx_map._heuristic(weight)),
+        )
+
+    def test_landmarks_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file = Path(tmpdir) / "landmarks.npz"
+            self.landmarks.to_file(file)
+
+            loaded = Landmarks.from_file(file)
+
+        self.assertEqual(loaded.weight, self.landmarks.weight)
+        self.assertTrue((loaded.landmarks == self.landmarks.landmarks).all())
+        self.assertTrue((loaded.from_landmarks == self.landmarks.from_landmarks).all())
+        self.assertTrue((loaded.to_landmarks == self.landmarks.to_landmarks).all())
@@ -214,3 +214,48 @@ class TestLCSSAddMatchForStationary(TestCase):
         resulting_matches = add_matches_for_stationary_points(matches, stationary_index)
 
         self.assertListEqual(expected_matches, resulting_matches)
+
+    def test_add_matches_multiple_stationary_groups(self):
+        """Test adding several stationary groups, sharing the matched roads"""
+        roads = [Road(i, LineString([(i, 0), (i + 1, 0)])) for i in range(4)]
+        coords = [
+            Coordinate.from_lat_lon(39.655 + i * 0.001, -104.919) for i in range(4)
+        ]
+        matches: list[Match] = [Match(r, c, 0.1) for r, c in zip(roads, coords)]
+
+        # the original trace had 7 points; points 1, 2 and 5 were stationary
+        stationary_index = [
+            StationaryIndex([0, 1, 2], [coords[0].coordinate_id, "a", "b"]),
+            StationaryIndex([4, 5], [coords[2].coordinate_id, "c"]),
+        ]
+
+        resulting_matches = add_matches_for_stationary_points(matches, stationary_index)
+
+        self.assertEqual(len(resulting_matches), 7)
+        self.assertListEqual(
+            [m.road for m in resulting_matches],
+            [roads[0], roads[0], roads[0], roads[1], roads[2], roads[2], roads[3]],
+        )
+        self.assertListEqual(
+            [m.coordinate.coordinate_id for m in resulting_matches][1:3], ["a", "b"]
+        )
+        self.assertEqual(resulting_matches[5].coordinate.coordinate_id, "c")
+        self.assertIs(resulting_matches[3], matches[1])
+        self.assertIs(resulting_matches[2].road, roads[0])
+        self.assertIs(resulting_matches[5].coordinate.geom, coords[2].geom)
+
+    def test_add_matches_out_of_order(self):
+        """Test that stationary groups out of trace order are rejected"""
+        roads = [Road(i, LineString([(i, 0), (i + 1, 0)])) for i in range(4)]
+        coords = [
+            Coordinate.from_lat_lon(39.655 + i * 0.001, -104.919) for i in range(4)
+        ]
+        matches: list[Match] = [Match(r, c, 0.1) for r, c in zip(roads, coords)]
+
+        stationary_index = [
+            StationaryIndex([2, 3], [None, "a"]),
+            StationaryIndex([0, 1], [None, "b"]),
+        ]
+
+        with self.assertRaises(ValueError):
+            add_matches_for_stationary_points(matches, stationary_index)
@@ -1,7 +1,9 @@
 from unittest import TestCase
 
+import numpy as np
+
 from mappymatch.matchers.lcss.constructs import CuttingPoint
-from mappymatch.matchers.lcss.utils import compress
+from mappymatch.matchers.lcss.utils import compress, compress_indices
 
 
 class TestLCSSMatcherCompress(TestCase):
@@ -102,3 +104,18 @@ class TestLCSSMatcherCompress(TestCase):
             self.assertTrue(count < expected_stop)
             self.assertEqual(expected_list[count], cutting_point)
             count += 1
+
+    def test_compress_indices_matches_compress(self):
+        """
+        This will test that compressing an array of indices gives the same result
+        as compressing a list of cutting points, including repeated indices
+        """
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            indices = rng.integers(0, 30, size=rng.integers(0, 20))
+
+            expected_list = [
+                cp.trace_index for cp in compress([CuttingPoint(i) for i in indices])
+            ]
+
+            self.assertListEqual(expected_list, compress_indices(indices).tolist())
@@ -255,3 +255,43 @@ class TestLCSSMatcherFindStationaryPoints(TestCase):
         resulting_list = find_stationary_points(trace=trace)
 
         self.assertListEqual(expected_list, resulting_list)
+
+    def test_find_stationary_points_custom_threshold(self):
+        """
+        This will test that find_stationary_point uses the given distance threshold
+        """
+        trace = Trace.from_dataframe(
+            pd.DataFrame(
+                data={
+                    "latitude": [
+                        39.655193,
+                        39.655193007,
+                        39.655494,
+                        39.655801,
+                        39.655801,
+                    ],
+                    "longitude": [
+                        -104.919294,
+                        -104.919294,
+                        -104.91943,
+                        -104.919567,
+                        -104.919567,
+                    ],
+                }
+            )
+        )
+
+        expected_list = [
+            StationaryIndex(
+                [0, 1],
+                [trace.coords[0].coordinate_id, trace.coords[1].coordinate_id],
+            ),
+            StationaryIndex(
+                [3, 4],
+                [trace.coords[3].coordinate_id, trace.coords[4].coordinate_id],
+            ),
+        ]
+
+        resulting_list = find_stationary_points(trace=trace, distance_threshold=1.0)
+
+        self.assertListEqual(expected_list, resulting_list)
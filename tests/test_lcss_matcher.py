@@ -0,0 +1,137 @@
+import functools as ft
+import pickle
+import random
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, mock
+
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from mappymatch.matchers.lcss.constructs import TrajectorySegment
+from mappymatch.matchers.lcss.lcss import LCSSMatcher
+from mappymatch.matchers.lcss.ops import new_path
+from tests import get_test_dir
+
+
+class TestLCSSMatcher(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+        cls.road_map = NxMap(graph)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_2.csv"
+        cls.trace = Trace.from_csv(trace_file)
+
+        cls.expected = LCSSMatcher(cls.road_map).match_trace(cls.trace)
+
+    def assert_same_result(self, result):
+        self.assertListEqual(self.expected.matches, result.matches)
+        self.assertListEqual(self.expected.path, result.path)
+
+    def test_match_trace_with_thread_executor(self):
+        """
+        This will test that matching with a thread pool gives the same result
+        as matching serially
+        """
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            matcher = LCSSMatcher(
+                self.road_map, executor=executor, distance_cache_size=1_000_000
+            )
+            result = matcher.match_trace(self.trace)
+
+        self.assert_same_result(result)
+
+    def test_random_cuts_do_not_depend_on_executor(self):
+        """
+        This will test that random cuts give the same result with a thread pool
+        as serially under the same seed
+        """
+        matcher = LCSSMatcher(self.road_map, random_cuts=3)
+        random.seed(42)
+        expected = matcher.match_trace(self.trace)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            matcher = LCSSMatcher(self.road_map, random_cuts=3, executor=executor)
+            for _ in range(3):
+                random.seed(42)
+                result = matcher.match_trace(self.trace)
+
+                self.assertListEqual(expected.matches, result.matches)
+                self.assertListEqual(expected.path, result.path)
+
+    def test_pickle_matcher_drops_executor(self):
+        """
+        This will test that a matcher with an executor can be sent to a worker process
+        """
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            matcher = LCSSMatcher(self.road_map, executor=executor)
+            unpickled = pickle.loads(pickle.dumps(matcher))
+
+        self.assertIsNone(unpickled.executor)
+        self.assertEqual(unpickled.distance_epsilon, matcher.distance_epsilon)
+
+    def test_refine_scheme_skips_frozen_segments(self):
+        """
+        This will test that frozen segments are carried over without being refined
+        and that a scheme of unchanged segments is detected as converged
+        """
+        matcher = LCSSMatcher(self.road_map)
+
+        traces = [self.trace[:300], self.trace[300:]]
+        scheme = [TrajectorySegment(t, new_path(self.road_map, t)) for t in traces]
+
+        with mock.patch.object(
+            LCSSMatcher,
+            "_refine_segment",
+            autospec=True,
+            side_effect=LCSSMatcher._refine_segment,
+        ) as refine:
+            next_scheme, next_frozen, changed = matcher._refine_scheme(
+                scheme, [True, False]
+            )
+
+        self.assertEqual(refine.call_count, 1)
+        self.assertIs(refine.call_args.args[1], scheme[1])
+        self.assertIs(next_scheme[0], scheme[0])
+        self.assertTrue(next_frozen[0])
+
+        # refine until the scheme settles; then there is nothing left to refine
+        scheme, frozen = next_scheme, next_frozen
+        for _ in range(10):
+            scheme, frozen, changed = matcher._refine_scheme(scheme, frozen)
+            if not changed:
+                break
+
+        self.assertFalse(changed)
+        self.assertTrue(all(frozen))
+
+        with mock.patch.object(LCSSMatcher, "_refine_segment") as refine:
+            _, _, changed = matcher._refine_scheme(scheme, frozen)
+
+        self.assertEqual(refine.call_count, 0)
+        self.assertFalse(changed)
+
+    def test_joined_score_is_better_matches_full_score(self):
+        """
+        This will test that bounding the joined score gives the same decision as
+        fully scoring the joined segment
+        """
+        matcher = LCSSMatcher(self.road_map)
+
+        traces = [self.trace[:200], self.trace[200:450], self.trace[450:]]
+        sub_segments = [
+            matcher._score(TrajectorySegment(t, new_path(self.road_map, t)))
+            for t in traces
+        ]
+        joined = ft.reduce(matcher._join_segment, sub_segments)
+        joined_score = matcher._score(joined).score
+
+        for score in [0.0, 0.5, joined_score - 1e-6, joined_score, 0.99, 1.0]:
+            self.assertEqual(
+                matcher._joined_score_is_better(joined, sub_segments, score),
+                joined_score > score,
+            )
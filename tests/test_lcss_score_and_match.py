@@ -0,0 +1,284 @@
+from unittest import TestCase
+
+import numpy as np
+from geopandas import GeoDataFrame, points_from_xy
+from shapely.geometry import LineString
+
+from mappymatch.constructs.match import Match
+from mappymatch.constructs.road import Road, RoadId
+from mappymatch.constructs.trace import Trace
+from mappymatch.matchers.lcss.constructs import TrajectorySegment
+from mappymatch.matchers.lcss import scoring
+from mappymatch.matchers.lcss.scoring import DistanceCache
+from mappymatch.utils.crs import XY_CRS
+
+
+def reference_score_and_match(trace, path, distance_epsilon, max_distance):
+    """
+    The original pure python implementation of the LCSS scoring that the
+    vectorized kernel must reproduce exactly.
+    """
+    m = len(trace.coords)
+    n = len(path)
+
+    matched_roads = []
+
+    C = [[0 for i in range(n + 1)] for j in range(m + 1)]
+
+    f = trace._frame
+    distances = np.array([f.distance(r.geom).values for r in path])
+
+    for i in range(1, m + 1):
+        nearest_road = None
+        min_dist = np.inf
+        coord = trace.coords[i - 1]
+        for j in range(1, n + 1):
+            road = path[j - 1]
+
+            dt = distances[j - 1][i - 1]
+
+            if dt < min_dist:
+                min_dist = dt
+                nearest_road = road
+
+            if dt < distance_epsilon:
+                point_similarity = 1 - (dt / distance_epsilon)
+            else:
+                point_similarity = 0
+
+            C[i][j] = max(
+                (C[i - 1][j - 1] + point_similarity),
+                C[i][j - 1],
+                C[i - 1][j],
+            )
+
+        if min_dist > max_distance:
+            nearest_road = None
+            min_dist = np.inf
+
+        matched_roads.append(
+            Match(road=nearest_road, distance=min_dist, coordinate=coord)
+        )
+
+    return C[m][n] / float(min(m, n)), matched_roads
+
+
+def random_segment(seed: int, n_points: int, n_roads: int) -> TrajectorySegment:
+    """
+    Builds a noisy trace that roughly follows a random polyline path
+    """
+    rng = np.random.default_rng(seed)
+
+    steps = rng.normal(0, 100, size=(n_roads + 1, 2))
+    nodes = np.cumsum(steps, axis=0)
+    path = [
+        Road(RoadId(i, i + 1, 0), LineString([nodes[i], nodes[i + 1]]))
+        for i in range(n_roads)
+    ]
+
+    t = np.sort(rng.uniform(0, n_roads, size=n_points))
+    i = np.minimum(t.astype(int), n_roads - 1)
+    f = (t - i)[:, np.newaxis]
+    xy = nodes[i] * (1 - f) + nodes[i + 1] * f + rng.normal(0, 40, size=(n_points, 2))
+
+    frame = GeoDataFrame(geometry=points_from_xy(xy[:, 0], xy[:, 1]), crs=XY_CRS)
+    return TrajectorySegment(Trace(frame), path)
+
+
+class TestLCSSScoreAndMatch(TestCase):
+    def assert_parity(self, segment, distance_epsilon=50.0, max_distance=10000.0):
+        expected_score, expected_matches = reference_score_and_match(
+            segment.trace, segment.path, distance_epsilon, max_distance
+        )
+
+        result = segment.score_and_match(distance_epsilon, max_distance)
+
+        self.assertEqual(expected_score, result.score)
+        self.assertListEqual(expected_matches, result.matches)
+
+    def test_score_and_match_parity_random_segments(self):
+        """
+        This will test that the vectorized scoring matches the reference
+        implementation on a collection of random segments
+        """
+        for seed in range(10):
+            segment = random_segment(seed, n_points=60, n_roads=15)
+            self.assert_parity(segment)
+
+    def test_score_and_match_parity_more_roads_than_points(self):
+        """
+        This will test that the vectorized scoring matches the reference
+        implementation when the path is longer than the trace
+        """
+        segment = random_segment(42, n_points=5, n_roads=30)
+        self.assert_parity(segment)
+
+    def test_score_and_match_parity_max_distance(self):
+        """
+        This will test that points beyond the max distance are not matched
+        """
+        segment = random_segment(7, n_points=40, n_roads=10)
+        self.assert_parity(segment, max_distance=30.0)
+
+        result = segment.score_and_match(50.0, 30.0)
+        for match in result.matches:
+            if match.road is None:
+                self.assertEqual(match.distance, np.inf)
+            else:
+                self.assertLessEqual(match.distance, 30.0)
+
+    def test_score_and_match_identical_path(self):
+        """
+        This will test that a trace sitting exactly on its path gets a perfect score
+        """
+        xy = np.array([[0.0, 0.0], [10.0, 0.0], [20.0, 0.0], [30.0, 0.0]])
+        frame = GeoDataFrame(geometry=points_from_xy(xy[:, 0], xy[:, 1]), crs=XY_CRS)
+        path = [
+            Road(RoadId(i, i + 1, 0), LineString([xy[i], xy[i + 1]]))
+            for i in range(len(xy) - 1)
+        ]
+
+        result = TrajectorySegment(Trace(frame), path).score_and_match(50.0, 10000.0)
+
+        self.assertEqual(result.score, 1.0)
+        self.assertTrue(all(m.distance == 0 for m in result.matches))
+
+    def test_score_and_match_chunked_parity(self):
+        """
+        This will test that scoring the trace in chunks gives the same result
+        as scoring it all at once
+        """
+        segment = random_segment(3, n_points=53, n_roads=12)
+        expected = segment.score_and_match(50.0, 10000.0)
+
+        for chunk_size in [1, 7, 53, 100]:
+            result = segment.score_and_match(50.0, 10000.0, chunk_size=chunk_size)
+
+            self.assertEqual(expected.score, result.score)
+            self.assertListEqual(expected.matches, result.matches)
+
+    def test_score_and_match_sparse_parity(self):
+        """
+        This will test that the sparse scoring matches the reference implementation
+        """
+        for seed in range(10):
+            segment = random_segment(seed, n_points=60, n_roads=15)
+            expected_score, expected_matches = reference_score_and_match(
+                segment.trace, segment.path, 50.0, 10000.0
+            )
+
+            for chunk_size in [None, 9]:
+                result = segment.score_and_match(
+                    50.0, 10000.0, chunk_size=chunk_size, sparse=True
+                )
+
+                self.assertEqual(expected_score, result.score)
+                self.assertListEqual(expected_matches, result.matches)
+
+    def test_score_and_match_sparse_max_distance(self):
+        """
+        This will test that the sparse scoring does not match points beyond
+        the max distance
+        """
+        segment = random_segment(7, n_points=40, n_roads=10)
+        expected_score, expected_matches = reference_score_and_match(
+            segment.trace, segment.path, 50.0, 30.0
+        )
+
+        result = segment.score_and_match(50.0, 30.0, sparse=True)
+
+        self.assertEqual(expected_score, result.score)
+        self.assertListEqual(expected_matches, result.matches)
+
+    def test_score_and_match_distance_cache(self):
+        """
+        This will test that scoring with a distance cache gives the same result
+        and that repeated lookups are served from the cache
+        """
+        segment = random_segment(5, n_points=30, n_roads=8)
+        expected = segment.score_and_match(50.0, 10000.0)
+
+        cache = DistanceCache(segment.trace)
+
+        result = segment.score_and_match(50.0, 10000.0, distance_cache=cache)
+        self.assertEqual(expected.score, result.score)
+        self.assertListEqual(expected.matches, result.matches)
+        self.assertEqual(cache.hits, 0)
+        self.assertEqual(cache.misses, 30 * 8)
+
+        sub_segment = TrajectorySegment(segment.trace[5:20], segment.path[2:6])
+        expected = sub_segment.score_and_match(50.0, 10000.0)
+        result = sub_segment.score_and_match(50.0, 10000.0, distance_cache=cache)
+        self.assertEqual(expected.score, result.score)
+        self.assertListEqual(expected.matches, result.matches)
+        self.assertEqual(cache.hits, 15 * 4)
+        self.assertEqual(cache.misses, 30 * 8)
+
+    def test_distance_cache_eviction(self):
+        """
+        This will test that the distance cache evicts the least recently used roads
+        once it is full
+        """
+        segment = random_segment(5, n_points=10, n_roads=4)
+        cache = DistanceCache(segment.trace, max_size=20)
+
+        segment.score_and_match(50.0, 10000.0, distance_cache=cache)
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 2)
+
+        # the last two roads are still cached
+        TrajectorySegment(segment.trace, segment.path[2:]).score_and_match(
+            50.0, 10000.0, distance_cache=cache
+        )
+        self.assertEqual(cache.hits, 20)
+
+    def test_distance_cache_unknown_coordinates(self):
+        """
+        This will test that the distance cache rejects traces with unknown coordinates
+        """
+        segment = random_segment(5, n_points=10, n_roads=4)
+        cache = DistanceCache(segment.trace[:5])
+
+        with self.assertRaises(ValueError):
+            segment.score_and_match(50.0, 10000.0, distance_cache=cache)
+
+    def test_lcss_bounds(self):
+        """
+        This will test that the LCSS of a joined segment is bounded below by the sum
+        of the LCSS of its parts and above by lcss_upper_bound
+        """
+        for seed in range(10):
+            segment = random_segment(seed, n_points=60, n_roads=15)
+            trace, path = segment.trace, segment.path
+
+            joined = scoring.score(trace, path, 50.0, 10000.0).score
+            parts = scoring.score(trace[:25], path[:6], 50.0, 10000.0).score
+            parts += scoring.score(trace[25:], path[6:], 50.0, 10000.0).score
+
+            self.assertLessEqual(parts, joined + 1e-9)
+            self.assertLessEqual(joined, scoring.lcss_upper_bound(trace, path, 50.0))
+
+    def test_compute_cutting_points_uses_scored_distances(self):
+        """
+        This will test that the cutting points computed from the scoring distances
+        are the same as the ones computed from the matches alone
+        """
+        for seed in range(10):
+            segment = random_segment(seed, n_points=60, n_roads=15)
+            scored = segment.score_and_match(50.0, 10000.0)
+
+            self.assertTrue(
+                np.array_equal(
+                    scored.match_distances, [m.distance for m in scored.matches]
+                )
+            )
+
+            expected = scored._replace(match_distances=None).compute_cutting_points(
+                50.0, 10.0, 0
+            )
+            result = scored.compute_cutting_points(50.0, 10.0, 0)
+
+            self.assertListEqual(expected.cutting_points, result.cutting_points)
+            for cp in result.cutting_points:
+                self.assertTrue(1 < cp.trace_index < len(segment.trace) - 2)
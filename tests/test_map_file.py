@@ -0,0 +1,92 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+import osmnx as ox
+
+from mappymatch.maps.csr.csr_map import CSRMap
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.map_arrays import MapArrays
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+class TestMapFile(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+
+        cls.nx_map = NxMap(graph)
+        cls.igraph_map = IGraphMap.from_nx_graph(graph)
+        cls.roads = {r.road_id: r for r in cls.nx_map.roads}
+
+    def test_round_trip(self):
+        """
+        This will test that every map class reads back the roads of a map file,
+        whichever map class wrote it
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for writer in (self.nx_map, self.igraph_map):
+                outfile = Path(tmpdir) / "map.npz"
+                writer.to_file(outfile)
+
+                for reader in (NxMap, IGraphMap, CSRMap):
+                    road_map = reader.from_file(outfile)
+
+                    self.assertEqual(road_map.crs, self.nx_map.crs)
+                    self.assertEqual(road_map.distance_weight, "kilometers")
+                    self.assertEqual(road_map.time_weight, "travel_time")
+
+                    roads = {r.road_id: r for r in road_map.roads}
+                    self.assertEqual(roads, self.roads)
+
+    def test_numpy_metadata(self):
+        """
+        This will test that numpy values in the road metadata are saved as python values
+        and that other values json can't encode are rejected
+        """
+        road = self.nx_map.roads[0]
+        metadata = {
+            **road.metadata,
+            "lanes": np.int64(2),
+            "oneway": np.bool_(True),
+            "grade": np.float32(0.5),
+            "widths": np.array([3.5, 3.0]),
+        }
+        numpy_road = road._replace(metadata=metadata)
+
+        arrays = MapArrays.from_roads(
+            [numpy_road], self.nx_map.crs, "kilometers", "travel_time"
+        )
+        loaded = arrays.road_metadata(0)
+
+        self.assertEqual(loaded["lanes"], 2)
+        self.assertIs(loaded["oneway"], True)
+        self.assertEqual(loaded["grade"], 0.5)
+        self.assertEqual(loaded["widths"], [3.5, 3.0])
+
+        bad_road = road._replace(metadata={"bad": object()})
+        with self.assertRaises(TypeError):
+            MapArrays.from_roads(
+                [bad_road], self.nx_map.crs, "kilometers", "travel_time"
+            )
+
+    def test_version(self):
+        """
+        This will test that files of another format version are rejected
+        """
+        arrays = MapArrays.from_map(self.nx_map)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            outfile = Path(tmpdir) / "map.npz"
+
+            np.savez(outfile, format_version=np.array(99), **arrays.to_arrays())
+            with self.assertRaises(ValueError):
+                MapArrays.from_file(outfile)
+
+            np.savez(outfile, **arrays.to_arrays())
+            with self.assertRaises(ValueError):
+                MapArrays.from_file(outfile)
@@ -0,0 +1,171 @@
+import pickle
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.road import RoadId
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.csr.csr_map import CSRMap
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.mapped.mapped_map import MappedMap
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from mappymatch.matchers.lcss.lcss import LCSSMatcher
+from tests import get_test_dir
+
+
+class TestMappedMap(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+        cls.nx_map = NxMap(graph)
+        cls.igraph_map = IGraphMap.from_nx_graph(graph)
+        cls.csr_map = CSRMap.from_map(cls.nx_map)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_2.csv"
+        cls.trace = Trace.from_csv(trace_file)
+
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        cls.map_file = Path(cls.tmpdir.name) / "map.mmap"
+        MappedMap.write(cls.nx_map, cls.map_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmpdir.cleanup()
+
+    def setUp(self):
+        self.mapped_map = MappedMap(self.map_file)
+
+    def tearDown(self):
+        self.mapped_map.close()
+
+    def test_mapped_map_roads(self):
+        """
+        This will test that the mapped map holds the same roads as the map it was written from
+        """
+        self.assertListEqual(self.nx_map.roads, self.mapped_map.roads)
+        self.assertFalse(self.mapped_map.arrays.geometry_coords.flags.writeable)
+
+        road = self.nx_map.roads[10]
+        self.assertEqual(road, self.mapped_map.road_by_id(road.road_id))
+        self.assertIsNone(self.mapped_map.road_by_id(RoadId(-1, -2, 0)))
+
+    def test_mapped_map_nearest_road_and_shortest_path(self):
+        """
+        This will test that the grid index finds roads as near as the spatial index of
+        the original map and that the mapped map finds the same paths
+        """
+        coords = list(self.trace.coords)
+
+        roads = self.mapped_map.nearest_roads(coords)
+        expected = self.nx_map.nearest_roads(coords)
+        for coord, road, expected_road in zip(coords, roads, expected):
+            self.assertAlmostEqual(
+                road.geom.distance(coord.geom), expected_road.geom.distance(coord.geom)
+            )
+
+        for origin, destination in zip(coords[::60], coords[::-45]):
+            self.assertEqual(
+                self.mapped_map.nearest_road(origin),
+                roads[coords.index(origin)],
+            )
+            self.assertListEqual(
+                self.igraph_map.shortest_path(origin, destination),
+                self.mapped_map.shortest_path(origin, destination),
+            )
+
+    def test_mapped_map_candidate_roads(self):
+        """
+        This will test that the grid index finds the same candidates as the spatial index
+        """
+        trace_file = get_test_dir() / "test_assets" / "test_trace.geojson"
+        coords = Trace.from_geojson(trace_file, xy=True).coords
+
+        for k in (None, 3):
+            candidates = self.mapped_map.candidate_roads(coords, 50, k)
+            expected = self.csr_map.candidate_roads(coords, 50, k)
+
+            np.testing.assert_array_equal(candidates.point_index, expected.point_index)
+            np.testing.assert_allclose(candidates.distance, expected.distance)
+            np.testing.assert_allclose(candidates.offset, expected.offset)
+
+    def test_grid_index_keeps_geometries(self):
+        """
+        This will test that the grid index builds each road geometry once
+        """
+        grid_index = self.mapped_map.grid_index
+        assert grid_index is not None
+
+        points = np.array([c.geom for c in self.trace.coords])
+        _, edge_index, geoms, _ = grid_index.query(points, 50)
+        _, again_index, again, _ = grid_index.query(points, 50)
+
+        np.testing.assert_array_equal(edge_index, again_index)
+        for geom, again_geom in zip(geoms, again):
+            self.assertIs(geom, again_geom)
+
+    def test_mapped_map_pickle(self):
+        """
+        This will test that a pickled mapped map opens the same file
+        """
+        data = pickle.dumps(self.mapped_map)
+        self.assertLess(len(data), 2000)
+
+        with pickle.loads(data) as opened:
+            self.assertListEqual(self.nx_map.roads, opened.roads)
+
+    def test_mapped_map_from_map(self):
+        """
+        This will test that a mapped map built from another map owns a temporary file,
+        which is deleted when the map is closed
+        """
+        with MappedMap.from_map(self.nx_map) as mapped_map:
+            self.assertListEqual(self.nx_map.roads, mapped_map.roads)
+            self.assertTrue(mapped_map.file.exists())
+
+            with pickle.loads(pickle.dumps(mapped_map)) as opened:
+                self.assertEqual(opened.file, mapped_map.file)
+            self.assertTrue(mapped_map.file.exists())
+
+        self.assertFalse(mapped_map.file.exists())
+
+    def test_mapped_map_close(self):
+        """
+        This will test that a closed mapped map unmaps its file but doesn't delete it
+        """
+        self.mapped_map.nearest_roads(list(self.trace.coords))
+        self.mapped_map.close()
+        self.mapped_map.close()
+
+        self.assertTrue(self.map_file.exists())
+        with self.assertRaises(ValueError):
+            pickle.dumps(self.mapped_map)
+
+    def test_mapped_map_match_traces(self):
+        """
+        This will test that matching with a mapped map in worker processes gives
+        the same path as matching with the original map
+        """
+        expected = LCSSMatcher(self.nx_map).match_trace(self.trace)
+
+        matcher = LCSSMatcher(self.mapped_map)
+        results = list(matcher.match_traces([self.trace, self.trace], workers=2))
+
+        for result in results:
+            self.assertListEqual(expected.path, result.path)
+
+    def test_not_a_mapped_map_file(self):
+        """
+        This will test that other files are rejected
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            npz_file = Path(tmpdir) / "map.npz"
+            self.nx_map.to_file(npz_file)
+
+            with self.assertRaises(ValueError):
+                MappedMap(npz_file)
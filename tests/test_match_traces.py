@@ -0,0 +1,82 @@
+from unittest import TestCase
+
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from mappymatch.matchers.lcss.lcss import LCSSMatcher
+from mappymatch.matchers.line_snap import LineSnapMatcher
+from tests import get_test_dir
+
+
+class TestMatchTraces(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+        cls.road_map = NxMap(graph)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_2.csv"
+        trace = Trace.from_csv(trace_file)
+
+        # sub-traces of different lengths, so workers finish out of order
+        cls.traces = [trace[:200], trace, trace[100:150], trace[50:400], trace[:60]]
+
+    def assert_same_results(self, expected, results):
+        self.assertEqual(len(expected), len(results))
+        for e, r in zip(expected, results):
+            self.assertListEqual(e.matches, r.matches)
+            self.assertEqual(e.path, r.path)
+
+    def test_match_traces_with_workers(self):
+        """
+        This will test that matching traces in worker processes gives the same results,
+        in the same order, as matching them serially
+        """
+        matcher = LCSSMatcher(self.road_map)
+        expected = [matcher.match_trace(t) for t in self.traces]
+
+        results = list(matcher.match_traces(self.traces, workers=2))
+        self.assert_same_results(expected, results)
+
+        results = list(matcher.match_traces(iter(self.traces), workers=2, chunksize=2))
+        self.assert_same_results(expected, results)
+
+    def test_match_traces_serial(self):
+        """
+        This will test that matching traces with one worker matches them in this process
+        """
+        matcher = LineSnapMatcher(self.road_map)
+        expected = [matcher.match_trace(t) for t in self.traces]
+
+        results = list(matcher.match_traces(self.traces))
+
+        self.assert_same_results(expected, results)
+
+    def test_match_traces_stop_early(self):
+        """
+        This will test that the caller can stop reading results before all traces
+        are matched
+        """
+        matcher = LineSnapMatcher(self.road_map)
+        expected = matcher.match_trace(self.traces[0])
+
+        results = matcher.match_traces(self.traces * 10, workers=2)
+        first = next(results)
+        results.close()
+
+        self.assertListEqual(expected.matches, first.matches)
+
+    def test_match_traces_bad_arguments(self):
+        """
+        This will test that invalid worker and chunk sizes are rejected
+        """
+        matcher = LineSnapMatcher(self.road_map)
+
+        with self.assertRaises(ValueError):
+            matcher.match_traces(self.traces, workers=0)
+
+        with self.assertRaises(ValueError):
+            matcher.match_traces(self.traces, workers=2, chunksize=0)
@@ -0,0 +1,64 @@
+from unittest import TestCase
+
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.coordinate import Coordinate
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.csr.csr_map import CSRMap
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from mappymatch.matchers.line_snap import LineSnapMatcher
+from mappymatch.utils.crs import LATLON_CRS
+from tests import get_test_dir
+
+
+class TestNearestRoads(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+
+        nx_map = NxMap(graph)
+        cls.maps = [nx_map, IGraphMap.from_nx_graph(graph), CSRMap.from_map(nx_map)]
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        cls.trace = Trace.from_csv(trace_file)
+
+    def test_nearest_roads(self):
+        """
+        This will test that the batched lookup finds the same roads as nearest_road
+        """
+        for road_map in self.maps:
+            expected = [road_map.nearest_road(c) for c in self.trace.coords]
+
+            self.assertListEqual(road_map.nearest_roads(self.trace.coords), expected)
+            self.assertListEqual(
+                road_map.nearest_roads(list(self.trace.coords)), expected
+            )
+            self.assertListEqual(road_map.nearest_roads(self.trace.coords[:0]), [])
+
+    def test_nearest_roads_crs(self):
+        coord = Coordinate.from_lat_lon(39.75, -104.99)
+        self.assertEqual(coord.crs, LATLON_CRS)
+
+        for road_map in self.maps:
+            with self.assertRaises(ValueError):
+                road_map.nearest_roads([coord])
+
+    def test_line_snap(self):
+        """
+        This will test that the line snap matcher snaps each point to its nearest road
+        """
+        road_map = self.maps[0]
+        matches = LineSnapMatcher(road_map).match_trace(self.trace).matches
+
+        self.assertEqual(len(matches), len(self.trace))
+        for coord, match in zip(self.trace.coords, matches):
+            road = road_map.nearest_road(coord)
+            nearest_point = road.geom.interpolate(road.geom.project(coord.geom))
+
+            self.assertEqual(match.road, road)
+            self.assertEqual(match.coordinate, coord)
+            self.assertEqual(match.distance, road.geom.distance(nearest_point))
@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from mappymatch.maps.path_cache import ShortestPathCache
+from tests import get_test_dir
+
+
+class TestShortestPathCache(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        cls.graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(trace_file)
+        cls.origin = trace.coords[0]
+        cls.destination = trace.coords[-1]
+
+    def test_cache_eviction(self):
+        """
+        This will test that the least recently used path is evicted when full
+        """
+        cache = ShortestPathCache(capacity=2)
+        cache.put(1, 2, "w", [])
+        cache.put(2, 3, "w", [])
+        cache.get(1, 2, "w")
+        cache.put(3, 4, "w", [])
+
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertIsNotNone(cache.get(1, 2, "w"))
+        self.assertIsNone(cache.get(2, 3, "w"))
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(cache.misses, 1)
+
+    def assert_map_caches_paths(self, road_map):
+        expected = road_map.shortest_path(self.origin, self.destination)
+
+        road_map.set_path_cache_size(10)
+
+        first = road_map.shortest_path(self.origin, self.destination)
+        second = road_map.shortest_path(self.origin, self.destination)
+
+        self.assertListEqual(expected, first)
+        self.assertListEqual(expected, second)
+        self.assertEqual(road_map.path_cache.misses, 1)
+        self.assertEqual(road_map.path_cache.hits, 1)
+
+        # a different weight is a different path
+        road_map.shortest_path(
+            self.origin, self.destination, weight=road_map.distance_weight
+        )
+        self.assertEqual(len(road_map.path_cache), 2)
+
+        # changing the road attributes invalidates the cache
+        road = expected[0]
+        road_map.set_road_attributes({road.road_id: {"travel_time": 1e6}})
+        self.assertEqual(len(road_map.path_cache), 0)
+        self.assertEqual(road_map.path_cache.invalidations, 1)
+
+        road_map.shortest_path(self.origin, self.destination)
+        self.assertEqual(road_map.path_cache.misses, 3)
+
+        road_map.set_path_cache_size(None)
+        self.assertIsNone(road_map.path_cache)
+
+    def test_nx_map_path_cache(self):
+        self.assert_map_caches_paths(NxMap(self.graph.copy()))
+
+    def test_igraph_map_path_cache(self):
+        self.assert_map_caches_paths(IGraphMap.from_nx_graph(self.graph.copy()))
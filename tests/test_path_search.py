@@ -0,0 +1,100 @@
+from unittest import TestCase
+
+import networkx as nx
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.heuristics import EuclideanHeuristic
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+class TestPathSearch(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        cls.graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(trace_file)
+        cls.origin = trace.coords[0]
+        cls.destination = trace.coords[-1]
+
+    def assert_same_paths(self, road_map):
+        for weight in (road_map.distance_weight, road_map.time_weight):
+            expected = road_map.shortest_path(
+                self.origin, self.destination, weight=weight
+            )
+            self.assertGreater(len(expected), 0)
+
+            for method in road_map.path_search_methods:
+                road_map.set_path_search(method)
+                self.assertEqual(road_map.path_search, method)
+
+                path = road_map.shortest_path(
+                    self.origin, self.destination, weight=weight
+                )
+                self.assertListEqual(
+                    [r.road_id for r in expected], [r.road_id for r in path]
+                )
+
+            road_map.set_path_search("dijkstra")
+
+    def test_nx_map_path_search(self):
+        self.assert_same_paths(NxMap(self.graph.copy()))
+
+    def test_igraph_map_path_search(self):
+        self.assert_same_paths(IGraphMap.from_nx_graph(self.graph.copy()))
+
+    def test_invalid_path_search(self):
+        road_map = NxMap(self.graph.copy())
+
+        with self.assertRaises(ValueError):
+            road_map.set_path_search("bfs")
+
+        with self.assertRaises(ValueError):
+            IGraphMap.from_nx_graph(self.graph.copy()).set_path_search("bidirectional")
+
+    def test_heuristic_is_admissible(self):
+        """
+        This will test that the heuristic never overestimates the cost of a road
+        """
+        road_map = NxMap(self.graph.copy())
+
+        for weight in (road_map.distance_weight, road_map.time_weight):
+            heuristic = road_map._heuristic(weight)
+            self.assertGreater(heuristic.scale, 0)
+
+            for u, v, w in road_map.g.edges(data=weight):
+                self.assertLessEqual(heuristic(u, v), w)
+
+    def test_astar_reaches_fewer_nodes(self):
+        road_map = NxMap(self.graph.copy())
+        weight = road_map.distance_weight
+        path = road_map.shortest_path(self.origin, self.destination, weight=weight)
+        origin_id = path[0].road_id.start
+        dest_id = path[-1].road_id.end
+
+        heuristic = road_map._heuristic(weight)
+        reached = set()
+
+        def counting_heuristic(u, v):
+            reached.add(u)
+            return heuristic(u, v)
+
+        cost = nx.astar_path_length(
+            road_map.g, origin_id, dest_id, heuristic=counting_heuristic, weight=weight
+        )
+        settled = nx.single_source_dijkstra_path_length(
+            road_map.g, origin_id, cutoff=cost, weight=weight
+        )
+
+        self.assertLess(len(reached), len(settled))
+
+    def test_heuristic_without_weights(self):
+        heuristic = EuclideanHeuristic.from_edges([])
+
+        self.assertEqual(heuristic.scale, 0)
@@ -0,0 +1,125 @@
+import pickle
+from unittest import TestCase
+
+import osmnx as ox
+
+from mappymatch.constructs.road import RoadMetadata
+from mappymatch.maps.csr.csr_map import CSRMap
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+def _maps():
+    gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+    graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+
+    return [NxMap(graph), IGraphMap.from_nx_graph(graph)]
+
+
+class TestRoadCache(TestCase):
+    def test_roads_are_cached(self):
+        """
+        This will test that the same road object is returned for repeated lookups
+        """
+        for road_map in _maps():
+            road = road_map.roads[0]
+
+            self.assertIs(road_map.road_by_id(road.road_id), road)
+            self.assertIs(road_map.roads[0], road)
+
+    def test_metadata(self):
+        """
+        This will test that the lazy metadata holds the road attributes
+        """
+        for road_map in _maps():
+            road = road_map.roads[0]
+
+            self.assertIsInstance(road.metadata, RoadMetadata)
+            self.assertIn(road_map.distance_weight, road.metadata)
+            self.assertIn(road_map.time_weight, road.metadata)
+            self.assertEqual(road.metadata, road.metadata.copy())
+
+            road.metadata["test"] = 0
+            self.assertEqual(road_map.roads[0].metadata["test"], 0)
+
+    def test_set_road_attributes_invalidates(self):
+        """
+        This will test that setting road attributes rebuilds the cached roads
+        """
+        for road_map in _maps():
+            road = road_map.roads[0]
+
+            road_map.set_road_attributes({road.road_id: {"test": 1}})
+            new_road = road_map.road_by_id(road.road_id)
+
+            self.assertIsNot(new_road, road)
+            assert new_road is not None and new_road.metadata is not None
+            self.assertEqual(new_road.metadata["test"], 1)
+
+    def test_metadata_is_read_when_built(self):
+        """
+        This will test that a road keeps the attributes it was built with after the
+        road attributes change
+        """
+        for road_map in _maps():
+            road = road_map.roads[0]
+            assert road.metadata is not None
+            travel_time = road_map.roads[0].metadata[road_map.time_weight]
+
+            road_map.set_road_attributes(
+                {road.road_id: {road_map.time_weight: 999.0, "foo": 1}}
+            )
+
+            self.assertEqual(road.metadata[road_map.time_weight], travel_time)
+            self.assertNotIn("foo", road.metadata)
+
+    def test_base_metadata_is_copied_when_built(self):
+        """
+        This will test that a road keeps the metadata it was built with after the
+        metadata of the graph is changed in place
+        """
+        # each map gets a graph of its own, so the edge metadata isn't shared
+        nx_map = _maps()[0]
+        road = nx_map.roads[0]
+        assert road.metadata is not None
+        nx_map.g.edges[road.road_id][nx_map._metadata_key]["foo"] = 1
+        self.assertNotIn("foo", road.metadata)
+
+        igraph_map = _maps()[1]
+        road = igraph_map.roads[0]
+        assert road.metadata is not None
+        edge = igraph_map.g.es[igraph_map.road_mapping[road.road_id]]
+        edge[igraph_map._metadata_key]["foo"] = 1
+        self.assertNotIn("foo", road.metadata)
+
+    def test_pickle(self):
+        """
+        This will test that pickled roads carry plain metadata dictionaries
+        """
+        for road_map in _maps():
+            road = road_map.roads[0]
+
+            unpickled = pickle.loads(pickle.dumps(road))
+
+            self.assertIsInstance(unpickled.metadata, dict)
+            self.assertEqual(unpickled, road)
+
+            unpickled_map = pickle.loads(pickle.dumps(road_map))
+            self.assertEqual(unpickled_map.roads[0], road)
+
+    def test_csr_map_roads_are_cached(self):
+        """
+        This will test that a CSRMap decodes each road once and doesn't pickle its
+        cached roads
+        """
+        road_map = CSRMap.from_map(_maps()[0])
+        road = road_map.roads[0]
+
+        self.assertIs(road_map.road_by_id(road.road_id), road)
+        self.assertIs(road_map.road_by_index(0), road)
+
+        unpickled_map = pickle.loads(pickle.dumps(road_map))
+        self.assertEqual(unpickled_map._road_cache, {})
+        self.assertEqual(unpickled_map.roads[0], road)
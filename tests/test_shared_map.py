@@ -0,0 +1,133 @@
+import pickle
+from unittest import TestCase
+
+import osmnx as ox
+from shapely.geometry import LineString
+
+from mappymatch import package_root
+from mappymatch.constructs.road import Road, RoadId
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.map_arrays import MapArrays
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from mappymatch.maps.shared.shared_map import SharedMap
+from mappymatch.matchers.lcss.lcss import LCSSMatcher
+from mappymatch.utils.crs import XY_CRS
+from tests import get_test_dir
+
+
+class TestSharedMap(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+        cls.nx_map = NxMap(graph)
+        cls.igraph_map = IGraphMap.from_nx_graph(graph)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_2.csv"
+        cls.trace = Trace.from_csv(trace_file)
+
+    def setUp(self):
+        self.shared_map = SharedMap.from_map(self.nx_map)
+
+    def tearDown(self):
+        self.shared_map.close()
+
+    def test_shared_map_roads(self):
+        """
+        This will test that the shared map holds the same roads as the map it was built from
+        """
+        self.assertListEqual(self.nx_map.roads, self.shared_map.roads)
+
+        road = self.nx_map.roads[10]
+        self.assertEqual(road, self.shared_map.road_by_id(road.road_id))
+        self.assertIsNone(self.shared_map.road_by_id(RoadId(-1, -2, 0)))
+
+    def test_shared_map_nearest_road_and_shortest_path(self):
+        """
+        This will test that the shared map finds roads as near and the same paths;
+        of roads at the same distance, the grid index may pick another one
+        """
+        coords = list(self.trace.coords)
+        for origin, destination in zip(coords[::60], coords[::-45]):
+            self.assertAlmostEqual(
+                self.nx_map.nearest_road(origin).geom.distance(origin.geom),
+                self.shared_map.nearest_road(origin).geom.distance(origin.geom),
+            )
+            self.assertListEqual(
+                self.igraph_map.shortest_path(origin, destination),
+                self.shared_map.shortest_path(origin, destination),
+            )
+
+        with self.assertRaises(ValueError):
+            self.shared_map.shortest_path(coords[0], coords[-1], weight="unknown")
+
+    def test_shared_map_uses_shared_arrays(self):
+        """
+        This will test that the routing arrays and the spatial index of a shared map are
+        views of the shared memory rather than copies
+        """
+        attached = pickle.loads(pickle.dumps(self.shared_map))
+        grid_index = attached.grid_index
+        assert grid_index is not None
+
+        for a in (attached._indptr, attached._csr_targets, grid_index.cell_edges):
+            self.assertFalse(a.flags.owndata)
+            self.assertFalse(a.flags.writeable)
+        self.assertIsNone(attached._rtree)
+
+        attached.close()
+
+    def test_shared_map_pickle(self):
+        """
+        This will test that a pickled shared map attaches to the same shared memory
+        """
+        data = pickle.dumps(self.shared_map)
+        self.assertLess(len(data), 2000)
+
+        attached = pickle.loads(data)
+        self.assertListEqual(self.nx_map.roads, attached.roads)
+        attached.close()
+
+        # the block stays available until the owner is closed
+        attached = pickle.loads(data)
+        self.assertEqual(self.shared_map.arrays.n_roads, attached.arrays.n_roads)
+        attached.close()
+
+    def test_shared_map_match_traces(self):
+        """
+        This will test that matching with a shared map in worker processes gives
+        the same result as matching with the original map
+        """
+        expected = LCSSMatcher(self.nx_map).match_trace(self.trace)
+
+        matcher = LCSSMatcher(self.shared_map)
+        results = list(matcher.match_traces([self.trace, self.trace], workers=2))
+
+        for result in results:
+            self.assertListEqual(expected.matches, result.matches)
+            self.assertListEqual(expected.path, result.path)
+
+    def test_map_arrays_string_ids(self):
+        """
+        This will test that the map arrays keep string node ids and road keys
+        """
+        roads = [
+            Road(RoadId("a", "b", "x"), LineString([(0, 0), (1, 0)]), {"w": 1.0}),
+            Road(RoadId("b", "c", "y"), LineString([(1, 0), (1, 1), (2, 1)])),
+        ]
+        arrays = MapArrays.from_roads(roads, XY_CRS, "w", "t")
+
+        with SharedMap(arrays) as shared_map:
+            self.assertEqual(shared_map.roads[0].road_id, RoadId("a", "b", "x"))
+            self.assertEqual(shared_map.roads[0].metadata, {"w": 1.0, "t": None})
+            self.assertEqual(shared_map.roads[1].geom, roads[1].geom)
+
+        with self.assertRaises(TypeError):
+            MapArrays.from_roads(
+                [Road(RoadId("a", 1, 0), LineString([(0, 0), (1, 0)]))],
+                XY_CRS,
+                "w",
+                "t",
+            )
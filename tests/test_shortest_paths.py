@@ -0,0 +1,96 @@
+from unittest import TestCase
+
+import networkx as nx
+import osmnx as ox
+
+from mappymatch import package_root
+from mappymatch.constructs.trace import Trace
+from mappymatch.maps.csr.csr_map import CSRMap
+from mappymatch.maps.igraph.igraph_map import IGraphMap
+from mappymatch.maps.nx.nx_map import NxMap
+from mappymatch.maps.nx.readers.osm_readers import NetworkType, parse_osmnx_graph
+from tests import get_test_dir
+
+
+class TestShortestPaths(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        gfile = get_test_dir() / "test_assets" / "osmnx_drive_graph.graphml"
+        cls.graph = parse_osmnx_graph(ox.load_graphml(gfile), NetworkType.DRIVE)
+
+        trace_file = package_root() / "resources" / "traces" / "sample_trace_2.csv"
+        cls.coords = list(Trace.from_csv(trace_file).coords)
+
+    def single_path(self, road_map, origin, destination, weight=None):
+        try:
+            return road_map.shortest_path(origin, destination, weight=weight)
+        except nx.NetworkXNoPath:
+            return []
+
+    def assert_same_as_single_paths(self, road_map):
+        origin = self.coords[0]
+        destinations = self.coords[::25]
+
+        for weight in (road_map.distance_weight, road_map.time_weight):
+            paths = road_map.shortest_paths(origin, destinations, weight=weight)
+
+            self.assertEqual(len(paths), len(destinations))
+            for destination, path in zip(destinations, paths):
+                self.assertListEqual(
+                    self.single_path(road_map, origin, destination, weight), path
+                )
+
+        origins = self.coords[::40]
+        matrix = road_map.shortest_path_matrix(origins, destinations)
+
+        self.assertEqual(len(matrix), len(origins))
+        for origin, paths in zip(origins, matrix):
+            for destination, path in zip(destinations, paths):
+                self.assertListEqual(
+                    self.single_path(road_map, origin, destination), path
+                )
+
+    def test_nx_map_shortest_paths(self):
+        self.assert_same_as_single_paths(NxMap(self.graph.copy()))
+
+    def test_igraph_map_shortest_paths(self):
+        self.assert_same_as_single_paths(IGraphMap.from_nx_graph(self.graph.copy()))
+
+    def test_default_shortest_paths(self):
+        self.assert_same_as_single_paths(CSRMap.from_map(NxMap(self.graph.copy())))
+
+    def test_shortest_paths_path_search(self):
+        for road_map in (
+            NxMap(self.graph.copy()),
+            IGraphMap.from_nx_graph(self.graph.copy()),
+        ):
+            road_map.set_path_search("astar")
+            self.assert_same_as_single_paths(road_map)
+
+    def test_shortest_paths_weight_function(self):
+        road_map = NxMap(self.graph.copy())
+
+        def weight(u, v, d):
+            return min(attr["kilometers"] for attr in d.values())
+
+        origin = self.coords[0]
+        destinations = self.coords[::25]
+
+        paths = road_map.shortest_paths(origin, destinations, weight=weight)
+        for destination, path in zip(destinations, paths):
+            self.assertListEqual(
+                road_map.shortest_path(origin, destination, weight=weight), path
+            )
+
+    def test_shortest_paths_cache(self):
+        road_map = NxMap(self.graph.copy())
+        road_map.set_path_cache_size(100)
+
+        origin = self.coords[0]
+        destinations = self.coords[::25]
+
+        paths = road_map.shortest_paths(origin, destinations)
+        misses = road_map.path_cache.misses
+
+        self.assertListEqual(road_map.shortest_paths(origin, destinations), paths)
+        self.assertEqual(road_map.path_cache.misses, misses)
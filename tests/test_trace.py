@@ -1,8 +1,10 @@
 from unittest import TestCase
 
+import numpy as np
 import pandas as pd
 
 from mappymatch import package_root
+from mappymatch.constructs.coordinate import Coordinate, CoordinateSequence
 from mappymatch.constructs.trace import Trace
 from mappymatch.utils.crs import XY_CRS
 from mappymatch.utils.geo import xy_to_latlon
@@ -50,3 +52,113 @@ class TestTrace(TestCase):
         self.assertAlmostEqual(pt1[1], target_pt1[1])
         self.assertAlmostEqual(pt2[0], target_pt2[0])
         self.assertAlmostEqual(pt2[1], target_pt2[1])
+
+    def test_trace_slice_is_view(self):
+        file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(file)
+
+        sub_trace = trace[100:200]
+
+        self.assertEqual(len(sub_trace), 100)
+        self.assertTrue(np.shares_memory(sub_trace.x, trace.x))
+        self.assertTrue(np.shares_memory(sub_trace.y, trace.y))
+        self.assertListEqual(list(sub_trace.coords), list(trace.coords)[100:200])
+        self.assertListEqual(list(sub_trace.index), list(trace.index[100:200]))
+
+    def test_trace_add(self):
+        file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(file)
+
+        joined = trace[:100] + trace[100:]
+
+        self.assertEqual(len(joined), len(trace))
+        self.assertListEqual(list(joined.coords), list(trace.coords))
+        self.assertTrue(joined._frame.geometry.equals(trace._frame.geometry))
+
+        with self.assertRaises(IndexError):
+            trace[:100] + trace[50:150]
+
+        with self.assertRaises(IndexError):
+            trace[100:] + trace[:100] + trace[50:51]
+
+    def test_trace_getitem_duplicates(self):
+        file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(file)
+
+        self.assertEqual(len(trace[5]), 1)
+        self.assertEqual(len(trace[[1, 3, 5]]), 3)
+        self.assertEqual(len(trace[np.arange(len(trace)) % 2 == 0]), 527)
+
+        with self.assertRaises(IndexError):
+            trace[[1, 1]]
+
+    def test_trace_drop(self):
+        file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(file)
+
+        dropped = trace.drop([0, 5, 10])
+
+        self.assertEqual(len(dropped), len(trace) - 3)
+        self.assertNotIn(5, dropped.index)
+        self.assertTrue(
+            dropped._frame.geometry.equals(trace._frame.drop([0, 5, 10]).geometry)
+        )
+
+        with self.assertRaises(KeyError):
+            trace.drop([len(trace) + 1])
+
+    def test_trace_frame_is_built_on_demand(self):
+        file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(file)
+
+        sub_trace = trace[10:20] + trace[30:40]
+        self.assertIsNone(sub_trace._frame_cache)
+
+        frame = sub_trace._frame
+        self.assertEqual(frame.crs, trace.crs)
+        self.assertListEqual(
+            list(frame.index), list(range(10, 20)) + list(range(30, 40))
+        )
+        self.assertListEqual(list(frame.geometry.x), list(sub_trace.x))
+
+    def test_trace_coords_sequence(self):
+        file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(file)
+
+        coords = trace.coords
+        expected = [
+            Coordinate(i, g, trace.crs)
+            for i, g in zip(trace._frame.index, trace._frame.geometry)
+        ]
+
+        self.assertEqual(len(coords), len(trace))
+        self.assertEqual(coords[3], expected[3])
+        self.assertEqual(coords[-1], expected[-1])
+        self.assertListEqual(list(coords[10:20]), expected[10:20])
+        self.assertEqual(coords, expected)
+        self.assertTrue(np.array_equal(coords.x, trace.x))
+        self.assertTrue(np.array_equal(coords.y, trace.y))
+
+        with self.assertRaises(IndexError):
+            coords[len(trace)]
+
+    def test_trace_coords_equality(self):
+        file = package_root() / "resources" / "traces" / "sample_trace_1.csv"
+        trace = Trace.from_csv(file)
+
+        a = trace[10:20].coords
+        b = Trace.from_csv(file)[10:20].coords
+
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertNotEqual(a, trace[11:21].coords)
+        self.assertEqual(trace[:10].coords + trace[10:20].coords, trace[:20].coords)
+
+    def test_trace_coords_hash_signed_zero(self):
+        ids = pd.Index([0, 1])
+        a = CoordinateSequence(np.array([0.0, 1.0]), np.array([-0.0, 2.0]), ids, XY_CRS)
+        b = CoordinateSequence(np.array([-0.0, 1.0]), np.array([0.0, 2.0]), ids, XY_CRS)
+
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(len({a, b}), 1)